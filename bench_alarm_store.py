@@ -0,0 +1,169 @@
+"""报警日志存储的大表验证
+
+生成一个含大量报警记录的临时数据库（默认 1000 万行，按升级前的旧库写入，再由 migrate 回填
+汇总表），然后通过 AlarmLogStore 追加一批记录走增量汇总，最后：
+    - 用全表扫描校验各粒度汇总与原始记录一致；
+    - 随机时间范围/位置的 count 与原始 COUNT(*) 对比结果和耗时；
+    - 按游标翻到深处的分页与 OFFSET 分页对比耗时；
+    - 统计 series / location_counts 的耗时。
+
+用法:
+    python bench_alarm_store.py --rows 10000000 --db /tmp/alarm_bench.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+import numpy as np
+
+from fire_monitor.alarm_store import ROLLUP_OFFSET, ROLLUPS, AlarmLogStore, migrate
+
+LOCATIONS = [f"摄像头{i}画面" for i in range(16)] + ["网络摄像头", "手动报警", "录像文件", "未知"]
+ALARM_TYPES = ["火灾报警", "手动报警"]
+
+
+def generate(db_path, rows, days, seed=0, chunk=200_000):
+    """按时间顺序写入 rows 条记录，分布在最近 days 天内，返回 (最早, 最晚) 时间戳"""
+    rng = np.random.default_rng(seed)
+    end = time.time()
+    start = end - days * 86400
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrate(conn)
+    # 退回到 v2，模拟升级前的旧库：只写原始记录，汇总表由 migrate 回填
+    conn.execute("DROP TABLE alarm_rollups")
+    conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+
+    timestamps = np.sort(rng.uniform(start, end, rows))
+    # 位置分布不均匀，少数位置占大部分报警
+    weights = 1.0 / np.arange(1, len(LOCATIONS) + 1)
+    locations = rng.choice(len(LOCATIONS), rows, p=weights / weights.sum())
+    types = (rng.random(rows) < 0.05).astype(np.int64)
+    for offset in range(0, rows, chunk):
+        ts = timestamps[offset:offset + chunk]
+        local = (ts.astype(np.int64) + ROLLUP_OFFSET).astype("datetime64[s]")
+        texts = np.char.replace(np.datetime_as_string(local), "T", " ")
+        loc = locations[offset:offset + chunk]
+        typ = types[offset:offset + chunk]
+        with conn:
+            conn.executemany(
+                "INSERT INTO alarm_logs (alarm_time, alarm_ts, alarm_type, location, description) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((texts[i], float(ts[i]), ALARM_TYPES[typ[i]], LOCATIONS[loc[i]], "置信度: 0.50")
+                 for i in range(len(ts))))
+        print(f"\r生成 {offset + len(ts):,}/{rows:,}", end="", flush=True)
+    print()
+
+    t = time.perf_counter()
+    migrate(conn)
+    print(f"回填汇总表: {time.perf_counter() - t:.1f}s")
+    conn.close()
+    return float(timestamps[0]), float(timestamps[-1])
+
+
+def check_rollups(conn):
+    """全表扫描重新聚合，与汇总表逐桶对比，返回不一致的桶数"""
+    mismatches = 0
+    for granularity, size in ROLLUPS.items():
+        expected = dict(((b, loc, typ), n) for b, loc, typ, n in conn.execute(
+            "SELECT (CAST(alarm_ts AS INTEGER) + ?) / ? * ? - ? AS b, location, alarm_type, COUNT(*) "
+            "FROM alarm_logs GROUP BY b, 2, 3", (ROLLUP_OFFSET, size, size, ROLLUP_OFFSET)))
+        actual = dict(((b, loc, typ), n) for b, loc, typ, n in conn.execute(
+            "SELECT bucket, location, alarm_type, count FROM alarm_rollups WHERE granularity = ?",
+            (granularity,)))
+        bad = sum(1 for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+        print(f"{granularity:>7}: {len(actual):,} 个桶，不一致 {bad}")
+        mismatches += bad
+    return mismatches
+
+
+def timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - t) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="报警日志大表验证")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--db", default="alarm_bench.db")
+    parser.add_argument("--queries", type=int, default=20, help="随机范围查询次数")
+    parser.add_argument("--reuse", action="store_true", help="数据库已存在时直接使用")
+    args = parser.parse_args(argv)
+
+    if not (args.reuse and os.path.exists(args.db)):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        generate(args.db, args.rows, args.days)
+
+    store = AlarmLogStore(args.db)
+    first, last = store._read_conn.execute("SELECT MIN(alarm_ts), MAX(alarm_ts) FROM alarm_logs").fetchone()
+
+    # 增量路径：追加的记录落在已有的桶中
+    rng = random.Random(1)
+    for _ in range(5000):
+        store.add(rng.choice(ALARM_TYPES), rng.choice(LOCATIONS), "增量写入", ts=rng.uniform(first, last))
+    store.flush()
+
+    conn = sqlite3.connect(args.db)
+    failures = check_rollups(conn)
+
+    raw_ms = []
+    rollup_ms = []
+    for _ in range(args.queries):
+        start = rng.uniform(first, last)
+        end = rng.uniform(start, last)
+        location = rng.choice([None, rng.choice(LOCATIONS)])
+        sql = "SELECT COUNT(*) FROM alarm_logs WHERE alarm_ts >= ? AND alarm_ts < ?"
+        params = [start, end]
+        if location is not None:
+            sql += " AND location = ?"
+            params.append(location)
+        expected, ms = timed(lambda: conn.execute(sql, params).fetchone()[0])
+        raw_ms.append(ms)
+        actual, ms = timed(store.count, start, end, location)
+        rollup_ms.append(ms)
+        if actual != expected:
+            failures += 1
+            print(f"count 不一致: [{start}, {end}) {location}: {actual} != {expected}")
+    print(f"count: 原始表 中位数 {np.median(raw_ms):.1f}ms，汇总表 中位数 {np.median(rollup_ms):.2f}ms "
+          f"最大 {max(rollup_ms):.2f}ms")
+
+    counts, ms = timed(store.location_counts)
+    total = conn.execute("SELECT COUNT(*) FROM alarm_logs").fetchone()[0]
+    if sum(counts.values()) != total:
+        failures += 1
+        print(f"location_counts 合计 {sum(counts.values())} != {total}")
+    print(f"location_counts 全部时间: {ms:.2f}ms，共 {total:,} 条")
+    for granularity in ROLLUPS:
+        series, ms = timed(store.series, granularity, last - 7 * 86400, last + 1)
+        print(f"series {granularity:>6} 最近7天: {len(series):,} 个桶 {ms:.2f}ms")
+
+    # 游标分页：每页耗时与翻到第几页无关
+    pages = 2000
+    page_ms = []
+    cursor = None
+    for page in range(pages):
+        (rows, cursor), ms = timed(store.query, limit=100, cursor=cursor)
+        page_ms.append(ms)
+    _, offset_ms = timed(lambda: conn.execute(
+        "SELECT id FROM alarm_logs ORDER BY alarm_ts DESC, id DESC LIMIT 100 OFFSET ?",
+        (pages * 100,)).fetchall())
+    print(f"游标分页: 第1页 {page_ms[0]:.2f}ms，第{pages}页 {page_ms[-1]:.2f}ms；"
+          f"OFFSET 翻到第{pages}页 {offset_ms:.1f}ms")
+
+    conn.close()
+    store.close()
+    print("验证通过" if failures == 0 else f"验证失败 {failures} 项")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if main() else 0)
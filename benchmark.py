@@ -0,0 +1,443 @@
+"""性能基准测试
+
+在本地生成不同分辨率的合成火灾/无火灾视频，分别测试 detect_fire、区域标注以及不限速的完整流水线，
+输出帧率、p50/p99 延迟和峰值内存，结果保存为 JSON 便于在不同提交之间对比。
+另外测量冷启动：各模块在新进程中的导入耗时，以及从启动解释器到分析完第一帧的时间。
+
+用法:
+    python benchmark.py --resolutions 480p 1080p --frames 120 --output bench.json
+    python benchmark.py --compare bench_old.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，峰值内存改用 psutil（未安装时不统计）
+    resource = None
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160)
+}
+
+CLIP_DIR = "bench_clips"
+
+
+def make_clip(path, width, height, frames, fire, fps=25, seed=0):
+    """生成合成测试视频：fire=True 时画面中有闪烁、扩大的橙红色火焰区域"""
+    rng = np.random.default_rng(seed)
+    # 偏蓝灰的静态背景，加少量噪声
+    base = np.empty((height, width, 3), np.uint8)
+    base[:] = (110, 100, 90)
+    noise = rng.integers(0, 20, (height, width, 1), dtype=np.uint8)
+    base = cv2.add(base, np.repeat(noise, 3, axis=2))
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"无法写入测试视频: {path}")
+    try:
+        for i in range(frames):
+            frame = base.copy()
+            # 移动的非火灾物体（灰白色）
+            x = int((i * 7) % max(1, width - width // 8))
+            cv2.rectangle(frame, (x, height // 2), (x + width // 8, height // 2 + height // 6),
+                          (200, 200, 200), -1)
+            if fire:
+                radius = int(min(width, height) * (0.05 + 0.1 * i / max(1, frames)))
+                for _ in range(6):
+                    cx = width // 3 + int(rng.integers(-radius, radius + 1) // 2)
+                    cy = height // 3 + int(rng.integers(-radius, radius + 1) // 2)
+                    color = (0, int(rng.integers(60, 160)), int(rng.integers(200, 256)))
+                    cv2.circle(frame, (cx, cy), max(2, radius // 2), color, -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def ensure_clip(resolution, frames, fire):
+    width, height = RESOLUTIONS[resolution]
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    path = os.path.join(CLIP_DIR, f"{'fire' if fire else 'nofire'}_{resolution}_{frames}.avi")
+    if not os.path.exists(path):
+        make_clip(path, width, height, frames, fire)
+    return path
+
+
+def load_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def summarize(latencies, elapsed, count):
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "frames": count,
+        "fps": round(count / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None
+    }
+
+
+def bench_detect(path, options):
+    from fire_monitor.detector import FireDetector
+
+    frames = load_frames(path)
+    detector = FireDetector()
+    detector.detect(frames[0])  # 预热，分配缓冲区
+    latencies = []
+    fire_frames = 0
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        fire_detected, _ = detector.detect(frame)
+        latencies.append(time.perf_counter() - t)
+        fire_frames += fire_detected
+    result = summarize(latencies, time.perf_counter() - start, len(frames))
+    result["fire_frames"] = int(fire_frames)
+    return result
+
+
+def bench_annotate(path, options):
+    from fire_monitor.detector import FireDetector, annotate_fire
+
+    frames = load_frames(path)
+    detector = FireDetector()
+    masks = [detector.detect(frame)[1].copy() for frame in frames]
+    annotate_fire(frames[0].copy(), masks[0])  # 预热
+    latencies = []
+    start = time.perf_counter()
+    for frame, mask in zip(frames, masks):
+        t = time.perf_counter()
+        annotate_fire(frame, mask)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start, len(frames))
+
+
+def bench_pipeline(path, options):
+    from fire_monitor.detector import FireDetector, annotate_fire
+    from fire_monitor.pipeline import VideoPipeline
+
+    detector = FireDetector()
+    latencies = []
+    displayed = [0]
+    done = threading.Event()
+
+    def analyze(frame):
+        t = time.perf_counter()
+        fire_detected, fire_mask = detector.detect(frame)
+        if fire_detected:
+            annotate_fire(frame, fire_mask)
+        latencies.append(time.perf_counter() - t)
+        return frame
+
+    def display(frame):
+        # 不依赖 Tk，只做显示前的颜色转换
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        displayed[0] += 1
+
+    cap = cv2.VideoCapture(path)
+    pipeline = VideoPipeline(cap, analyze, display, live=False, fps=None, on_end=done.set)
+    start = time.perf_counter()
+    pipeline.start()
+    done.wait()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+    cap.release()
+
+    result = summarize(latencies, elapsed, pipeline.frames_analyzed)
+    result["displayed"] = displayed[0]
+    return result
+
+
+def _bench_variant(path, config):
+    """检测模式变体的速度，以及与默认全分辨率检测结果的一致性"""
+    from fire_monitor.detector import FireDetector
+
+    frames = load_frames(path)
+    full = FireDetector()
+    variant = FireDetector(**config)
+    latencies = []
+    agree = 0
+    exact = 0
+    ious = []
+    ratio_errors = []
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        fire_detected, mask = variant.detect(frame)
+        latencies.append(time.perf_counter() - t)
+
+        # 一致性统计不计入耗时
+        pause = time.perf_counter()
+        ref_detected, ref_mask = full.detect(frame)
+        agree += fire_detected == ref_detected
+        exact += not np.any(mask != ref_mask)
+        union = cv2.countNonZero(cv2.bitwise_or(mask, ref_mask))
+        ious.append(cv2.countNonZero(cv2.bitwise_and(mask, ref_mask)) / union if union else 1.0)
+        ratio_errors.append(abs(variant.fire_ratio - full.fire_ratio))
+        start += time.perf_counter() - pause
+
+    result = summarize(latencies, time.perf_counter() - start, len(frames))
+    result.update(config=config,
+                  decision_agreement=round(agree / len(frames), 4),
+                  mask_exact=round(exact / len(frames), 4),
+                  mask_iou=round(float(np.mean(ious)), 4),
+                  ratio_mae=round(float(np.mean(ratio_errors)), 6))
+    return result
+
+
+def bench_pyramid(path, options):
+    return _bench_variant(path, {"pyramid_scale": options["pyramid_scale"]})
+
+
+def bench_tiles(path, options):
+    return _bench_variant(path, {"tile_cache": True})
+
+
+def bench_lut(path, options):
+    from fire_monitor.detector import FireDetector
+
+    result = _bench_variant(path, {"color_lut": True})
+
+    # 多帧批量查表，与逐帧 HSV 分割逐位比较（只取前几帧，避免拼接占用过多内存）
+    frames = load_frames(path)[:8]
+    detector = FireDetector(color_lut=True)
+    masks = detector.lut.classify(np.stack(frames))
+    hsv = np.empty_like(frames[0])
+    ref = np.empty(frames[0].shape[:2], np.uint8)
+    tmp = np.empty_like(ref)
+    batch_exact = True
+    for frame, mask in zip(frames, masks):
+        detector._color_mask(frame, hsv, ref, tmp)
+        batch_exact = batch_exact and not np.any(mask != ref)
+    result["batch_exact"] = batch_exact
+    return result
+
+
+def bench_flicker(path, options):
+    from fire_monitor.detector import FireDetector
+
+    result = _bench_variant(path, {"flicker_gate": True})
+
+    # 滑动 DFT 递推结果与对整个窗口做 FFT 的误差
+    detector = FireDetector(flicker_gate=True)
+    for frame in load_frames(path):
+        detector.detect(frame)
+    flicker = detector.flicker
+    ordered = np.roll(flicker._history, -flicker._pos, axis=0)
+    exact = np.fft.fft(ordered, axis=0)[flicker._bins]
+    result["sdft_max_error"] = float(np.abs(exact - flicker._spectrum).max())
+    result["flicker_blocks"] = round(float(np.mean(flicker.block_map > 0)), 4)
+    return result
+
+
+CASES = {
+    "detect": bench_detect,
+    "annotate": bench_annotate,
+    "pipeline": bench_pipeline,
+    "pyramid": bench_pyramid,
+    "tiles": bench_tiles,
+    "lut": bench_lut,
+    "flicker": bench_flicker
+}
+
+
+def peak_rss_mb():
+    """当前进程的峰值内存（MB），无法获取时返回 None"""
+    if resource is not None:
+        # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # Windows 下 peak_wset 为峰值工作集，其他平台只有当前 rss
+    return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1)
+
+
+def _run_case(case, path, options):
+    result = CASES[case](path, options)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(case, path, options):
+    # 每个用例在独立子进程中运行，峰值内存互不影响
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(_run_case, (case, path, options))
+
+
+# 冷启动测量的模块，每个都在新的解释器中导入
+STARTUP_MODULES = ["fire_monitor", "fire_monitor.app", "fire_monitor.detector", "fire_monitor.ui"]
+
+_IMPORT_SCRIPT = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+_FIRST_FRAME_SCRIPT = """
+import sys
+import threading
+
+import cv2
+
+from fire_monitor.detector import FireDetector
+from fire_monitor.pipeline import VideoPipeline
+
+detector = FireDetector()
+first = threading.Event()
+
+
+def analyze(frame):
+    detector.detect(frame)
+    first.set()
+    return frame
+
+
+cap = cv2.VideoCapture(sys.argv[1])
+pipeline = VideoPipeline(cap, analyze, lambda frame: None, live=False, fps=None,
+                         on_end=first.set)
+pipeline.start()
+first.wait()
+print("first", flush=True)
+pipeline.stop()
+cap.release()
+"""
+
+
+def _median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def bench_startup(path, repeat=5):
+    """冷启动耗时（毫秒，取多次的中位数）"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    result = {}
+    for module in STARTUP_MODULES:
+        samples = []
+        for _ in range(repeat):
+            output = subprocess.check_output([sys.executable, "-c", _IMPORT_SCRIPT.format(module=module)],
+                                             cwd=cwd, text=True)
+            samples.append(float(output.strip().splitlines()[-1]) * 1000)
+        result[f"import {module}"] = round(_median(samples), 1)
+
+    # 从启动解释器计时，包含解释器本身的启动、导入和打开视频
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with subprocess.Popen([sys.executable, "-c", _FIRST_FRAME_SCRIPT, os.path.abspath(path)],
+                              cwd=cwd, stdout=subprocess.PIPE, text=True) as proc:
+            for line in proc.stdout:
+                if line.strip() == "first":
+                    samples.append((time.perf_counter() - start) * 1000)
+                    break
+            proc.stdout.read()
+        if proc.returncode != 0:
+            raise RuntimeError(f"首帧测量进程退出码 {proc.returncode}")
+    result["first_frame"] = round(_median(samples), 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """打印与基准结果相比的帧率变化"""
+    old = {(r["case"], r["resolution"], r["clip"]): r for r in baseline["results"]}
+    for r in current["results"]:
+        prev = old.get((r["case"], r["resolution"], r["clip"]))
+        if prev is None or not prev.get("fps") or not r.get("fps"):
+            continue
+        change = (r["fps"] - prev["fps"]) / prev["fps"] * 100
+        print(f"{r['case']:>10} {r['resolution']:>6} {r['clip']:>7}: "
+              f"{prev['fps']:>9.1f} -> {r['fps']:>9.1f} fps ({change:+.1f}%)")
+    for name, ms in current.get("startup", {}).items():
+        prev = baseline.get("startup", {}).get(name)
+        if prev:
+            print(f"{name:>30}: {prev:>8.1f} -> {ms:>8.1f} ms ({(ms - prev) / prev * 100:+.1f}%)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="火灾检测性能基准测试")
+    parser.add_argument("--resolutions", nargs="+", default=["480p", "720p", "1080p", "4k"],
+                        choices=sorted(RESOLUTIONS))
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--frames", type=int, default=120, help="每段测试视频的帧数")
+    parser.add_argument("--output", default=None, help="保存结果的 JSON 文件")
+    parser.add_argument("--compare", default=None, help="与之对比的历史结果 JSON 文件")
+    parser.add_argument("--pyramid-scale", type=float, default=0.25, help="pyramid 用例的缩放比例")
+    parser.add_argument("--skip-startup", action="store_true", help="不测量冷启动耗时")
+    args = parser.parse_args(argv)
+    options = {"pyramid_scale": args.pyramid_scale}
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "results": []
+    }
+
+    for resolution in args.resolutions:
+        for fire in (True, False):
+            path = ensure_clip(resolution, args.frames, fire)
+            for case in args.cases:
+                result = run_isolated(case, path, options)
+                result.update(case=case, resolution=resolution, clip="fire" if fire else "nofire")
+                report["results"].append(result)
+                rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']}MB"
+                print(f"{case:>10} {resolution:>6} {result['clip']:>7}: {result['fps']:>9.1f} fps  "
+                      f"p50 {result['p50_ms']:.2f}ms  p99 {result['p99_ms']:.2f}ms  rss {rss}")
+                if "decision_agreement" in result:
+                    print(f"{'':>10} 与全分辨率一致率 {result['decision_agreement']:.2%}  "
+                          f"掩膜IoU {result['mask_iou']:.4f}  掩膜完全一致 {result['mask_exact']:.2%}  "
+                          f"比例误差 {result['ratio_mae']:.6f}")
+
+    if not args.skip_startup:
+        report["startup"] = bench_startup(ensure_clip(args.resolutions[0], args.frames, True))
+        for name, ms in report["startup"].items():
+            print(f"{name:>30}: {ms:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
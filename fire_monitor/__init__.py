@@ -0,0 +1,24 @@
+"""智能火灾预警监控系统
+
+导入本包不会加载 OpenCV 等重量级模块，检测接口在首次访问时才导入:
+
+    from fire_monitor import FireDetector
+"""
+
+_LAZY = {
+    "FireDetector": "detector",
+    "detect_fire": "detector",
+    "annotate_fire": "detector",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,282 @@
+"""异步报警分发
+
+检测线程只负责把报警事件放入队列，由后台线程完成去抖合并，再分发给各个报警通道（日志、声音、
+邮件、Webhook）。每个通道有自己的线程和队列，失败按指数退避重试，慢通道不会拖慢其他通道。
+smtplib、urllib 等只在通道第一次发送时导入，不影响启动速度。
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .metrics import METRICS
+
+_STOP = object()
+
+
+class AlarmSink:
+    """报警通道基类，子类实现 send(event)；抛出异常即视为失败并重试"""
+
+    name = "sink"
+    # 是否参与按位置去抖（日志需要记录每一次报警）
+    debounce = True
+
+    def enabled(self):
+        return True
+
+    def send(self, event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LogSink(AlarmSink):
+    """写入报警日志仓库（AlarmLogStore 批量提交）"""
+
+    name = "log"
+    debounce = False
+
+    def __init__(self, store):
+        self.store = store
+
+    def send(self, event):
+        self.store.add(event["alarm_type"], event["location"], event["description"],
+                       ts=event["time"].timestamp(), clip_path=event["clip_path"])
+
+
+class SoundSink(AlarmSink):
+    """声音报警，Windows 下用 winsound，其他平台退化为终端响铃"""
+
+    name = "sound"
+
+    def __init__(self, config):
+        self.config = config
+
+    def enabled(self):
+        return self.config["sound_alarm"]
+
+    def send(self, event):
+        try:
+            import winsound
+        except ImportError:
+            sys.stdout.write("\a")
+            sys.stdout.flush()
+            return
+        winsound.Beep(1000, 1000)  # 频率1000Hz，持续1秒
+
+
+class EmailSink(AlarmSink):
+    """邮件报警，复用同一个 SMTP 会话，出错时断开并在重试时重新连接"""
+
+    name = "email"
+
+    def __init__(self, config):
+        self.config = config
+        self._server = None
+
+    def enabled(self):
+        return (self.config["email_alarm"] and self.config["email_sender"]
+                and self.config["email_receiver"])
+
+    def _connect(self):
+        import smtplib
+
+        server = smtplib.SMTP(self.config["smtp_server"], self.config["smtp_port"], timeout=10)
+        try:
+            if self.config.get("smtp_starttls", True):
+                server.starttls()
+            if self.config["email_password"]:
+                server.login(self.config["email_sender"], self.config["email_password"])
+        except Exception:
+            # 握手或登录失败时关闭已建立的连接，否则每次重试都泄漏一个连接
+            server.close()
+            raise
+        return server
+
+    def send(self, event):
+        from email.mime.text import MIMEText
+
+        body = (f"火灾报警触发\n类型: {event['alarm_type']}\n时间: {event['time']}\n"
+                f"位置: {event['location']}\n描述: {event['description']}")
+        if event["clip_path"]:
+            body += f"\n报警录像: {event['clip_path']}"
+        if event["count"] > 1:
+            body += f"\n合并报警次数: {event['count']}"
+        msg = MIMEText(body)
+        msg['Subject'] = f"火灾报警 - {event['alarm_type']}"
+        msg['From'] = self.config["email_sender"]
+        msg['To'] = self.config["email_receiver"]
+
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.send_message(msg)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+
+class WebhookSink(AlarmSink):
+    """以 JSON POST 到 Webhook 地址"""
+
+    name = "webhook"
+
+    def __init__(self, config):
+        self.config = config
+
+    def enabled(self):
+        return bool(self.config.get("webhook_url"))
+
+    def send(self, event):
+        import urllib.request
+
+        payload = dict(event, time=event["time"].strftime('%Y-%m-%d %H:%M:%S'))
+        request = urllib.request.Request(self.config["webhook_url"],
+                                         data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+
+class _SinkWorker:
+    def __init__(self, sink, max_retries, retry_backoff):
+        self.sink = sink
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue()
+        self.sent = 0
+        self.failed = 0
+        self.thread = threading.Thread(target=self._run, name=f"alarm-{sink.name}", daemon=True)
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is _STOP:
+                break
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with METRICS.timer(f"alarm_{self.sink.name}"):
+                        self.sink.send(event)
+                    self.sent += 1
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        self.failed += 1
+                        print(f"{self.sink.name} 报警发送失败: {e}")
+                    else:
+                        time.sleep(self.retry_backoff * (2 ** attempt))
+        self.sink.close()
+
+
+class AlarmDispatcher:
+    """报警分发器
+
+    submit() 不阻塞调用方。同一位置在 debounce_seconds 内的后续报警被合并，窗口结束时
+    若有被合并的报警，再补发一条带合并次数的汇总。
+    """
+
+    def __init__(self, sinks, debounce_seconds=30, max_retries=3, retry_backoff=1.0):
+        self.debounce_seconds = debounce_seconds
+        self._workers = [_SinkWorker(sink, max_retries, retry_backoff) for sink in sinks]
+        self._queue = queue.Queue()
+        # 位置 -> [窗口结束时间, 被合并的最后一次报警, 被合并次数]
+        self._windows = {}
+        self._thread = threading.Thread(target=self._run, name="alarm-dispatcher", daemon=True)
+
+    def start(self):
+        for worker in self._workers:
+            worker.thread.start()
+        self._thread.start()
+
+    def submit(self, alarm_type, location=None, description=None, coalesce=True, clip_path=None):
+        self._queue.put({
+            "time": datetime.now(),
+            "alarm_type": alarm_type,
+            "location": location or "未知",
+            "description": description or "无",
+            "clip_path": clip_path,
+            "count": 1,
+            "coalesce": coalesce
+        })
+
+    def stop(self, timeout=5.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        for worker in self._workers:
+            worker.queue.put(_STOP)
+        for worker in self._workers:
+            worker.thread.join(timeout)
+
+    def stats(self):
+        return {worker.sink.name: {"sent": worker.sent, "failed": worker.failed,
+                                   "pending": worker.queue.qsize()}
+                for worker in self._workers}
+
+    def _fan_out(self, event, debounced=None):
+        # debounced 为 None 时发往全部通道，否则只发往 sink.debounce 与之相同的通道
+        for worker in self._workers:
+            if debounced is not None and worker.sink.debounce != debounced:
+                continue
+            if worker.sink.enabled():
+                worker.queue.put(event)
+
+    def _flush_windows(self, now):
+        for location, window in list(self._windows.items()):
+            end, last_event, suppressed = window
+            if now < end:
+                continue
+            del self._windows[location]
+            if suppressed:
+                self._fan_out(dict(last_event, count=suppressed), debounced=True)
+
+    def _next_timeout(self, now):
+        if not self._windows:
+            return None
+        return max(0, min(window[0] for window in self._windows.values()) - now)
+
+    def _run(self):
+        while True:
+            try:
+                event = self._queue.get(timeout=self._next_timeout(time.monotonic()))
+            except queue.Empty:
+                event = None
+            now = time.monotonic()
+            self._flush_windows(now)
+            if event is None:
+                continue
+            if event is _STOP:
+                self._flush_windows(float("inf"))
+                break
+
+            window = self._windows.get(event["location"])
+            if not event["coalesce"] or window is None:
+                if event["coalesce"] and self.debounce_seconds > 0:
+                    self._windows[event["location"]] = [now + self.debounce_seconds, event, 0]
+                self._fan_out(event)
+            else:
+                # 窗口内：日志照常记录，其余通道合并
+                window[1] = event
+                window[2] += 1
+                self._fan_out(event, debounced=False)
+
+
+def create_dispatcher(config, store):
+    """按报警配置创建并启动分发器"""
+    sinks = [LogSink(store), SoundSink(config), EmailSink(config), WebhookSink(config)]
+    dispatcher = AlarmDispatcher(sinks,
+                                 debounce_seconds=config.get("debounce_seconds", 30),
+                                 max_retries=config.get("max_retries", 3),
+                                 retry_backoff=config.get("retry_backoff", 1.0))
+    dispatcher.start()
+    return dispatcher
@@ -0,0 +1,317 @@
+"""报警日志存储
+
+使用长连接 + WAL 模式；写入由后台线程批量提交（组提交），查询按 epoch 时间戳走索引，
+支持时间范围过滤和基于游标的分页。
+
+alarm_rollups 按分钟/小时/天汇总各位置、各类型的报警次数，与原始记录在同一事务中增量更新。
+统计查询把时间范围拆成整天、整小时、整分钟的桶，只有两端不足一分钟的部分才扫描原始记录，
+耗时与表的行数无关。
+"""
+import math
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+_STOP = object()
+
+SCHEMA_VERSION = 4
+
+# 汇总粒度及桶长度（秒），从粗到细
+ROLLUPS = {"day": 86400, "hour": 3600, "minute": 60}
+
+# 桶按本地标准时间对齐（天级桶从本地零点开始）；不随夏令时变化，保证各粒度的桶相互嵌套
+ROLLUP_OFFSET = -time.timezone
+
+# 未指定结束时间时使用的上界
+_FAR_FUTURE = 2 ** 40
+
+
+def bucket_start(ts, granularity):
+    """ts 所在桶的起点（epoch 秒）"""
+    return _align_down(ts, ROLLUPS[granularity])
+
+
+def _align_down(ts, size):
+    return (math.floor(ts) + ROLLUP_OFFSET) // size * size - ROLLUP_OFFSET
+
+
+def _align_up(ts, size):
+    return -(-(math.ceil(ts) + ROLLUP_OFFSET) // size) * size - ROLLUP_OFFSET
+
+
+def migrate(conn):
+    """把 alarm_logs 升级到当前版本，旧的 users.db 可直接打开
+
+    v1: 保留原有的文本列 alarm_time，新增 epoch 时间戳列 alarm_ts 并回填，建立索引。
+    v2: 新增报警录像路径列 clip_path。
+    v3: 新增汇总表 alarm_rollups，并由已有记录回填。
+    v4: 旧记录中为空的 location 统一为 '未知'，与汇总表及新写入的记录一致，按位置筛选时不再遗漏。
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS alarm_logs
+              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+               alarm_time TEXT NOT NULL,
+               alarm_type TEXT NOT NULL,
+               location TEXT,
+               description TEXT)''')
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(alarm_logs)")}
+    if version < 1:
+        if "alarm_ts" not in columns:
+            conn.execute("ALTER TABLE alarm_logs ADD COLUMN alarm_ts REAL")
+        # alarm_time 是本地时间文本，'utc' 修饰符将其换算为 UTC epoch
+        conn.execute("UPDATE alarm_logs SET alarm_ts = CAST(strftime('%s', alarm_time, 'utc') AS REAL) "
+                     "WHERE alarm_ts IS NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alarm_logs_ts ON alarm_logs (alarm_ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alarm_logs_location_ts "
+                     "ON alarm_logs (location, alarm_ts)")
+    if version < 2 and "clip_path" not in columns:
+        conn.execute("ALTER TABLE alarm_logs ADD COLUMN clip_path TEXT")
+    if version < 3:
+        conn.execute('''CREATE TABLE IF NOT EXISTS alarm_rollups
+                  (granularity TEXT NOT NULL,
+                   bucket INTEGER NOT NULL,
+                   location TEXT NOT NULL,
+                   alarm_type TEXT NOT NULL,
+                   count INTEGER NOT NULL,
+                   PRIMARY KEY (granularity, bucket, location, alarm_type)) WITHOUT ROWID''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_alarm_rollups_location "
+                     "ON alarm_rollups (granularity, location, bucket)")
+        conn.execute("DELETE FROM alarm_rollups")
+        # 整数除法即向下取整（时间戳均为正数），与 bucket_start 一致
+        for granularity, size in ROLLUPS.items():
+            conn.execute("INSERT INTO alarm_rollups "
+                         "SELECT ?, (CAST(alarm_ts AS INTEGER) + ?) / ? * ? - ? AS b, "
+                         "COALESCE(location, '未知'), alarm_type, COUNT(*) FROM alarm_logs "
+                         "WHERE alarm_ts IS NOT NULL GROUP BY b, 3, 4",
+                         (granularity, ROLLUP_OFFSET, size, size, ROLLUP_OFFSET))
+    if version < 4:
+        conn.execute("UPDATE alarm_logs SET location = '未知' WHERE location IS NULL")
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+def _rollup_rows(batch):
+    """一批待写入记录对各汇总桶的增量"""
+    counts = Counter()
+    for _, ts, alarm_type, location, _, _ in batch:
+        for granularity in ROLLUPS:
+            counts[granularity, bucket_start(ts, granularity), location, alarm_type] += 1
+    return [key + (n,) for key, n in counts.items()]
+
+
+def _filters(start, end, location):
+    clauses = []
+    params = []
+    if start is not None:
+        clauses.append("alarm_ts >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("alarm_ts < ?")
+        params.append(end)
+    if location is not None:
+        clauses.append("location = ?")
+        params.append(location)
+    return clauses, params
+
+
+class AlarmLogStore:
+    """报警日志仓库
+
+    add() 只把记录放入队列；写线程每次取出最多 batch_size 条（或等待 flush_interval 秒）
+    在同一个事务中提交。提交失败时按指数退避重试，仍失败则逐条写入，
+    只有写不进去的记录才丢弃并计入 failed。
+    """
+
+    def __init__(self, db_path="users.db", batch_size=500, flush_interval=0.2, max_retries=3,
+                 retry_backoff=0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # 最终没能写入的记录数
+        self.failed = 0
+
+        self._write_conn = self._connect()
+        migrate(self._write_conn)
+        # 读连接供查询使用，WAL 模式下读写互不阻塞
+        self._read_conn = self._connect()
+        self._read_conn.row_factory = sqlite3.Row
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._writer_loop, name="alarm-store-writer",
+                                        daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, alarm_type, location=None, description=None, ts=None, clip_path=None):
+        ts = time.time() if ts is None else ts
+        self._queue.put((datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S'), ts,
+                         alarm_type, location or "未知", description or "无", clip_path))
+
+    def flush(self):
+        """等待已提交的记录全部写入"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._write_conn.close()
+        self._read_conn.close()
+
+    def _writer_loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(batch)
+            finally:
+                # 无论成败都要标记完成，否则 flush() 会一直等待
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _commit(self, batch):
+        """写入一批记录；任何异常都不会让写线程退出"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write_batch(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"报警日志写入失败（{len(batch)} 条），改为逐条写入: {e}")
+                else:
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+        # 整批失败可能只是其中某一条有问题，逐条写入把其余记录保住
+        for row in batch:
+            try:
+                self._write_batch([row])
+            except Exception as e:
+                self.failed += 1
+                print(f"报警日志写入失败，已丢弃 {row}: {e}")
+
+    def _write_batch(self, batch):
+        with self._write_conn:
+            self._write_conn.executemany(
+                "INSERT INTO alarm_logs (alarm_time, alarm_ts, alarm_type, location, description, "
+                "clip_path) VALUES (?, ?, ?, ?, ?, ?)", batch)
+            # 汇总在同一事务中更新，一批记录对同一个桶只写一次
+            self._write_conn.executemany(
+                "INSERT INTO alarm_rollups VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, bucket, location, alarm_type) "
+                "DO UPDATE SET count = count + excluded.count", _rollup_rows(batch))
+
+    def query(self, start=None, end=None, location=None, limit=100, cursor=None):
+        """按时间倒序查询报警记录
+
+        start/end 为 epoch 秒（左闭右开）；cursor 为上一页返回的游标。
+        返回 (记录列表, 下一页游标)，没有更多记录时游标为 None。
+        """
+        clauses, params = _filters(start, end, location)
+        if cursor is not None:
+            clauses.append("(alarm_ts, id) < (?, ?)")
+            params.extend(cursor)
+
+        sql = ("SELECT id, alarm_time, alarm_ts, alarm_type, location, description, clip_path "
+               "FROM alarm_logs")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY alarm_ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._read_lock:
+            rows = [dict(row) for row in self._read_conn.execute(sql, params)]
+        next_cursor = (rows[-1]["alarm_ts"], rows[-1]["id"]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def count(self, start=None, end=None, location=None):
+        """时间范围内的报警次数，由汇总表计算"""
+        return sum(self.location_counts(start, end, location).values())
+
+    def location_counts(self, start=None, end=None, location=None):
+        """时间范围内各位置的报警次数 {位置: 次数}"""
+        start = 0 if start is None else start
+        end = _FAR_FUTURE if end is None else end
+        with self._read_lock:
+            return dict(self._cover(start, end, location, 0))
+
+    def _cover(self, start, end, location, level):
+        """把 [start, end) 拆成从粗到细的整桶，两端不足一分钟的部分查原始记录"""
+        counts = Counter()
+        if start >= end:
+            return counts
+        if level == len(ROLLUPS):
+            clauses, params = _filters(start, end, location)
+            sql = ("SELECT COALESCE(location, '未知'), COUNT(*) FROM alarm_logs WHERE "
+                   + " AND ".join(clauses) + " GROUP BY 1")
+            counts.update(dict(self._read_conn.execute(sql, params).fetchall()))
+            return counts
+
+        granularity, size = list(ROLLUPS.items())[level]
+        first, last = _align_up(start, size), _align_down(end, size)
+        if first >= last:
+            return self._cover(start, end, location, level + 1)
+        sql = ("SELECT location, SUM(count) FROM alarm_rollups "
+               "WHERE granularity = ? AND bucket >= ? AND bucket < ?")
+        params = [granularity, first, last]
+        if location is not None:
+            sql += " AND location = ?"
+            params.append(location)
+        counts.update(dict(self._read_conn.execute(sql + " GROUP BY location", params).fetchall()))
+        counts.update(self._cover(start, first, location, level + 1))
+        counts.update(self._cover(last, end, location, level + 1))
+        return counts
+
+    def series(self, granularity, start=None, end=None, location=None, alarm_type=None):
+        """按粒度返回 [(桶起点, 次数)]，只包含有报警的桶；start/end 按桶起点过滤"""
+        sql = "SELECT bucket, SUM(count) FROM alarm_rollups WHERE granularity = ?"
+        params = [granularity]
+        if start is not None:
+            sql += " AND bucket >= ?"
+            params.append(bucket_start(start, granularity))
+        if end is not None:
+            sql += " AND bucket < ?"
+            params.append(end)
+        if location is not None:
+            sql += " AND location = ?"
+            params.append(location)
+        if alarm_type is not None:
+            sql += " AND alarm_type = ?"
+            params.append(alarm_type)
+        sql += " GROUP BY bucket ORDER BY bucket"
+        with self._read_lock:
+            return [tuple(row) for row in self._read_conn.execute(sql, params)]
+
+    def locations(self):
+        """出现过报警的位置，按报警次数从多到少"""
+        with self._read_lock:
+            return [row[0] for row in self._read_conn.execute(
+                "SELECT location FROM alarm_rollups WHERE granularity = 'day' "
+                "GROUP BY location ORDER BY SUM(count) DESC")]
@@ -0,0 +1,140 @@
+"""程序入口：登录窗口
+
+只依赖标准库，登录窗口可以立即显示；监控界面及 OpenCV 等重量级模块在
+后台线程中预先导入，登录成功后再创建主界面。
+
+用法: python -m fire_monitor
+"""
+
+import hashlib
+import sqlite3
+import threading
+import tkinter as tk
+from tkinter import messagebox
+
+from .alarm_store import migrate
+from .config import THEME
+
+DB_PATH = 'users.db'
+
+
+# 初始化数据库
+def init_db(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+               username TEXT UNIQUE NOT NULL,
+               password TEXT NOT NULL)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS alarm_logs
+              (id INTEGER PRIMARY KEY AUTOINCREMENT,
+               alarm_time TEXT NOT NULL,
+               alarm_type TEXT NOT NULL,
+               location TEXT,
+               description TEXT)''')
+    # 升级报警日志表（时间戳列及索引）
+    migrate(conn)
+    # 添加一个测试用户
+    try:
+        hashed_pwd = hashlib.sha256("123456".encode()).hexdigest()
+        c.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                  ("admin", hashed_pwd))
+        conn.commit()
+    except sqlite3.IntegrityError:
+        pass
+    conn.close()
+
+
+def check_login(username, password, db_path=DB_PATH):
+    """校验用户名和密码"""
+    hashed_pwd = hashlib.sha256(password.encode()).hexdigest()
+
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT * FROM users WHERE username=? AND password=?",
+              (username, hashed_pwd))
+    user = c.fetchone()
+    conn.close()
+    return user is not None
+
+
+def _preload():
+    """后台导入监控界面（OpenCV、numpy、PIL），用户输入密码期间完成"""
+    try:
+        from . import ui  # noqa: F401
+    except Exception as e:
+        print(f"预加载监控界面失败: {e}")
+
+
+def main():
+    # 创建登录窗口
+    login_window = tk.Tk()
+    login_window.title("火灾预警系统 - 用户登录")
+    login_window.geometry("400x300")
+    login_window.resizable(False, False)
+    login_window.configure(bg=THEME["background"])
+
+    # 窗口居中
+    window_width = 400
+    window_height = 300
+    screen_width = login_window.winfo_screenwidth()
+    screen_height = login_window.winfo_screenheight()
+    x = (screen_width // 2) - (window_width // 2)
+    y = (screen_height // 2) - (window_height // 2)
+    login_window.geometry(f"{window_width}x{window_height}+{x}+{y}")
+
+    # 创建标题标签
+    title_label = tk.Label(login_window, text="火灾预警系统登录",
+                           font=("微软雅黑", 20), bg=THEME["background"])
+    title_label.pack(pady=20)
+
+    # 用户名输入框
+    input_frame = tk.Frame(login_window, bg=THEME["background"])
+    input_frame.pack(pady=10)
+
+    tk.Label(input_frame, text="用户名:", font=("微软雅黑", 12),
+             bg=THEME["background"]).grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    username_entry = tk.Entry(input_frame, font=("微软雅黑", 12), width=20)
+    username_entry.grid(row=0, column=1, padx=5, pady=5)
+
+    # 密码输入框
+    tk.Label(input_frame, text="密  码:", font=("微软雅黑", 12),
+             bg=THEME["background"]).grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    password_entry = tk.Entry(input_frame, show="*", font=("微软雅黑", 12), width=20)
+    password_entry.grid(row=1, column=1, padx=5, pady=5)
+
+    # 登录验证
+    def login():
+        username = username_entry.get()
+        password = password_entry.get()
+
+        if not username or not password:
+            messagebox.showerror("错误", "用户名和密码不能为空")
+            return
+
+        if check_login(username, password):
+            login_window.destroy()
+            from .ui import show_video_analysis_system
+            show_video_analysis_system(username)
+        else:
+            messagebox.showerror("登录失败", "用户名或密码错误")
+
+    # 登录按钮
+    login_button = tk.Button(login_window, text="登录", command=login,
+                             bg=THEME["primary"], fg=THEME["text"],
+                             font=("微软雅黑", 12), width=15,
+                             activebackground=THEME["accent"], activeforeground=THEME["text"])
+    login_button.pack(pady=20)
+
+    # 初始化数据库
+    init_db()
+
+    # 登录窗口显示后再预加载监控界面
+    threading.Thread(target=_preload, name="preload-ui", daemon=True).start()
+
+    # 运行登录窗口
+    login_window.mainloop()
+
+
+if __name__ == "__main__":
+    main()
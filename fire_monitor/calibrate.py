@@ -0,0 +1,362 @@
+"""检测阈值标定
+
+对标注好的视频逐帧统计 HSV 直方图并缓存到磁盘（每段视频只解码一次），之后在直方图上
+用 NumPy 向量化地评估成千上万组 颜色阈值 × 面积比例阈值 的组合，输出精确率/召回率曲线
+和推荐配置。
+
+直方图的分箱边界取自候选阈值，因此每个候选组合的火焰颜色像素数都是精确的；修改候选
+阈值后缓存会自动重新生成。形态学去噪、运动门控不在直方图中体现，推荐配置建议再用
+offline_scan 在录像上复核。
+
+标注文件（JSON，路径相对于标注文件所在目录）:
+    {"clips": [{"path": "fire1.mp4", "fire": true},
+               {"path": "night.mp4", "fire": false},
+               {"path": "mixed.mp4", "fire": [[12.0, 30.5], [61.0, 75.0]]}]}
+其中区间单位为秒，区间内的帧视为有火。
+
+用法:
+    python -m fire_monitor.calibrate labels.json --output calib.json
+    python -m fire_monitor.calibrate --fire a.mp4 b.mp4 --nofire c.mp4 --step 2
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from .detector import DETECTOR_CONFIG
+
+CALIB_CONFIG = {
+    # 候选阈值：低色调段为 [0, hue_low_max]，高色调段为 [hue_high_min, 180]，两段共用 S/V 下限
+    "hue_low_max": (10, 15, 20, 25, 30, 35),
+    "hue_high_min": (150, 155, 160, 165, 170),
+    "sat_min": (40, 60, 80, 100, 120, 140, 160, 180, 200),
+    "val_min": (40, 70, 100, 130, 160, 190, 220),
+    "ratios": (0.001, 0.002, 0.005, 0.01, 0.02, 0.03, 0.05, 0.08, 0.12),
+    "step": 1,  # 每隔多少帧统计一帧
+    "max_width": 640,  # 宽度超过该值的画面先缩小再统计（比例基本不变，解码后的开销更小）
+    "cache_dir": "calib_cache",
+    "beta": 1.0  # 按 F-beta 选推荐配置，大于1更看重召回率
+}
+
+_GRID_KEYS = ("hue_low_max", "hue_high_min", "sat_min", "val_min")
+
+
+def hist_edges(grid):
+    """由候选阈值得到 H/S/V 三个通道的分箱边界，数值 x 落在第 searchsorted(edges, x, 'right') 个箱"""
+    if max(grid["hue_low_max"]) >= min(grid["hue_high_min"]):
+        raise ValueError("hue_low_max 必须都小于 hue_high_min")
+    hue = sorted({h + 1 for h in grid["hue_low_max"]} | set(grid["hue_high_min"]))
+    return [hue, sorted(set(grid["sat_min"])), sorted(set(grid["val_min"]))]
+
+
+class HistogramBuilder:
+    """按分箱边界统计单帧 HSV 直方图"""
+
+    def __init__(self, edges, max_width=None):
+        self.edges = edges
+        self.shape = tuple(len(e) + 1 for e in edges)
+        self.bins = int(np.prod(self.shape))
+        self.max_width = max_width
+        values = np.arange(256)
+        self._lut = np.stack([np.searchsorted(e, values, side="right") for e in edges],
+                             axis=1).astype(np.uint8).reshape(1, 256, 3)
+        self._hsv = None
+        self._index = None
+
+    def __call__(self, frame):
+        """返回 (直方图, 像素数)"""
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            scale = self.max_width / width
+            frame = cv2.resize(frame, (self.max_width, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        if self._hsv is None or self._hsv.shape != frame.shape:
+            self._hsv = np.empty(frame.shape, np.uint8)
+            self._index = np.empty(frame.shape[:2], np.uint16)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        binned = cv2.LUT(self._hsv, self._lut, dst=self._hsv)
+
+        # 三个通道的箱号合并为一个下标
+        _, s_bins, v_bins = self.shape
+        index = self._index
+        np.multiply(binned[..., 0], s_bins * v_bins, out=index, dtype=np.uint16)
+        index += binned[..., 1] * np.uint16(v_bins)
+        index += binned[..., 2]
+        hist = np.bincount(index.ravel(), minlength=self.bins).astype(np.uint32)
+        return hist, index.size
+
+
+def _cache_path(path, edges, options):
+    stat = os.stat(path)
+    key = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, edges,
+                      options["step"], options["max_width"]])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(options["cache_dir"], f"{name}-{digest}.npz")
+
+
+def clip_histograms(path, edges, options):
+    """返回一段视频的 (直方图[N, bins], 像素数[N], 时间戳ms[N])，已缓存时直接读取"""
+    cache = _cache_path(path, edges, options)
+    if os.path.exists(cache):
+        with np.load(cache) as data:
+            return data["hists"], data["pixels"], data["pos_ms"]
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {path}")
+    build = HistogramBuilder(edges, options["max_width"])
+    hists, pixels, positions = [], [], []
+    try:
+        index = 0
+        while True:
+            if index % options["step"]:
+                if not cap.grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                hist, count = build(frame)
+                hists.append(hist)
+                pixels.append(count)
+                positions.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+            index += 1
+    finally:
+        cap.release()
+
+    hists = np.array(hists, np.uint32).reshape(-1, build.bins)
+    pixels = np.array(pixels, np.int64)
+    positions = np.array(positions, np.float64)
+
+    # 先写临时文件再改名，中断时不会留下损坏的缓存
+    os.makedirs(options["cache_dir"], exist_ok=True)
+    tmp = cache + ".tmp.npz"
+    np.savez_compressed(tmp, hists=hists, pixels=pixels, pos_ms=positions)
+    os.replace(tmp, cache)
+    return hists, pixels, positions
+
+
+def frame_labels(fire, pos_ms):
+    """由标注（True/False 或 [[起, 止], ...] 秒）得到逐帧标签"""
+    if isinstance(fire, bool):
+        return np.full(len(pos_ms), fire)
+    labels = np.zeros(len(pos_ms), bool)
+    for start, end in fire:
+        labels |= (pos_ms >= start * 1000) & (pos_ms <= end * 1000)
+    return labels
+
+
+def load_labels(path):
+    with open(path, encoding="utf-8") as f:
+        clips = json.load(f)["clips"]
+    base = os.path.dirname(os.path.abspath(path))
+    return [(os.path.join(base, clip["path"]), clip["fire"]) for clip in clips]
+
+
+def _init_worker():
+    # 并行时每个进程只用一个线程，避免 OpenCV 线程互相争抢
+    cv2.setNumThreads(1)
+
+
+def build_dataset(clips, edges, options, workers=1):
+    """统计（或读取缓存）所有视频的直方图，返回 (直方图, 像素数, 标签)"""
+    if workers > 1 and len(clips) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(clips)),
+                                 mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker) as pool:
+            futures = [pool.submit(clip_histograms, path, edges, options) for path, _ in clips]
+            results = [future.result() for future in futures]
+    else:
+        results = [clip_histograms(path, edges, options) for path, _ in clips]
+
+    hists = np.concatenate([r[0] for r in results])
+    pixels = np.concatenate([r[1] for r in results])
+    labels = np.concatenate([frame_labels(fire, r[2]) for (_, fire), r in zip(clips, results)])
+    return hists, pixels, labels
+
+
+def candidate_ratios(hists, pixels, edges, grid):
+    """每帧在每组颜色阈值下的火焰像素比例，形状 [N, 低色调, 高色调, S, V]"""
+    shape = tuple(len(e) + 1 for e in edges)
+    counts = hists.reshape((-1,) + shape).astype(np.int64)
+
+    # S、V 方向做后缀和：第 j 个下限对应箱号 >= j+1 的像素
+    counts = counts[:, :, ::-1, ::-1].cumsum(axis=2).cumsum(axis=3)[:, :, ::-1, ::-1]
+    hue_edges, sat_edges, val_edges = edges
+    s_index = [sat_edges.index(s) + 1 for s in grid["sat_min"]]
+    v_index = [val_edges.index(v) + 1 for v in grid["val_min"]]
+    counts = counts[:, :, s_index][:, :, :, v_index]
+
+    # H 方向前缀和：prefix[:, k] 为箱号 < k 的像素数
+    prefix = np.zeros((counts.shape[0], shape[0] + 1) + counts.shape[2:], np.int64)
+    np.cumsum(counts, axis=1, out=prefix[:, 1:])
+    low = prefix[:, [hue_edges.index(h + 1) + 1 for h in grid["hue_low_max"]]]
+    high = prefix[:, -1:] - prefix[:, [hue_edges.index(h) + 1 for h in grid["hue_high_min"]]]
+
+    fire = low[:, :, None] + high[:, None]
+    return fire / pixels.reshape((-1,) + (1,) * (fire.ndim - 1))
+
+
+def score(ratios, labels, thresholds, beta=1.0, chunk=4096):
+    """评估所有组合，返回 precision/recall/fscore，形状为 ratios.shape[1:] + (阈值数,)"""
+    combos = ratios.reshape(len(ratios), -1)
+    thresholds = np.asarray(thresholds, np.float64)
+    tp = np.zeros((combos.shape[1], len(thresholds)), np.int64)
+    fp = np.zeros_like(tp)
+    # 分块累加，避免 [帧 × 组合 × 阈值] 的布尔数组过大
+    for start in range(0, len(combos), chunk):
+        predicted = combos[start:start + chunk, :, None] > thresholds
+        positive = labels[start:start + chunk, None, None]
+        tp += (predicted & positive).sum(axis=0)
+        fp += (predicted & ~positive).sum(axis=0)
+
+    positives = max(1, int(labels.sum()))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = tp / positives
+        b2 = beta * beta
+        fscore = np.where(precision + recall > 0,
+                          (1 + b2) * precision * recall / (b2 * precision + recall), 0.0)
+    shape = ratios.shape[1:] + (len(thresholds),)
+    return precision.reshape(shape), recall.reshape(shape), fscore.reshape(shape)
+
+
+def to_detector_config(grid, index):
+    """组合下标 -> 检测器配置"""
+    h1, h2, s, v, r = index
+    sat, val = grid["sat_min"][s], grid["val_min"][v]
+    return {
+        "lower_fire": (0, sat, val),
+        "upper_fire": (grid["hue_low_max"][h1], 255, 255),
+        "lower_fire2": (grid["hue_high_min"][h2], sat, val),
+        "upper_fire2": (180, 255, 255),
+        "ratio_threshold": grid["ratios"][r]
+    }
+
+
+def _config_index(grid, config):
+    """检测器配置 -> 组合下标；不在候选网格中时返回 None"""
+    try:
+        return (grid["hue_low_max"].index(config["upper_fire"][0]),
+                grid["hue_high_min"].index(config["lower_fire2"][0]),
+                grid["sat_min"].index(config["lower_fire"][1]),
+                grid["val_min"].index(config["lower_fire"][2]),
+                grid["ratios"].index(config["ratio_threshold"]))
+    except ValueError:
+        return None
+
+
+def pareto_front(precision, recall):
+    """精确率/召回率的帕累托前沿（召回率从高到低），返回组合下标列表"""
+    flat_p, flat_r = precision.ravel(), recall.ravel()
+    order = np.lexsort((-flat_p, -flat_r))
+    front = []
+    best = -1.0
+    for i in order:
+        if flat_p[i] > best:
+            best = flat_p[i]
+            front.append(np.unravel_index(i, precision.shape))
+    return front
+
+
+def calibrate(clips, options=None, workers=1):
+    """标定入口，返回推荐配置、当前配置的得分以及精确率/召回率曲线"""
+    options = dict(CALIB_CONFIG, **(options or {}))
+    grid = {key: list(options[key]) for key in _GRID_KEYS + ("ratios",)}
+    edges = hist_edges(grid)
+
+    start = time.perf_counter()
+    hists, pixels, labels = build_dataset(clips, edges, options, workers)
+    load_elapsed = time.perf_counter() - start
+    if not labels.any() or labels.all():
+        raise ValueError("标注中需要同时包含有火和无火的帧")
+
+    start = time.perf_counter()
+    ratios = candidate_ratios(hists, pixels, edges, grid)
+    precision, recall, fscore = score(ratios, labels, grid["ratios"], options["beta"])
+    score_elapsed = time.perf_counter() - start
+
+    def entry(index):
+        index = tuple(int(i) for i in index)
+        return {"config": to_detector_config(grid, index), "precision": float(precision[index]),
+                "recall": float(recall[index]), "fscore": float(fscore[index])}
+
+    # F 值最高者中取精确率最高的
+    best = np.lexsort((-precision.ravel(), -fscore.ravel()))[0]
+    best = np.unravel_index(best, fscore.shape)
+    current = _config_index(grid, DETECTOR_CONFIG)
+
+    return {
+        "frames": int(len(labels)),
+        "fire_frames": int(labels.sum()),
+        "combinations": int(fscore.size),
+        "load_elapsed": load_elapsed,
+        "score_elapsed": score_elapsed,
+        "recommended": entry(best),
+        "current": entry(current) if current is not None else None,
+        # 推荐颜色阈值下，面积比例阈值变化时的曲线
+        "ratio_curve": [entry(best[:4] + (r,)) for r in range(len(grid["ratios"]))],
+        "pareto": [entry(index) for index in pareto_front(precision, recall)]
+    }
+
+
+def _format(entry):
+    config = entry["config"]
+    return (f"H[0,{config['upper_fire'][0]}]+[{config['lower_fire2'][0]},180] "
+            f"S>={config['lower_fire'][1]} V>={config['lower_fire'][2]} "
+            f"比例>{config['ratio_threshold']:g}  精确率 {entry['precision']:.3f}  "
+            f"召回率 {entry['recall']:.3f}  F {entry['fscore']:.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检测阈值标定")
+    parser.add_argument("labels", nargs="?", default=None, help="标注文件 (JSON)")
+    parser.add_argument("--fire", nargs="+", default=[], help="整段有火的视频")
+    parser.add_argument("--nofire", nargs="+", default=[], help="整段无火的视频")
+    parser.add_argument("--step", type=int, default=CALIB_CONFIG["step"], help="每隔多少帧统计一帧")
+    parser.add_argument("--beta", type=float, default=CALIB_CONFIG["beta"], help="F-beta 中的 beta")
+    parser.add_argument("--cache-dir", default=CALIB_CONFIG["cache_dir"], help="直方图缓存目录")
+    parser.add_argument("--workers", type=int, default=1, help="并行统计直方图的进程数")
+    parser.add_argument("--output", default=None, help="把结果保存为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    clips = load_labels(args.labels) if args.labels else []
+    clips += [(path, True) for path in args.fire] + [(path, False) for path in args.nofire]
+    if not clips:
+        parser.error("请提供标注文件或 --fire/--nofire 视频")
+
+    result = calibrate(clips, {"step": args.step, "beta": args.beta, "cache_dir": args.cache_dir},
+                       workers=args.workers)
+
+    print(f"{result['frames']} 帧（有火 {result['fire_frames']}），读取直方图 {result['load_elapsed']:.1f} 秒，"
+          f"评估 {result['combinations']} 组参数 {result['score_elapsed']:.2f} 秒", file=sys.stderr)
+    if result["current"] is not None:
+        print(f"当前配置: {_format(result['current'])}")
+    print(f"推荐配置: {_format(result['recommended'])}")
+    print("\n推荐颜色阈值下的比例阈值曲线:")
+    for entry in result["ratio_curve"]:
+        print(f"  比例>{entry['config']['ratio_threshold']:<8g} 精确率 {entry['precision']:.3f}  "
+              f"召回率 {entry['recall']:.3f}")
+    print("\n精确率/召回率前沿:")
+    for entry in result["pareto"]:
+        print(f"  {_format(entry)}")
+
+    print("\n推荐的 DETECTOR_CONFIG:")
+    for key, value in result["recommended"]["config"].items():
+        print(f'    "{key}": {value},')
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
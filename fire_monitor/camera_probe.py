@@ -0,0 +1,134 @@
+"""本地摄像头探测
+
+逐个打开摄像头很慢（不存在的设备也要等驱动超时），这里对每个编号各起
+一个线程并行探测，整体有超时上限，结果缓存一段时间供界面直接使用。
+
+超时的探测线程仍占用着设备：在它结束之前，该编号不再重复探测，结果也不缓存；
+打开摄像头之前应先调用 wait_idle() 等它释放设备。
+
+用法: python -m fire_monitor.camera_probe
+"""
+
+import threading
+import time
+
+import cv2
+
+# 探测配置
+PROBE_CONFIG = {
+    "indexes": (0, 1, 2, 3),  # 要探测的摄像头编号
+    "timeout": 3.0,  # 整体等待上限（秒），超时未返回的设备视为不可用
+    "ttl": 60.0,  # 探测结果缓存时间（秒）
+}
+
+_lock = threading.Lock()
+_cache = {"result": None, "time": 0.0, "indexes": None}
+# 超时后仍在运行（仍占用设备）的探测线程：编号 -> 线程
+_in_flight = {}
+
+
+def _probe_one(index, results):
+    """打开一个摄像头并读一帧，成功则记录分辨率和帧率"""
+    cap = cv2.VideoCapture(index)
+    try:
+        if not cap.isOpened():
+            return
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        results[index] = {
+            "index": index,
+            "width": frame.shape[1],
+            "height": frame.shape[0],
+            "fps": fps if fps > 0 else None,
+        }
+    except cv2.error:
+        pass
+    finally:
+        cap.release()
+
+
+def probe_cameras(indexes=None, timeout=None, refresh=False):
+    """并行探测摄像头，返回可用设备列表（按编号排序），结果在有效期内直接复用"""
+    indexes = tuple(PROBE_CONFIG["indexes"] if indexes is None else indexes)
+    timeout = PROBE_CONFIG["timeout"] if timeout is None else timeout
+
+    with _lock:
+        cached = _cache["result"]
+        if (not refresh and cached is not None and _cache["indexes"] == indexes
+                and time.monotonic() - _cache["time"] < PROBE_CONFIG["ttl"]):
+            return list(cached)
+
+        for index, thread in list(_in_flight.items()):
+            if not thread.is_alive():
+                del _in_flight[index]
+        # 上一次超时的探测还占用着设备，本次跳过这些编号
+        busy = [index for index in indexes if index in _in_flight]
+
+        results = {}
+        threads = {index: threading.Thread(target=_probe_one, args=(index, results),
+                                           name=f"camera-probe-{index}", daemon=True)
+                   for index in indexes if index not in _in_flight}
+        for thread in threads.values():
+            thread.start()
+
+        # 卡在驱动里的线程不再等待，守护线程不会阻止程序退出
+        deadline = time.monotonic() + timeout
+        for index, thread in threads.items():
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                _in_flight[index] = thread
+
+        # 只取快照中的结果，超时线程之后写入的不算
+        snapshot = dict(results)
+        cameras = [snapshot[index] for index in sorted(snapshot)]
+        if busy or any(index in _in_flight for index in threads):
+            # 有设备未探测完，不缓存，下次调用时重新探测这些编号
+            _cache.update(result=None, time=0.0, indexes=None)
+        else:
+            _cache.update(result=cameras, time=time.monotonic(), indexes=indexes)
+        return list(cameras)
+
+
+def wait_idle(index, timeout=None):
+    """等待该编号上超时的探测线程释放设备；返回设备是否已空闲"""
+    with _lock:
+        thread = _in_flight.get(index)
+    if thread is not None:
+        thread.join(timeout)
+        if thread.is_alive():
+            return False
+        with _lock:
+            if _in_flight.get(index) is thread:
+                del _in_flight[index]
+    return True
+
+
+def probe_async(callback=None, **kwargs):
+    """在后台线程中探测，完成后以设备列表调用 callback"""
+    def worker():
+        cameras = probe_cameras(**kwargs)
+        if callback is not None:
+            callback(cameras)
+
+    thread = threading.Thread(target=worker, name="camera-probe", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    start = time.perf_counter()
+    cameras = probe_cameras(refresh=True)
+    elapsed = time.perf_counter() - start
+    if not cameras:
+        print(f"未发现可用摄像头 ({elapsed:.2f} 秒)")
+        return
+    for camera in cameras:
+        fps = f"{camera['fps']:.1f}" if camera["fps"] else "未知"
+        print(f"摄像头{camera['index']}: {camera['width']}x{camera['height']} FPS {fps}")
+    print(f"探测耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""级联检测：颜色阈值给出候选区域，小型 ONNX 分类模型确认
+
+颜色检测误报率高，但对每一帧全图跑 CNN 在纯 CPU 机器上太慢。这里只把颜色掩膜中的候选区域
+裁剪缩放后送入分类模型：各帧、各路视频流的候选区域由同一个后台线程凑成批量推理，批量达到
+batch_size 或最早的请求等待超过 deadline 就立即推理。分类结果按跟踪区域编号缓存，同一区域
+在有效期内、面积变化不大时不重复分类。
+
+需要安装 onnxruntime（只使用 CPUExecutionProvider）。模型输入为 N×3×H×W 的 RGB 浮点图像。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from .metrics import METRICS
+
+# 级联检测默认参数
+CASCADE_CONFIG = {
+    "model": "models/fire_classifier.onnx",
+    "input_size": 64,  # 模型输入边长
+    "mean": (0.485, 0.456, 0.406),  # 输入归一化（RGB，0~1 之后）
+    "std": (0.229, 0.224, 0.225),
+    "output": "softmax",  # 模型输出：softmax（N×类别数 logits）/ sigmoid（logit）/ prob（已是概率）
+    "fire_index": 1,  # 火焰类别在输出中的下标
+    "threshold": 0.5,  # 火焰概率不低于该值视为确认
+    "batch_size": 16,  # 单次推理的最大批量
+    "deadline": 0.03,  # 最早的请求最多等待多久（秒）就开始推理，不再凑批
+    "threads": 1,  # onnxruntime 线程数
+    "margin": 0.15,  # 裁剪时外扩外接框的比例
+    "cache_ttl": 1.0,  # 区域分类结果的有效期（秒）
+    "recheck_area": 2.0  # 区域面积变化超过该倍数时重新分类
+}
+
+
+class OnnxClassifier:
+    """onnxruntime CPU 推理；predict 输入预处理好的 N×3×H×W float32，返回火焰概率 N"""
+
+    def __init__(self, model, threads=1, output="softmax", fire_index=1):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("级联检测需要安装 onnxruntime: pip install onnxruntime") from None
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output = output
+        self.fire_index = fire_index
+
+    def predict(self, batch):
+        out = self.session.run(None, {self.input_name: batch})[0]
+        out = out.reshape(len(batch), -1).astype(np.float64)
+        if self.output == "softmax":
+            out = np.exp(out - out.max(axis=1, keepdims=True))
+            out /= out.sum(axis=1, keepdims=True)
+        elif self.output == "sigmoid":
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out[:, self.fire_index if out.shape[1] > 1 else 0]
+
+
+class BatchClassifier:
+    """跨帧、跨视频流的批量分类线程；submit 返回 Future，结果为火焰概率"""
+
+    def __init__(self, model, batch_size=CASCADE_CONFIG["batch_size"], deadline=CASCADE_CONFIG["deadline"],
+                 input_size=CASCADE_CONFIG["input_size"], mean=CASCADE_CONFIG["mean"],
+                 std=CASCADE_CONFIG["std"]):
+        self.model = model
+        self.batch_size = batch_size
+        self.deadline = deadline
+        self.input_size = input_size
+        # 归一化合并为一次乘加：(x / 255 - mean) / std
+        self._scale = (1.0 / (255.0 * np.asarray(std, np.float32))).reshape(1, 3, 1, 1)
+        self._offset = (-np.asarray(mean, np.float32) / np.asarray(std, np.float32)).reshape(1, 3, 1, 1)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self.batches = 0
+        self.classified = 0
+        self._thread = threading.Thread(target=self._run, name="cascade-classifier", daemon=True)
+
+    @classmethod
+    def from_config(cls, **config):
+        config = dict(CASCADE_CONFIG, **config)
+        model = OnnxClassifier(config["model"], config["threads"], config["output"],
+                               config["fire_index"])
+        return cls(model, config["batch_size"], config["deadline"], config["input_size"],
+                   config["mean"], config["std"])
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, crop):
+        """crop 为缩放到 input_size 的 BGR 图像"""
+        future = Future()
+        self._queue.put((time.monotonic(), crop, future))
+        return future
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            # 从最早的请求入队起计时，凑满或超时即推理
+            until = first[0] + self.deadline
+            while len(batch) < self.batch_size:
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._classify(batch)
+
+    def _classify(self, batch):
+        futures = [future for _, _, future in batch]
+        try:
+            with METRICS.timer("cascade_infer"):
+                crops = np.stack([crop for _, crop, _ in batch])
+                # N×H×W×BGR -> N×RGB×H×W
+                tensor = crops[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32)
+                tensor *= self._scale
+                tensor += self._offset
+                probs = self.model.predict(np.ascontiguousarray(tensor))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.classified += len(batch)
+        METRICS.set_gauge("cascade_batch_size", len(batch))
+        for future, prob in zip(futures, probs):
+            future.set_result(float(prob))
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        # 未处理的请求直接取消，等待中的调用方不会卡住
+        while True:
+            try:
+                _, _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+
+
+class _Entry:
+    __slots__ = ("prob", "time", "area", "future", "failed")
+
+    def __init__(self, area, future, prob=None, time=None):
+        self.prob = prob
+        self.time = time
+        self.area = area
+        self.future = future
+        # 上一次分类失败；time 为失败时间，cache_ttl 之后才重新提交
+        self.failed = False
+
+
+class CascadeStage:
+    """单路视频流的第二级确认：按跟踪区域缓存分类结果，多路视频流可共用一个 BatchClassifier"""
+
+    def __init__(self, classifier, stream_id="default", **config):
+        unknown = set(config) - set(CASCADE_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的级联检测参数: {', '.join(sorted(unknown))}")
+        self.config = dict(CASCADE_CONFIG, **config)
+        self.classifier = classifier
+        self.stream_id = stream_id
+        self._cache = {}
+        self.probs = []
+        # 连续失败期间只提示一次
+        self._failing = False
+
+    def reset(self):
+        self._cache = {}
+        self.probs = []
+        self._failing = False
+
+    def _crop(self, frame, box):
+        x, y, w, h = box
+        margin = self.config["margin"]
+        # 外扩后取正方形，避免细长区域被拉伸
+        side = int(max(w, h) * (1 + 2 * margin))
+        cx, cy = x + w // 2, y + h // 2
+        height, width = frame.shape[:2]
+        x0, y0 = max(0, cx - side // 2), max(0, cy - side // 2)
+        x1, y1 = min(width, x0 + side), min(height, y0 + side)
+        size = self.classifier.input_size
+        return cv2.resize(frame[y0:y1, x0:x1], (size, size), interpolation=cv2.INTER_AREA)
+
+    def confirm(self, frame, tracks, wait=0.0, now=None):
+        """提交需要分类的区域，返回是否有区域被确认为火焰
+
+        wait 为等待本帧新提交结果的最长时间（秒），0 表示不等待、结果在之后的帧生效，
+        None 表示一直等到结果返回。self.probs 为各区域的火焰概率（尚无结果为 None）。
+        """
+        now = time.monotonic() if now is None else now
+        ttl = self.config["cache_ttl"]
+        recheck = self.config["recheck_area"]
+        cache = {}
+        pending = []
+        with METRICS.timer("cascade", self.stream_id):
+            for track in tracks:
+                entry = self._cache.get(track.id)
+                resubmit = entry is None
+                if entry is not None and entry.future is None:
+                    stale = now - entry.time > ttl
+                    changed = max(track.area, 1) / max(entry.area, 1)
+                    # 失败过的区域只按 cache_ttl 退避重试，面积变化不触发
+                    resized = changed > recheck or changed < 1 / recheck
+                    resubmit = stale or (resized and not entry.failed)
+                if resubmit:
+                    # 重新分类期间沿用上一次的结果
+                    future = self.classifier.submit(self._crop(frame, track.box))
+                    entry = (_Entry(track.area, future) if entry is None else
+                             _Entry(track.area, future, entry.prob, entry.time))
+                    METRICS.inc("cascade_requests", self.stream_id)
+                    pending.append(entry)
+                cache[track.id] = entry
+            # 消失的区域不再保留
+            self._cache = cache
+
+        if pending and wait != 0.0:
+            deadline = None if wait is None else time.monotonic() + wait
+            for entry in pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    entry.future.result(timeout)
+                except Exception:
+                    break
+
+        # 收取已完成的结果；推理失败的区域视为未确认，cache_ttl 之后再重新提交
+        for entry in cache.values():
+            future = entry.future
+            if future is None or not future.done():
+                continue
+            entry.future = None
+            entry.time = now
+            if future.cancelled() or future.exception() is not None:
+                entry.prob = None
+                entry.failed = True
+                METRICS.inc("cascade_failures", self.stream_id)
+                if not self._failing:
+                    self._failing = True
+                    error = future.exception() if not future.cancelled() else "已取消"
+                    print(f"级联分类失败（恢复前不再重复提示）: {error}")
+                continue
+            entry.prob = future.result()
+            entry.failed = False
+            if self._failing:
+                self._failing = False
+                print("级联分类已恢复")
+
+        self.probs = [cache[track.id].prob if track.id in cache else None for track in tracks]
+        threshold = self.config["threshold"]
+        return any(prob is not None and prob >= threshold for prob in self.probs)
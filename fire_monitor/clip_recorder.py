@@ -0,0 +1,169 @@
+"""报警录像 - 用有界环形缓冲区保存最近的帧，报警时输出报警前后的视频片段
+
+检测线程只负责把帧放入队列；JPEG 压缩和视频编码都在后台线程中完成。
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+_STOP = object()
+
+
+class FrameRingBuffer:
+    """最近若干秒的帧缓冲区
+
+    jpeg_quality 不为 None 时帧以 JPEG 压缩后保存；max_bytes 限制缓冲区总内存。
+    """
+
+    def __init__(self, seconds, fps, jpeg_quality=None, max_bytes=None):
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames = deque(maxlen=max(1, int(seconds * fps)))
+
+    def encode(self, frame):
+        if self.jpeg_quality is None:
+            return frame.copy()
+        ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return data if ok else frame.copy()
+
+    def append(self, item):
+        if len(self._frames) == self._frames.maxlen:
+            self.nbytes -= self._frames[0].nbytes
+        self._frames.append(item)
+        self.nbytes += item.nbytes
+        if self.max_bytes is not None:
+            while self.nbytes > self.max_bytes and len(self._frames) > 1:
+                self.nbytes -= self._frames.popleft().nbytes
+
+    def snapshot(self):
+        return list(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+
+def decode(item):
+    # JPEG 数据是一维数组，原始帧是三维数组
+    return cv2.imdecode(item, cv2.IMREAD_COLOR) if item.ndim == 1 else item
+
+
+class ClipRecorder:
+    """报警前后视频片段录制器
+
+    push(frame) 每帧调用一次，只复制画面放入队列；JPEG 压缩、环形缓冲区和片段收集都在
+    clip-buffer 线程中按帧序完成，写文件在 clip-writer 线程中完成，检测线程不做任何编码。
+    缓冲线程跟不上时（排队超过 max_pending 帧）直接丢弃新帧，不阻塞检测。
+
+    trigger() 在报警时调用，立即返回片段路径；片段在收集满报警后 post_seconds 秒的帧之后写入
+    文件。路径在写入之前就已记录到报警日志，写入失败时该文件不存在（失败原因会打印）。
+    """
+
+    def __init__(self, fps, pre_seconds=5, post_seconds=5, output_dir="clips",
+                 jpeg_quality=None, max_bytes=None, max_pending=8):
+        self.fps = fps if fps and fps > 0 else 30
+        self.post_frames = max(1, int(post_seconds * self.fps))
+        self.output_dir = output_dir
+        self.max_pending = max_pending
+        self.buffer = FrameRingBuffer(pre_seconds, self.fps, jpeg_quality, max_bytes)
+        # 缓冲线程来不及处理而丢弃的帧数
+        self.dropped = 0
+
+        # 正在收集报警后帧的片段: [路径, 帧列表, 剩余帧数]；只在缓冲线程中访问
+        self._recording = []
+        self._frame_queue = queue.Queue()
+        self._write_queue = queue.Queue()
+        self._buffer_thread = threading.Thread(target=self._buffer_loop, name="clip-buffer",
+                                               daemon=True)
+        self._thread = threading.Thread(target=self._encode_loop, name="clip-encoder", daemon=True)
+        self._buffer_thread.start()
+        self._thread.start()
+
+    def push(self, frame):
+        if self._frame_queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return
+        # 调用方随后会在画面上标注（或归还共享内存槽位），这里必须复制
+        self._frame_queue.put(frame.copy())
+
+    def trigger(self, tag="alarm"):
+        """开始录制一个报警片段，返回片段文件路径（在此之前放入的帧都属于报警前部分）"""
+        name = f"{tag}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.mp4"
+        path = os.path.join(self.output_dir, name)
+        self._frame_queue.put(("trigger", path))
+        return path
+
+    def close(self, wait=True, timeout=30.0):
+        """把未收集完的片段按已有帧写出；wait 为 False 时不等待编码完成"""
+        self._frame_queue.put(_STOP)
+        if wait:
+            deadline = time.monotonic() + timeout
+            self._buffer_thread.join(timeout)
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _buffer_loop(self):
+        while True:
+            item = self._frame_queue.get()
+            if item is _STOP:
+                break
+            if isinstance(item, tuple):
+                self._recording.append([item[1], self.buffer.snapshot(), self.post_frames])
+                continue
+            try:
+                # 队列中已是复制出的画面，不压缩时直接保存
+                self._add_frame(item if self.buffer.jpeg_quality is None else self.buffer.encode(item))
+            except Exception as e:
+                print(f"报警录像缓冲失败: {e}")
+        for clip in self._recording:
+            self._write_queue.put((clip[0], clip[1]))
+        self._recording = []
+        self._write_queue.put(_STOP)
+
+    def _add_frame(self, item):
+        self.buffer.append(item)
+        for clip in self._recording:
+            clip[1].append(item)
+            clip[2] -= 1
+        finished = [clip for clip in self._recording if clip[2] <= 0]
+        if finished:
+            self._recording = [clip for clip in self._recording if clip[2] > 0]
+            for clip in finished:
+                self._write_queue.put((clip[0], clip[1]))
+
+    def _encode_loop(self):
+        while True:
+            job = self._write_queue.get()
+            if job is _STOP:
+                break
+            path, items = job
+            try:
+                self._write_clip(path, items)
+            except Exception as e:
+                print(f"报警录像写入失败: {path}: {e}")
+                # 不留下写了一半的文件
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _write_clip(self, path, items):
+        if not items:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        first = decode(items[0])
+        height, width = first.shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (width, height))
+        if not writer.isOpened():
+            raise RuntimeError("无法创建视频文件")
+        try:
+            for item in items:
+                frame = decode(item)
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+        finally:
+            writer.release()
+        print(f"报警录像已保存: {path} ({len(items)} 帧)")
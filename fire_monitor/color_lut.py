@@ -0,0 +1,103 @@
+import sys
+import threading
+
+import cv2
+import numpy as np
+
+
+def _pixel_index(bgra, out):
+    """把 BGRA 图像按 32 位整数读取，得到每个像素的 24 位 BGR 编号"""
+    packed = bgra.view(np.uint32)[..., 0]
+    if sys.byteorder == "little":
+        return np.bitwise_and(packed, 0xFFFFFF, out=out)
+    return np.right_shift(packed, 8, out=out)
+
+
+def build_table(lower_fire, upper_fire, lower_fire2, upper_fire2):
+    """对全部 2^24 种 BGR 颜色执行一次原有的 HSV 分割，返回按位压缩的查找表（2MB）
+
+    颜色本身不做量化：每个通道保留完整 8 位，结果与逐帧 cvtColor + inRange 逐位一致。
+    """
+    codes = np.arange(1 << 24, dtype=np.uint32).reshape(4096, 4096)
+    colors = np.empty((4096, 4096, 3), np.uint8)
+    colors[..., 0] = codes & 0xFF
+    colors[..., 1] = (codes >> 8) & 0xFF
+    colors[..., 2] = codes >> 16
+
+    hsv = cv2.cvtColor(colors, cv2.COLOR_BGR2HSV)
+    mask = cv2.bitwise_or(cv2.inRange(hsv, np.array(lower_fire), np.array(upper_fire)),
+                          cv2.inRange(hsv, np.array(lower_fire2), np.array(upper_fire2)))
+
+    # 按查找时的编号方式排列，保证与 _pixel_index 一致
+    index = _pixel_index(cv2.cvtColor(colors, cv2.COLOR_BGR2BGRA), codes)
+    table = np.empty(1 << 24, bool)
+    table[index.ravel()] = mask.ravel() > 0
+    return np.packbits(table, bitorder="little")
+
+
+class ColorLUT:
+    """火焰颜色查找表
+
+    以按位压缩的形式保存（每种颜色 1 位），查找时展开为每种颜色 1 字节（0/255）的表，
+    一次 take 直接得到掩膜。阈值变化时调用 set_range() 重新生成。
+    """
+
+    def __init__(self, lower_fire, upper_fire, lower_fire2, upper_fire2):
+        self.bounds = None
+        self.packed = None
+        self._table = None
+        self.set_range(lower_fire, upper_fire, lower_fire2, upper_fire2)
+
+    def set_range(self, lower_fire, upper_fire, lower_fire2, upper_fire2):
+        bounds = tuple(tuple(int(v) for v in bound)
+                       for bound in (lower_fire, upper_fire, lower_fire2, upper_fire2))
+        if bounds == self.bounds:
+            return
+        self.packed, self._table = get_tables(bounds)
+        self.bounds = bounds
+
+    def classify(self, frame, dst=None, bgra=None, index=None):
+        """返回火焰颜色掩膜（0/255）
+
+        frame 可以是单帧 (H, W, 3) 或多帧 (N, H, W, 3)；dst、bgra、index 为可复用的缓冲区，
+        形状分别为 frame 去掉通道维、通道数为4、去掉通道维（uint32），可以是大缓冲区的视图。
+        """
+        if frame.ndim == 4:
+            count, height, width = frame.shape[:3]
+            if dst is None:
+                dst = np.empty((count, height, width), np.uint8)
+            # 多帧拼成一张高图处理
+            flat = np.ascontiguousarray(frame).reshape(count * height, width, 3)
+            self.classify(flat, dst.reshape(count * height, width),
+                          None if bgra is None else bgra.reshape(count * height, width, 4),
+                          None if index is None else index.reshape(count * height, width))
+            return dst
+
+        shape = frame.shape[:2]
+        if dst is None:
+            dst = np.empty(shape, np.uint8)
+        if bgra is None:
+            bgra = np.empty(shape + (4,), np.uint8)
+        if index is None:
+            index = np.empty(shape, np.uint32)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=bgra)
+        _pixel_index(bgra, index)
+        # 编号不会越界，clip 模式省去边界检查
+        np.take(self._table, index, out=dst, mode="clip")
+        return dst
+
+
+# 同一组阈值只生成一次，供各检测器共享：{bounds: (压缩表, 展开表)}
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_tables(bounds):
+    with _tables_lock:
+        tables = _tables.get(bounds)
+        if tables is None:
+            packed = build_table(*bounds)
+            table = np.unpackbits(packed, bitorder="little")
+            table *= 255
+            tables = _tables[bounds] = (packed, table)
+        return tables
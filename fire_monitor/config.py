@@ -0,0 +1,95 @@
+"""火灾预警系统配置"""
+
+# 颜色主题
+THEME = {
+    "primary": "#2c3e50",
+    "secondary": "#34495e",
+    "accent": "#e74c3c",
+    "text": "#ecf0f1",
+    "success": "#27ae60",
+    "warning": "#f39c12",
+    "danger": "#e74c3c",
+    "background": "#bdc3c7"
+}
+
+# 报警配置
+ALARM_CONFIG = {
+    "sound_alarm": True,  # 启用声音报警
+    "email_alarm": False,  # 启用邮件报警
+    "email_sender": "your_email@example.com",
+    "email_password": "your_password",
+    "email_receiver": "receiver@example.com",
+    "smtp_server": "smtp.example.com",
+    "smtp_port": 587,
+    "smtp_starttls": True,
+    "webhook_url": "",  # 为空则不启用Webhook报警
+    "debounce_seconds": 30,  # 同一位置在此时间内的重复报警合并发送
+    "max_retries": 3,
+    "retry_backoff": 1.0
+}
+
+# 火灾检测配置（覆盖 detector.DETECTOR_CONFIG 中的默认值）
+DETECTION_CONFIG = {
+    "motion_gate": True  # 结合运动特征，排除静止的火焰颜色物体
+}
+
+# 检测结果缓存：录像文件完整分析一遍后保存逐帧结果，再次打开时直接回放
+DETECTION_CACHE_CONFIG = {
+    "enabled": True,
+    "cache_dir": "detection_cache",
+    "max_bytes": 2 * 1024 ** 3  # 缓存总大小上限，超过时淘汰最久未用的结果
+}
+
+# 多进程检测配置
+WORKER_CONFIG = {
+    "processes": 0,  # 大于0时在独立进程中检测，画面经共享内存传递；0表示在分析线程中检测
+    "slots": None  # 共享内存帧槽位数，None表示进程数+2
+}
+
+# 报警录像配置
+CLIP_CONFIG = {
+    "enabled": True,
+    "pre_seconds": 5,  # 报警前保留的秒数
+    "post_seconds": 5,  # 报警后录制的秒数
+    "jpeg_quality": 80,  # 缓冲区内帧的JPEG压缩质量，None表示不压缩
+    "max_bytes": 200 * 1024 * 1024,  # 每路视频缓冲区内存上限
+    "max_pending": 8,  # 等待后台压缩的帧数上限，超过时丢帧而不阻塞检测
+    "output_dir": "clips"
+}
+
+# 视频预览配置
+PREVIEW_CONFIG = {
+    "max_fps": 15  # 预览刷新帧率上限，与分析帧率无关
+}
+
+# 过载降级配置
+LOAD_SHED_CONFIG = {
+    "enabled": True,
+    "target": 0.2  # 目标延迟（秒）：从采集到分析完成，持续超过时逐级降低画质
+}
+
+# 级联确认配置：颜色检测出的区域再由 ONNX 分类模型确认（需要安装 onnxruntime）
+CLASSIFIER_CONFIG = {
+    "enabled": False,
+    "model": "models/fire_classifier.onnx",
+    "batch_size": 16,  # 单次推理的最大批量
+    "deadline": 0.03  # 凑批最长等待时间（秒）
+}
+
+# 性能统计配置
+METRICS_CONFIG = {
+    "enabled": False,  # 启动时即开启统计（打开统计面板时也会开启）
+    "port": 9108  # 本机 Prometheus 接口端口，None表示不启动
+}
+
+# 无界面服务模式配置（python -m fire_monitor.server）
+SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8090,
+    "preview_fps": 15,  # 预览编码帧率上限；没有观看者时每秒只编码一帧供快照使用
+    "preview_width": 960,  # 预览画面宽度上限，更宽的画面先缩小再编码
+    "jpeg_quality": 80,
+    "detection_interval": 1.0,  # 同一路视频的 detection 事件最短间隔（秒）
+    "event_backlog": 256,  # 保留的最近事件数，客户端重连时按 Last-Event-ID 补发
+    "client_queue": 64  # 每个事件订阅者最多积压的事件数，超过时丢弃最旧的
+}
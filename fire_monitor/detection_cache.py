@@ -0,0 +1,314 @@
+"""录像文件逐帧检测结果的磁盘缓存
+
+同一个录像反复打开复查时，直接读取上一次的检测结果，只解码画面用于显示。
+
+缓存按内容寻址：目录名为视频文件内容指纹，文件名为检测参数指纹，即
+    detection_cache/<文件指纹>/<参数指纹>.npz
+修改阈值只会让该参数对应的缓存失效，其他参数的结果仍然有效。
+
+每个缓存文件按列存储所有帧：是否火灾、火灾比例、区域（外接框/面积/质心，按帧偏移索引），
+以及按行优先展开后游程编码的掩膜（只保存判定为火灾的帧）。总大小超过上限时按最近使用时间
+（文件修改时间，命中时更新）淘汰最久未用的缓存。
+
+缓存同时记录分析时解码后端报告的总帧数（CAP_PROP_FRAME_COUNT），打开时报告的帧数不同
+（例如换了解码后端）视为未命中，避免按帧序回放时错位。
+
+用法:
+    python -m fire_monitor.detection_cache            # 查看缓存占用
+    python -m fire_monitor.detection_cache --clear
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from .regions import Regions
+
+CACHE_CONFIG = {
+    "cache_dir": "detection_cache",
+    "max_bytes": 2 * 1024 ** 3,  # 缓存总大小上限
+    "hash_sample": 4 * 1024 * 1024  # 计算文件指纹时在开头、中间、结尾各读取的字节数
+}
+
+# 缓存格式版本，格式变化时旧缓存自动失效
+_FORMAT = 2
+
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+
+def file_fingerprint(path, sample=CACHE_CONFIG["hash_sample"]):
+    """视频文件内容指纹：文件大小 + 开头/中间/结尾的采样内容
+
+    完整哈希一个几 GB 的录像需要数秒，采样哈希足以区分不同录像；同一进程内按路径、大小和
+    修改时间记住结果。
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, sample)
+    with _fingerprint_lock:
+        cached = _fingerprints.get(key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(stat.st_size).encode())
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, stat.st_size // 2 - sample // 2),
+                              max(0, stat.st_size - sample)}):
+            f.seek(offset)
+            digest.update(f.read(sample))
+    result = digest.hexdigest()
+    with _fingerprint_lock:
+        _fingerprints[key] = result
+    return result
+
+
+def config_fingerprint(config):
+    """检测参数指纹（与参数顺序无关）"""
+    text = json.dumps([_FORMAT, config], sort_keys=True, default=list)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_mask(mask):
+    """按行优先展开后游程编码，返回 [游程数, 2] 的 (起点, 长度)"""
+    flat = mask.reshape(-1) != 0
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    if flat[0]:
+        edges = np.concatenate(([0], edges))
+    if flat[-1]:
+        edges = np.concatenate((edges, [flat.size]))
+    starts, ends = edges[0::2], edges[1::2]
+    return np.stack([starts, ends - starts], axis=1).astype(np.uint32)
+
+
+def decode_mask(runs, shape, out=None):
+    """游程解码为 0/255 掩膜；out 为可复用的缓冲区"""
+    if out is None:
+        out = np.empty(shape, np.uint8)
+    out.fill(0)
+    if len(runs):
+        starts = runs[:, 0].astype(np.int64)
+        lengths = runs[:, 1].astype(np.int64)
+        # 所有游程内像素的下标：各游程起点按长度重复，再加上游程内偏移
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        out.reshape(-1)[offsets + np.arange(int(lengths.sum()))] = 255
+    return out
+
+
+def _frame_count(value):
+    # CAP_PROP_FRAME_COUNT 是浮点数，取不到时为 0 或负数
+    return int(value) if value and value > 0 else -1
+
+
+class CachedDetections:
+    """一个视频在某组检测参数下的全部检测结果"""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.shape = tuple(int(v) for v in data["shape"])
+            # 分析时解码后端报告的总帧数，-1 表示未知
+            self.frame_count = int(data["frame_count"])
+            self.fire = data["fire"]
+            self.ratio = data["ratio"]
+            self.region_offsets = data["region_offsets"]
+            self.boxes = data["boxes"]
+            self.areas = data["areas"]
+            self.centroids = data["centroids"]
+            self.mask_offsets = data["mask_offsets"]
+            self.runs = data["runs"]
+
+    def __len__(self):
+        return len(self.fire)
+
+    def regions(self, index):
+        start, end = self.region_offsets[index], self.region_offsets[index + 1]
+        return Regions(self.areas[start:end], self.boxes[start:end],
+                       self.centroids[start:end].astype(np.float64), self.shape)
+
+    def mask(self, index, out=None):
+        start, end = self.mask_offsets[index], self.mask_offsets[index + 1]
+        return decode_mask(self.runs[start:end], self.shape, out)
+
+    def detector(self):
+        return CachedDetector(self)
+
+
+class CachedDetector:
+    """按调用顺序回放缓存结果，接口与 FireDetector.detect 相同；regions 为当前帧的区域"""
+
+    def __init__(self, cached):
+        self.cached = cached
+        self.index = 0
+        self.fire_ratio = 0.0
+        self.regions = Regions.empty(cached.shape)
+        self.flicker = None
+        self._mask = np.empty(cached.shape, np.uint8)
+
+    def detect(self, frame):
+        if self.index >= len(self.cached):
+            # 解码出的帧比缓存多时按无火处理，不让分析线程因异常退出
+            if self.index == len(self.cached):
+                print("检测缓存的帧数少于视频帧数，之后的帧不再回放检测结果")
+            self.index += 1
+            self.fire_ratio = 0.0
+            self.regions = Regions.empty(self.cached.shape)
+            self._mask.fill(0)
+            return False, self._mask
+        index = self.index
+        self.index += 1
+        self.fire_ratio = float(self.cached.ratio[index])
+        self.regions = self.cached.regions(index)
+        return bool(self.cached.fire[index]), self.cached.mask(index, self._mask)
+
+
+class DetectionRecorder:
+    """分析过程中逐帧记录，完整分析完一个文件后调用 save() 写入缓存"""
+
+    def __init__(self, cache, path, frame_count=None):
+        self.cache = cache
+        self.path = path
+        self.frame_count = frame_count
+        self.shape = None
+        self.fire = []
+        self.ratio = []
+        self.region_counts = []
+        self.boxes = []
+        self.areas = []
+        self.centroids = []
+        self.run_counts = []
+        self.runs = []
+
+    def add(self, fire_detected, fire_ratio, fire_mask, regions):
+        if self.shape is None:
+            self.shape = fire_mask.shape[:2]
+        self.fire.append(bool(fire_detected))
+        self.ratio.append(fire_ratio)
+        self.region_counts.append(len(regions))
+        if len(regions):
+            self.boxes.append(regions.boxes)
+            self.areas.append(regions.areas)
+            self.centroids.append(regions.centroids)
+        # 没有火的帧不显示掩膜，不必保存
+        runs = encode_mask(fire_mask) if fire_detected else np.empty((0, 2), np.uint32)
+        self.run_counts.append(len(runs))
+        self.runs.append(runs)
+
+    def save(self):
+        if not self.fire:
+            return None
+
+        def offsets(counts):
+            return np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        def concat(parts, shape, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(shape, dtype)
+
+        columns = {
+            "shape": np.array(self.shape, np.int64),
+            "frame_count": np.array(_frame_count(self.frame_count), np.int64),
+            "fire": np.array(self.fire, bool),
+            "ratio": np.array(self.ratio, np.float32),
+            "region_offsets": offsets(self.region_counts),
+            "boxes": concat(self.boxes, (0, 4), np.int32),
+            "areas": concat(self.areas, (0,), np.int32),
+            "centroids": concat(self.centroids, (0, 2), np.float32),
+            "mask_offsets": offsets(self.run_counts),
+            "runs": concat(self.runs, (0, 2), np.uint32)
+        }
+        return self.cache.store(self.path, columns)
+
+
+class DetectionCache:
+    def __init__(self, cache_dir=CACHE_CONFIG["cache_dir"], max_bytes=CACHE_CONFIG["max_bytes"]):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path_for(self, video_path, config):
+        return os.path.join(self.cache_dir, file_fingerprint(video_path),
+                            config_fingerprint(config) + ".npz")
+
+    def get(self, video_path, config, frame_count=None):
+        """命中时返回 CachedDetections 并更新最近使用时间，否则返回 None
+
+        frame_count 为当前打开视频时报告的总帧数，与记录缓存时不同则视为未命中。
+        """
+        path = self.path_for(video_path, config)
+        try:
+            cached = CachedDetections(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        if cached.frame_count != _frame_count(frame_count):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return cached
+
+    def recorder(self, video_path, config, frame_count=None):
+        return DetectionRecorder(self, self.path_for(video_path, config), frame_count)
+
+    def store(self, path, columns):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中断时不会留下损坏的缓存
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, **columns)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def entries(self):
+        """所有缓存文件 [(最近使用时间, 大小, 路径)]"""
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+        for name in os.listdir(self.cache_dir):
+            directory = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                if entry.name.endswith(".npz") and ".tmp" not in entry.name:
+                    stat = entry.stat()
+                    result.append((stat.st_mtime, stat.st_size, entry.path))
+        return result
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的缓存，返回删除的文件数"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            directory = os.path.dirname(path)
+            if not os.listdir(directory):
+                os.rmdir(directory)
+        return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检测结果缓存管理")
+    parser.add_argument("--cache-dir", default=CACHE_CONFIG["cache_dir"])
+    parser.add_argument("--clear", action="store_true", help="删除全部缓存")
+    args = parser.parse_args(argv)
+
+    cache = DetectionCache(args.cache_dir, 0 if args.clear else CACHE_CONFIG["max_bytes"])
+    if args.clear:
+        print(f"已删除 {cache.evict()} 个缓存文件")
+        return
+    entries = cache.entries()
+    total = sum(size for _, size, _ in entries)
+    print(f"{len(entries)} 个缓存文件，共 {total / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
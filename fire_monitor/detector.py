@@ -0,0 +1,342 @@
+import threading
+
+import cv2
+import numpy as np
+
+from .color_lut import ColorLUT
+from .flicker import FlickerGate
+from .metrics import METRICS
+from .motion import MotionGate
+from .regions import extract_regions
+from .tiles import TileCache
+
+# 检测参数默认值（红色和橙色）
+DETECTOR_CONFIG = {
+    "lower_fire": (0, 120, 70),
+    "upper_fire": (20, 255, 255),
+    "lower_fire2": (160, 120, 70),
+    "upper_fire2": (180, 255, 255),
+    "ratio_threshold": 0.01,  # 1%的面积阈值
+    "kernel_size": 5,
+    "pyramid_scale": 1.0,  # 小于1时先在缩小的画面上找候选区域，只在候选区域内做全分辨率检测
+    "pyramid_max_rois": 16,  # 候选区域超过该数量时退回全帧检测
+    "motion_gate": False,  # 只分析有变化的块，并要求火焰颜色像素位于动态块内
+    "motion_block": 32,  # 运动检测分块大小（像素）
+    "motion_threshold": 15,  # 帧差灰度阈值
+    "motion_min_changed": 0.02,  # 块内变化像素比例超过该值视为动态块
+    "flicker_gate": False,  # 只保留 1~12Hz 闪烁的块中的火焰颜色像素（灯具、红色衣物不闪烁）
+    "flicker_fps": 25.0,  # 送入检测器的帧率，用于换算闪烁频率
+    "flicker_block": 32,
+    "flicker_window": 32,  # 频谱分析的窗口（帧数），窗口填满前不过滤
+    "flicker_band": (1.0, 12.0),  # 火焰闪烁频带（Hz）
+    "flicker_min_amplitude": 2.0,  # 频带内亮度波动的均方根下限
+    "flicker_min_ratio": 0.5,  # 频带能量占交流总能量的比例下限
+    "flicker_signal": "luma",  # luma: 块灰度均值；fire: 块内火焰像素比例
+    "tile_cache": False,  # 分块缓存检测结果，只重新计算内容有变化的块（不能与金字塔/运动门控/闪烁分析同时使用）
+    "tile_size": 64,
+    "tile_threshold": 4.0,  # 块缩略图平均灰度差超过该值才重新计算
+    "color_lut": False  # 用预先生成的 BGR 查找表代替 HSV 转换和 inRange（首次生成约 0.3 秒，占用 18MB）
+}
+
+# 依赖连续帧的检测阶段；多进程检测时各进程只分到交错的部分帧，这些阶段由所有者进程按帧序执行
+STATEFUL_STAGES = ("motion_gate", "flicker_gate", "tile_cache")
+
+
+def stateless_config(config):
+    """去掉有状态阶段后的检测参数，供并行的检测进程使用（分块缓存只是加速，结果不变）"""
+    return dict(config, **{stage: False for stage in STATEFUL_STAGES})
+
+
+class FireDetector:
+    """火灾检测器 - 持有阈值、形态学核以及按分辨率预分配的缓冲区"""
+
+    def __init__(self, **config):
+        unknown = set(config) - set(DETECTOR_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的检测参数: {', '.join(sorted(unknown))}")
+
+        self.config = dict(DETECTOR_CONFIG, **config)
+        self.lower_fire = np.array(self.config["lower_fire"])
+        self.upper_fire = np.array(self.config["upper_fire"])
+        self.lower_fire2 = np.array(self.config["lower_fire2"])
+        self.upper_fire2 = np.array(self.config["upper_fire2"])
+        self.ratio_threshold = self.config["ratio_threshold"]
+        size = self.config["kernel_size"]
+        self.kernel = np.ones((size, size), np.uint8)
+        self.pyramid_scale = self.config["pyramid_scale"]
+        if not 0 < self.pyramid_scale <= 1:
+            raise ValueError("pyramid_scale 必须在 (0, 1] 之间")
+
+        self.motion = None
+        if self.config["motion_gate"]:
+            self.motion = MotionGate(block=self.config["motion_block"],
+                                     threshold=self.config["motion_threshold"],
+                                     min_changed=self.config["motion_min_changed"])
+
+        self.flicker = None
+        if self.config["flicker_gate"]:
+            self.flicker = FlickerGate(fps=self.config["flicker_fps"],
+                                       block=self.config["flicker_block"],
+                                       window=self.config["flicker_window"],
+                                       band=self.config["flicker_band"],
+                                       min_amplitude=self.config["flicker_min_amplitude"],
+                                       min_ratio=self.config["flicker_min_ratio"],
+                                       signal=self.config["flicker_signal"])
+
+        self.tiles = None
+        if self.config["tile_cache"]:
+            if self.pyramid_scale < 1 or self.motion is not None or self.flicker is not None:
+                raise ValueError("tile_cache 不能与 pyramid_scale/motion_gate/flicker_gate 同时使用")
+            self.tiles = TileCache(tile=self.config["tile_size"],
+                                   threshold=self.config["tile_threshold"],
+                                   margin=self.kernel.shape[0] * 2)
+
+        self.lut = None
+        if self.config["color_lut"]:
+            self.lut = ColorLUT(self.lower_fire, self.upper_fire, self.lower_fire2, self.upper_fire2)
+
+        self.fire_ratio = 0.0
+        # 本帧做了全分辨率检测的区域 (x0, y0, x1, y1)
+        self.rois = []
+        # 性能统计中使用的视频流名称
+        self.stream_id = "default"
+        self._shape = None
+
+    def set_color_range(self, lower_fire, upper_fire, lower_fire2, upper_fire2):
+        """修改火焰颜色阈值；使用查找表时重新生成"""
+        self.lower_fire = np.array(lower_fire)
+        self.upper_fire = np.array(upper_fire)
+        self.lower_fire2 = np.array(lower_fire2)
+        self.upper_fire2 = np.array(upper_fire2)
+        self.config.update(lower_fire=lower_fire, upper_fire=upper_fire,
+                           lower_fire2=lower_fire2, upper_fire2=upper_fire2)
+        if self.lut is not None:
+            self.lut.set_range(lower_fire, upper_fire, lower_fire2, upper_fire2)
+        # 分块缓存中的结果按旧阈值计算，需要全部重新计算
+        if self.tiles is not None:
+            self.tiles.invalidate()
+
+    def _ensure_buffers(self, shape):
+        # 分辨率变化时才重新分配
+        if self._shape == shape:
+            return
+        height, width = shape
+        self._hsv = np.empty((height, width, 3), np.uint8)
+        self._mask1 = np.empty((height, width), np.uint8)
+        self._mask2 = np.empty((height, width), np.uint8)
+        self._fire_mask = np.empty((height, width), np.uint8)
+        self._bgra = self._index = None
+        if self.lut is not None:
+            self._bgra = np.empty((height, width, 4), np.uint8)
+            self._index = np.empty((height, width), np.uint32)
+        if self.pyramid_scale < 1:
+            small_w = max(1, int(width * self.pyramid_scale))
+            small_h = max(1, int(height * self.pyramid_scale))
+            self._small = np.empty((small_h, small_w, 3), np.uint8)
+            self._small_hsv = np.empty((small_h, small_w, 3), np.uint8)
+            self._small_mask1 = np.empty((small_h, small_w), np.uint8)
+            self._small_mask2 = np.empty((small_h, small_w), np.uint8)
+            self._small_bgra = self._small_index = None
+            if self.lut is not None:
+                self._small_bgra = np.empty((small_h, small_w, 4), np.uint8)
+                self._small_index = np.empty((small_h, small_w), np.uint32)
+        self._shape = shape
+
+    def detect(self, frame):
+        """检测单帧，返回 (是否检测到火灾, 火灾掩膜)
+
+        返回的掩膜是检测器内部缓冲区，下一次调用时会被覆盖，需要保留请自行 copy()。
+        """
+        self._ensure_buffers(frame.shape[:2])
+        total_area = frame.shape[0] * frame.shape[1]
+
+        if self.tiles is not None:
+            with METRICS.timer("mask", self.stream_id):
+                fire_mask = self.tiles.update(frame, self._roi_mask)
+            self.fire_ratio = self.tiles.fire_area / total_area
+            return self.fire_ratio > self.ratio_threshold, fire_mask
+
+        rois = self._pyramid_rois(frame) if self.pyramid_scale < 1 else None
+
+        if self.motion is not None:
+            with METRICS.timer("motion", self.stream_id):
+                self.motion.update(frame)
+                motion_rois = self.motion.rois(frame.shape[:2], margin=self.kernel.shape[0] * 2)
+            rois = motion_rois if rois is None else _intersect_rois(rois, motion_rois)
+
+        if rois is None:
+            self._detect_full(frame)
+        else:
+            self._detect_rois(frame, rois)
+
+        # 静止区域的火焰颜色像素（招牌、夕阳、红色设备）不计入
+        if self.motion is not None and self.rois:
+            cv2.bitwise_and(self._fire_mask, self.motion.motion_mask(frame.shape[:2]),
+                            dst=self._fire_mask)
+
+        self._apply_flicker(frame, self._fire_mask)
+
+        # 计算火灾区域面积
+        fire_area = cv2.countNonZero(self._fire_mask)
+        self.fire_ratio = fire_area / total_area
+
+        return self.fire_ratio > self.ratio_threshold, self._fire_mask
+
+    def _apply_flicker(self, frame, fire_mask):
+        # 不闪烁的块中的火焰颜色像素不计入；每帧都要更新，保证采样间隔均匀
+        if self.flicker is not None:
+            with METRICS.timer("flicker", self.stream_id):
+                self.flicker.update(frame, fire_mask)
+                if self.flicker.ready:
+                    cv2.bitwise_and(fire_mask, self.flicker.flicker_mask(frame.shape[:2]), dst=fire_mask)
+
+    @property
+    def stateful(self):
+        return self.motion is not None or self.flicker is not None
+
+    def apply_gates(self, frame, fire_mask):
+        """在其他进程算好的颜色掩膜上执行运动门控和闪烁分析，fire_mask 原地修改
+
+        这两个阶段依赖连续帧，必须按帧序逐帧调用。返回 (是否检测到火灾, 火灾掩膜)。
+        """
+        if self.motion is not None:
+            with METRICS.timer("motion", self.stream_id):
+                self.motion.update(frame)
+                cv2.bitwise_and(fire_mask, self.motion.motion_mask(frame.shape[:2]), dst=fire_mask)
+        self._apply_flicker(frame, fire_mask)
+        self.fire_ratio = cv2.countNonZero(fire_mask) / (frame.shape[0] * frame.shape[1])
+        return self.fire_ratio > self.ratio_threshold, fire_mask
+
+    def _detect_full(self, frame):
+        height, width = frame.shape[:2]
+        self.rois = [(0, 0, width, height)]
+
+        if self.lut is None:
+            # 转换到HSV色彩空间
+            with METRICS.timer("hsv", self.stream_id):
+                cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=self._hsv)
+
+        with METRICS.timer("mask", self.stream_id):
+            # 创建火灾颜色掩膜
+            if self.lut is not None:
+                self.lut.classify(frame, self._fire_mask, self._bgra, self._index)
+            else:
+                cv2.inRange(self._hsv, self.lower_fire, self.upper_fire, dst=self._mask1)
+                cv2.inRange(self._hsv, self.lower_fire2, self.upper_fire2, dst=self._mask2)
+                cv2.bitwise_or(self._mask1, self._mask2, dst=self._fire_mask)
+
+            # 形态学操作去除噪声（mask1 复用为中间结果）
+            cv2.morphologyEx(self._fire_mask, cv2.MORPH_OPEN, self.kernel, dst=self._mask1)
+            cv2.morphologyEx(self._mask1, cv2.MORPH_CLOSE, self.kernel, dst=self._fire_mask)
+
+    def _detect_rois(self, frame, rois):
+        """只在给定区域内做全分辨率检测，区域外的掩膜为0；重叠区域的结果取并集"""
+        self.rois = rois
+        self._fire_mask.fill(0)
+        with METRICS.timer("mask", self.stream_id):
+            for x0, y0, x1, y1 in rois:
+                fire_mask = self._fire_mask[y0:y1, x0:x1]
+                cv2.bitwise_or(fire_mask, self._roi_mask(frame, x0, y0, x1, y1), dst=fire_mask)
+
+    def _roi_mask(self, frame, x0, y0, x1, y1):
+        """计算单个区域的火灾掩膜，返回内部缓冲区的视图"""
+        mask1 = self._mask1[y0:y1, x0:x1]
+        mask2 = self._mask2[y0:y1, x0:x1]
+        if self.lut is not None:
+            self.lut.classify(frame[y0:y1, x0:x1], mask1, self._bgra[y0:y1, x0:x1],
+                              self._index[y0:y1, x0:x1])
+        else:
+            self._color_mask(frame[y0:y1, x0:x1], self._hsv[y0:y1, x0:x1], mask1, mask2)
+        cv2.morphologyEx(mask1, cv2.MORPH_OPEN, self.kernel, dst=mask2)
+        cv2.morphologyEx(mask2, cv2.MORPH_CLOSE, self.kernel, dst=mask1)
+        return mask1
+
+    def _color_mask(self, frame, hsv, dst, tmp):
+        """HSV 颜色分割，结果写入 dst（tmp 为临时缓冲区）"""
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+        cv2.inRange(hsv, self.lower_fire, self.upper_fire, dst=dst)
+        cv2.inRange(hsv, self.lower_fire2, self.upper_fire2, dst=tmp)
+        cv2.bitwise_or(dst, tmp, dst=dst)
+
+    def _pyramid_rois(self, frame):
+        """在缩小的画面上做颜色分割，返回全分辨率下的候选区域列表；需要全帧检测时返回 None"""
+        height, width = frame.shape[:2]
+        with METRICS.timer("pyramid", self.stream_id):
+            small_h, small_w = self._small.shape[:2]
+            cv2.resize(frame, (small_w, small_h), dst=self._small, interpolation=cv2.INTER_AREA)
+            if self.lut is not None:
+                self.lut.classify(self._small, self._small_mask1, self._small_bgra, self._small_index)
+            else:
+                self._color_mask(self._small, self._small_hsv, self._small_mask1, self._small_mask2)
+            if cv2.countNonZero(self._small_mask1) == 0:
+                return []
+
+            # 膨胀后合并相邻的候选像素
+            cv2.dilate(self._small_mask1, self.kernel, dst=self._small_mask2)
+            count, _, stats, _ = cv2.connectedComponentsWithStats(self._small_mask2, connectivity=8)
+            if count - 1 > self.config["pyramid_max_rois"]:
+                return None
+
+        # 映射回全分辨率，并留出形态学操作所需的边距
+        scale_x = width / small_w
+        scale_y = height / small_h
+        margin = self.kernel.shape[0] * 2
+        rois = []
+        area = 0
+        for x, y, w, h, _ in stats[1:]:
+            x0 = max(0, int(x * scale_x) - margin)
+            y0 = max(0, int(y * scale_y) - margin)
+            x1 = min(width, int(np.ceil((x + w) * scale_x)) + margin)
+            y1 = min(height, int(np.ceil((y + h) * scale_y)) + margin)
+            rois.append((x0, y0, x1, y1))
+            area += (x1 - x0) * (y1 - y0)
+
+        # 候选区域覆盖大半画面时，全帧检测更快
+        if area > width * height // 2:
+            return None
+        return rois
+
+
+def _intersect_rois(rois_a, rois_b):
+    result = []
+    for ax0, ay0, ax1, ay1 in rois_a:
+        for bx0, by0, bx1, by1 in rois_b:
+            x0, y0 = max(ax0, bx0), max(ay0, by0)
+            x1, y1 = min(ax1, bx1), min(ay1, by1)
+            if x0 < x1 and y0 < y1:
+                result.append((x0, y0, x1, y1))
+    return result
+
+
+# 每个线程一个默认检测器，避免共享缓冲区
+_local = threading.local()
+
+
+def get_default_detector():
+    detector = getattr(_local, "detector", None)
+    if detector is None:
+        detector = _local.detector = FireDetector()
+    return detector
+
+
+# 在图像上标记火灾区域；已提取区域时传入 regions，有跟踪结果时同时标出编号和增长率
+def annotate_fire(frame, fire_mask, min_area=100, stream_id="default", regions=None, tracks=None):
+    with METRICS.timer("regions", stream_id):
+        if regions is None:
+            regions = extract_regions(fire_mask, min_area)  # 只保留面积大于 min_area 的区域
+        for j, (x, y, w, h) in enumerate(regions.boxes.tolist()):
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
+            if tracks is not None:
+                track = tracks[j]
+                cv2.putText(frame, f"#{track.id} {track.growth_rate:+.0%}/s", (x, max(12, y - 5)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+
+    cv2.putText(frame, "FIRE DETECTED!", (50, 50),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    cv2.rectangle(frame, (30, 30), (frame.shape[1] - 30, frame.shape[0] - 30),
+                  (0, 0, 255), 3)
+
+
+# 火灾检测函数 - 基于颜色和运动特征
+def detect_fire(frame):
+    return get_default_detector().detect(frame)
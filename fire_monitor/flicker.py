@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+
+
+class FlickerGate:
+    """分块闪烁频率分析：火焰亮度/火焰像素比例在 1~12Hz 范围内抖动，灯具、红色衣物、招牌则不会
+
+    画面按 block×block 像素分块，每块每帧取一个采样值（灰度均值或火焰像素比例），最近 window 帧
+    保存在预分配的环形数组中。频带内各频点的 DFT 用滑动 DFT 逐帧递推：
+
+        X_k <- (X_k + x_new - x_old) * exp(2πjk/N)
+
+    每帧只做一次向量化更新，不对整个窗口重新做 FFT。频带能量占交流总能量的比例和频带内的波动幅度
+    都超过阈值的块视为闪烁块。窗口未填满之前所有块都视为闪烁块（不做过滤）。
+    """
+
+    def __init__(self, fps=25.0, block=32, window=32, band=(1.0, 12.0), min_amplitude=2.0,
+                 min_ratio=0.5, signal="luma", resync=1024):
+        if signal not in ("luma", "fire"):
+            raise ValueError("signal 只能是 luma 或 fire")
+        self.block = block
+        self.window = window
+        self.band = band
+        self.min_amplitude = min_amplitude
+        self.min_ratio = min_ratio
+        self.signal = signal
+        # 浮点误差会在递推中累积，每隔 resync 帧用完整 FFT 校正一次
+        self.resync = resync
+        self._shape = None
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        """修改采样帧率（例如降载隔帧分析时），重新选择频点并清空历史"""
+        self.fps = fps
+        nyquist = self.window // 2
+        bins = [k for k in range(1, nyquist + 1)
+                if self.band[0] <= k * fps / self.window <= self.band[1]]
+        self._bins = np.array(bins, np.int64)
+        # 实信号的频谱对称：除奈奎斯特频点外，每个频点的能量计两次
+        nyquist_bin = self._bins * 2 == self.window
+        self._weights = np.where(nyquist_bin, 1.0, 2.0)
+        self._twiddle = np.exp(2j * np.pi * self._bins / self.window)
+        self._shape = None
+
+    def _ensure_buffers(self, shape):
+        if self._shape == shape:
+            return
+        height, width = shape
+        self.grid = (-(-height // self.block), -(-width // self.block))
+        # 补齐到块的整数倍，INTER_AREA 按整数倍缩小时走快速路径，结果即为块均值
+        self._padded = np.empty((self.grid[0] * self.block, self.grid[1] * self.block), np.uint8)
+        self._sample = np.empty(self.grid, np.uint8)
+        # 环形历史及对应的频点、一阶/二阶累加和
+        self._history = np.zeros((self.window,) + self.grid, np.float64)
+        self._spectrum = np.zeros((len(self._bins),) + self.grid, np.complex128)
+        self._sum = np.zeros(self.grid, np.float64)
+        self._sum_sq = np.zeros(self.grid, np.float64)
+        self._pos = 0
+        self.frames = 0
+        self.amplitude = np.zeros(self.grid, np.float64)
+        self.ratio = np.zeros(self.grid, np.float64)
+        self.block_map = np.full(self.grid, 255, np.uint8)
+        self._flicker_mask = np.empty((self.grid[0] * self.block, self.grid[1] * self.block), np.uint8)
+        self._shape = shape
+
+    @property
+    def ready(self):
+        return self._shape is not None and self.frames >= self.window
+
+    def reset(self):
+        self._shape = None
+
+    def update(self, frame, fire_mask=None):
+        """输入新帧，返回闪烁块图（gh×gw，闪烁块为255）；signal="fire" 时需要传入火焰掩膜"""
+        self._ensure_buffers(frame.shape[:2])
+        height, width = frame.shape[:2]
+        padded = self._padded
+        if self.signal == "fire":
+            # 块内火焰像素比例（0~255）
+            np.copyto(padded[:height, :width], fire_mask)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=padded[:height, :width])
+        # 边缘不足一块的部分用最后一行/列补齐
+        padded[height:] = padded[height - 1]
+        padded[:, width:] = padded[:, width - 1:width]
+        cv2.resize(padded, (self.grid[1], self.grid[0]), dst=self._sample, interpolation=cv2.INTER_AREA)
+
+        new = self._sample.astype(np.float64)
+        old = self._history[self._pos]
+        delta = new - old
+        self._sum += delta
+        self._sum_sq += new * new - old * old
+        self._spectrum += delta
+        self._spectrum *= self._twiddle[:, None, None]
+        old[...] = new
+        self._pos = (self._pos + 1) % self.window
+        self.frames += 1
+
+        if self.frames % self.resync == 0:
+            self._resync()
+        if self.frames < self.window:
+            return self.block_map
+
+        # Parseval：频带能量 / 交流总能量，幅度为频带内波动的均方根
+        n = self.window
+        band_energy = np.tensordot(self._weights, np.abs(self._spectrum) ** 2, axes=1) / n
+        ac_energy = np.maximum(self._sum_sq - self._sum * self._sum / n, 1e-9)
+        np.divide(band_energy, ac_energy, out=self.ratio)
+        np.sqrt(band_energy / n, out=self.amplitude)
+        flicker = (self.amplitude >= self.min_amplitude) & (self.ratio >= self.min_ratio)
+        np.multiply(flicker, 255, out=self.block_map, casting="unsafe")
+        return self.block_map
+
+    def _resync(self):
+        # 按时间顺序（最旧在前）重新计算，消除递推误差
+        ordered = np.roll(self._history, -self._pos, axis=0)
+        spectrum = np.fft.fft(ordered, axis=0)[self._bins]
+        # 递推得到的 X_k 对应窗口起点在最旧样本的 DFT
+        self._spectrum[...] = spectrum
+        self._sum[...] = ordered.sum(axis=0)
+        self._sum_sq[...] = (ordered * ordered).sum(axis=0)
+
+    def flicker_mask(self, shape):
+        """把闪烁块图放大为全分辨率掩膜（返回内部缓冲区的视图）"""
+        cv2.resize(self.block_map, (self._flicker_mask.shape[1], self._flicker_mask.shape[0]),
+                   dst=self._flicker_mask, interpolation=cv2.INTER_NEAREST)
+        return self._flicker_mask[:shape[0], :shape[1]]
@@ -0,0 +1,130 @@
+"""无界面运行火灾检测，逐帧输出 JSON Lines
+
+用法:
+    python -m fire_monitor.headless video.mp4
+    python -m fire_monitor.headless 0 --max-frames 300 --output result.jsonl
+    python -m fire_monitor.headless rtsp://192.168.1.10/stream --max-frames 1000
+"""
+import argparse
+import json
+import sys
+import time
+
+import cv2
+
+from .detector import DETECTOR_CONFIG, FireDetector
+from .metrics import METRICS, MetricsServer
+from .network_source import NetworkSource, is_network_source
+from .regions import RegionTracker, Regions, extract_regions
+
+
+def parse_source(source):
+    # 纯数字视为摄像头编号
+    return int(source) if source.isdigit() else source
+
+
+def run(source, detector, out, max_frames=None, cascade=None):
+    # 网络视频源只保留最新一帧并自动重连
+    cap = NetworkSource(source) if is_network_source(source) else cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频源: {source}")
+
+    # 录像文件按视频时间戳计算增长率，实时源按系统时间
+    live = not isinstance(source, str) or is_network_source(source)
+    tracker = RegionTracker()
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if detector.flicker is not None and fps > 0:
+        detector.flicker.set_fps(fps)
+    frame_index = 0
+    try:
+        while max_frames is None or frame_index < max_frames:
+            with METRICS.timer("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+
+            start = time.perf_counter()
+            fire_detected, fire_mask = detector.detect(frame)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            regions = extract_regions(fire_mask) if fire_detected else Regions.empty()
+            tracks = tracker.update(regions, None if live else pos_ms / 1000)
+
+            # 级联确认：逐帧等待分类结果，输出可复现
+            color_detected = fire_detected
+            if cascade is not None:
+                fire_detected = cascade.confirm(frame, tracks, wait=None,
+                                                now=None if live else pos_ms / 1000) and fire_detected
+            probs = cascade.probs if cascade is not None else [None] * len(tracks)
+
+            out.write(json.dumps({
+                "frame": frame_index,
+                "pos_ms": round(pos_ms, 1),
+                "fire": bool(fire_detected),
+                "color_fire": bool(color_detected),
+                "fire_ratio": round(detector.fire_ratio, 6),
+                "detect_ms": round(elapsed_ms, 3),
+                "regions": [{
+                    "id": track.id,
+                    "area": track.area,
+                    "bbox": list(track.box),
+                    "growth_rate": round(track.growth_rate, 4),
+                    "drift": [round(v, 1) for v in track.drift],
+                    "fire_prob": None if prob is None else round(prob, 4)
+                } for track, prob in zip(tracks, probs)]
+            }) + "\n")
+            frame_index += 1
+    finally:
+        cap.release()
+        out.flush()
+
+    return frame_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面火灾检测")
+    parser.add_argument("source", help="视频文件路径或摄像头编号")
+    parser.add_argument("--max-frames", type=int, default=None, help="最多处理的帧数")
+    parser.add_argument("--output", default="-", help="输出文件，默认标准输出")
+    parser.add_argument("--ratio-threshold", type=float,
+                        default=DETECTOR_CONFIG["ratio_threshold"], help="火灾面积比例阈值")
+    parser.add_argument("--pyramid-scale", type=float, default=DETECTOR_CONFIG["pyramid_scale"],
+                        help="金字塔模式缩放比例，1表示全分辨率检测")
+    parser.add_argument("--tile-cache", action="store_true",
+                        help="分块缓存检测结果，适合固定机位")
+    parser.add_argument("--color-lut", action="store_true",
+                        help="用预先生成的颜色查找表代替 HSV 转换")
+    parser.add_argument("--flicker", action="store_true",
+                        help="只保留有火焰闪烁特征（1~12Hz）的区域")
+    parser.add_argument("--cascade", default=None, metavar="MODEL",
+                        help="用该 ONNX 分类模型确认颜色检测出的区域（需要 onnxruntime）")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="在本机该端口提供 Prometheus 统计接口")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port is not None:
+        METRICS.enabled = True
+        MetricsServer(args.metrics_port).start()
+
+    detector = FireDetector(ratio_threshold=args.ratio_threshold, pyramid_scale=args.pyramid_scale,
+                            tile_cache=args.tile_cache, color_lut=args.color_lut,
+                            flicker_gate=args.flicker)
+    classifier = cascade = None
+    if args.cascade:
+        from .cascade import BatchClassifier, CascadeStage
+        classifier = BatchClassifier.from_config(model=args.cascade).start()
+        cascade = CascadeStage(classifier)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        run(parse_source(args.source), detector, out, args.max_frames, cascade)
+    finally:
+        if classifier is not None:
+            classifier.stop()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from .config import THEME
+
+# 时间范围选项 -> 向前回溯的秒数（None 表示全部）
+RANGES = {
+    "最近24小时": 86400,
+    "最近7天": 7 * 86400,
+    "最近30天": 30 * 86400,
+    "全部": None
+}
+
+ALL_LOCATIONS = "全部位置"
+
+
+class AlarmHistoryWindow:
+    """报警历史浏览
+
+    原始记录按游标分页，每次只查询一页，滚动到接近底部时在后台线程加载下一页；
+    顶部的统计由汇总表计算，不扫描原始记录。
+    """
+
+    def __init__(self, master, store, page_size=200):
+        self.store = store
+        self.page_size = page_size
+        self.cursor = None
+        self.filters = (None, None)
+        self.loading = False
+        self.loaded = 0
+        # 每次更换筛选条件加一，丢弃旧条件下还未返回的查询结果
+        self.generation = 0
+
+        self.window = tk.Toplevel(master)
+        self.window.title("报警历史")
+        self.window.geometry("900x520")
+        self.window.configure(bg=THEME["background"])
+
+        filter_frame = tk.Frame(self.window, bg=THEME["background"])
+        filter_frame.pack(fill="x", padx=5, pady=5)
+
+        self.range_var = tk.StringVar(value="最近7天")
+        ttk.Combobox(filter_frame, textvariable=self.range_var, values=list(RANGES),
+                     state="readonly", width=12).pack(side="left", padx=5)
+        self.location_var = tk.StringVar(value=ALL_LOCATIONS)
+        self.location_box = ttk.Combobox(filter_frame, textvariable=self.location_var,
+                                         values=[ALL_LOCATIONS], state="readonly", width=20)
+        self.location_box.pack(side="left", padx=5)
+        tk.Button(filter_frame, text="查询", command=self.reload,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(side="left", padx=5)
+
+        self.summary_label = tk.Label(self.window, text="", anchor="w", justify="left",
+                                      font=("微软雅黑", 10), bg=THEME["background"], fg=THEME["text"])
+        self.summary_label.pack(fill="x", padx=10)
+
+        table_frame = tk.Frame(self.window)
+        table_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        columns = ("alarm_time", "alarm_type", "location", "description", "clip_path")
+        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for column, text, width in zip(columns, ("时间", "类型", "位置", "描述", "录像"),
+                                       (150, 90, 130, 260, 220)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor="w")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            # 可见区域接近底部时加载下一页
+            if float(last) > 0.9:
+                self.load_more()
+
+        self.tree.configure(yscrollcommand=on_scroll)
+
+        self.status_label = tk.Label(self.window, text="", anchor="w",
+                                     font=("微软雅黑", 9), bg=THEME["background"], fg=THEME["text"])
+        self.status_label.pack(fill="x", padx=10, pady=(0, 5))
+
+        self._run(lambda: self.store.locations(), self._set_locations, None)
+        self.reload()
+
+    def lift(self):
+        self.window.lift()
+
+    def exists(self):
+        return self.window.winfo_exists()
+
+    def _filters(self):
+        span = RANGES[self.range_var.get()]
+        start = None if span is None else time.time() - span
+        location = self.location_var.get()
+        return start, None if location == ALL_LOCATIONS else location
+
+    def _run(self, query, callback, generation):
+        """后台线程查询，结果回到 Tk 线程处理；generation 为 None 的结果不受筛选条件变化影响"""
+        def worker():
+            try:
+                result = query()
+            except Exception as e:
+                print(f"报警历史查询失败: {e}")
+                result = None
+            try:
+                self.window.after(0, lambda: self._deliver(callback, result, generation))
+            except (RuntimeError, tk.TclError):
+                # 窗口已关闭
+                pass
+
+        threading.Thread(target=worker, name="alarm-history", daemon=True).start()
+
+    def _deliver(self, callback, result, generation):
+        if generation in (None, self.generation) and self.exists():
+            callback(result)
+
+    def _set_locations(self, locations):
+        if locations is not None:
+            self.location_box.config(values=[ALL_LOCATIONS] + locations)
+
+    def reload(self):
+        self.generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self.cursor = None
+        self.loaded = 0
+        self.loading = False
+        self.summary_label.config(text="统计中...")
+
+        # 翻页期间沿用查询时的筛选条件，"最近N天"的起点不随时间移动
+        self.filters = start, location = self._filters()
+        self._run(lambda: self.store.location_counts(start, None, location), self._show_summary,
+                  self.generation)
+        self._load_page(None)
+
+    def _show_summary(self, counts):
+        if counts is None:
+            self.summary_label.config(text="统计失败")
+            return
+        top = sorted(counts.items(), key=lambda item: -item[1])[:5]
+        text = f"共 {sum(counts.values())} 次报警"
+        if top:
+            text += "    " + "  ".join(f"{location}: {n}" for location, n in top)
+        self.summary_label.config(text=text)
+
+    def load_more(self):
+        if self.loading or self.cursor is None:
+            return
+        self._load_page(self.cursor)
+
+    def _load_page(self, cursor):
+        start, location = self.filters
+        self.loading = True
+        self.status_label.config(text=f"已加载 {self.loaded} 条，加载中...")
+        self._run(lambda: self.store.query(start, None, location, self.page_size, cursor),
+                  self._append_page, self.generation)
+
+    def _append_page(self, result):
+        self.loading = False
+        if result is None:
+            self.status_label.config(text=f"已加载 {self.loaded} 条，加载失败")
+            return
+        rows, self.cursor = result
+        for row in rows:
+            self.tree.insert("", tk.END, values=(row["alarm_time"], row["alarm_type"], row["location"],
+                                                 row["description"], row["clip_path"] or ""))
+        self.loaded += len(rows)
+        more = "，向下滚动加载更多" if self.cursor is not None else "，已全部加载"
+        self.status_label.config(text=f"已加载 {self.loaded} 条{more}")
@@ -0,0 +1,117 @@
+"""过载降级控制
+
+持续比较每帧处理延迟与目标延迟：延迟持续超标时逐级降低画质（降低检测分辨率、隔帧分析、
+暂停预览），延迟持续低于目标一定比例时逐级恢复。每次调整都会记录日志，便于事后查看系统
+何时处于降级状态。
+"""
+import time
+from datetime import datetime
+
+from .metrics import METRICS
+
+# 降级级别，从上到下依次加重
+SHED_LEVELS = (
+    {"name": "正常", "scale": 1.0, "stride": 1, "preview": True},
+    {"name": "降低检测分辨率", "scale": 0.5, "stride": 1, "preview": True},
+    {"name": "隔帧分析", "scale": 0.5, "stride": 2, "preview": True},
+    {"name": "暂停预览", "scale": 0.5, "stride": 2, "preview": False},
+    {"name": "每4帧分析一次", "scale": 0.5, "stride": 4, "preview": False}
+)
+
+SHED_CONFIG = {
+    "target": 0.2,  # 目标延迟（秒）：从采集到分析完成
+    "alpha": 0.2,  # 延迟指数滑动平均系数
+    "degrade_ratio": 1.0,  # 平均延迟超过 target×该值时降级
+    "recover_ratio": 0.5,  # 平均延迟低于 target×该值时恢复
+    "degrade_frames": 5,  # 连续超标的帧数
+    "recover_frames": 50,  # 连续低于恢复线的帧数（恢复比降级更谨慎，避免来回切换）
+    "cooldown": 1.0,  # 两次调整之间至少间隔的秒数，等待新级别的效果体现出来
+    "retry_window": 30.0,  # 恢复后该时间内又降级，说明恢复过早，下次恢复需要的帧数加倍
+    "max_recover_frames": 3000
+}
+
+
+class LoadShedder:
+    """按处理延迟自动调整降级级别
+
+    observe(latency) 记录每帧延迟；skip_frame() 按当前级别的步长决定是否跳过本帧；
+    level / settings 为当前级别，变化时调用 on_change(old, new, settings)。
+    """
+
+    def __init__(self, on_change=None, stream_id="default", levels=SHED_LEVELS, **config):
+        unknown = set(config) - set(SHED_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的降级参数: {', '.join(sorted(unknown))}")
+        self.config = dict(SHED_CONFIG, **config)
+        self.levels = levels
+        self.on_change = on_change
+        self.stream_id = stream_id
+
+        self.level = 0
+        self.ewma = None
+        # 每次级别变化的记录 (时间, 旧级别, 新级别, 平均延迟)
+        self.history = []
+        self._over = 0
+        self._under = 0
+        self._frame_index = 0
+        self._last_change = 0.0
+        # 从各级别恢复所需的连续帧数，以及最近一次从该级别恢复的时间
+        self._recover_needed = [self.config["recover_frames"]] * len(levels)
+        self._recovered_at = [None] * len(levels)
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def skip_frame(self):
+        """按当前步长跳帧，返回 True 表示本帧不分析"""
+        stride = self.settings["stride"]
+        self._frame_index += 1
+        if stride > 1 and self._frame_index % stride:
+            METRICS.inc("shed_frames", self.stream_id)
+            return True
+        return False
+
+    def observe(self, latency):
+        alpha = self.config["alpha"]
+        self.ewma = latency if self.ewma is None else alpha * latency + (1 - alpha) * self.ewma
+
+        target = self.config["target"]
+        if self.ewma > target * self.config["degrade_ratio"]:
+            self._over += 1
+            self._under = 0
+        elif self.ewma < target * self.config["recover_ratio"]:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        now = time.monotonic()
+        if now - self._last_change < self.config["cooldown"]:
+            return
+        if self._over >= self.config["degrade_frames"] and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1, now)
+        elif self._under >= self._recover_needed[self.level] and self.level > 0:
+            self._set_level(self.level - 1, now)
+
+    def _set_level(self, level, now):
+        old = self.level
+        if level > old:
+            recovered_at = self._recovered_at[level]
+            if recovered_at is not None and now - recovered_at < self.config["retry_window"]:
+                self._recover_needed[level] = min(self._recover_needed[level] * 2,
+                                                  self.config["max_recover_frames"])
+        else:
+            self._recovered_at[old] = now
+        self.level = level
+        self._over = self._under = 0
+        self._last_change = now
+        self.history.append((datetime.now(), old, level, self.ewma))
+        METRICS.set_gauge("shed_level", level, self.stream_id)
+
+        action = "降级" if level > old else "恢复"
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 负载{action}: "
+              f"{self.levels[old]['name']} -> {self.levels[level]['name']} "
+              f"(平均延迟 {self.ewma * 1000:.0f}ms, 目标 {self.config['target'] * 1000:.0f}ms)")
+        if self.on_change is not None:
+            self.on_change(old, level, self.settings)
@@ -0,0 +1,202 @@
+"""热路径性能统计
+
+各处理阶段用单调时钟计时，记入滚动直方图；另有按视频流统计的计数器（丢帧）和仪表（队列延迟）。
+通过本机的 Prometheus 文本格式接口和程序内的统计面板查看。
+
+未启用时 timer() 返回共享的空上下文，热路径上只多一次属性判断。
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# 直方图桶上界（秒）
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class Histogram:
+    """累计分桶计数 + 最近 window 个样本的环形数组（用于滚动分位数）"""
+
+    def __init__(self, window=1024):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._recent = np.zeros(window, np.float64)
+        self._pos = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(BUCKETS) and value > BUCKETS[i]:
+            i += 1
+        self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self._recent[self._pos % len(self._recent)] = value
+        self._pos += 1
+
+    def quantiles(self, qs=(0.5, 0.99)):
+        n = min(self._pos, len(self._recent))
+        if n == 0:
+            return [0.0 for _ in qs]
+        return [float(v) for v in np.quantile(self._recent[:n], qs)]
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "stream", "start")
+
+    def __init__(self, metrics, stage, stream):
+        self.metrics = metrics
+        self.stage = stage
+        self.stream = stream
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, self.stream)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def timer(self, stage, stream="default"):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, stream)
+
+    def observe(self, stage, seconds, stream="default"):
+        key = (stage, stream)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, stream="default", value=1):
+        if not self.enabled:
+            return
+        key = (name, stream)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, stream="default"):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, stream)] = value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        """返回 {"stages": [...], "counters": {...}, "gauges": {...}}，供统计面板使用"""
+        with self._lock:
+            stages = []
+            for (stage, stream), histogram in sorted(self._histograms.items()):
+                p50, p99 = histogram.quantiles()
+                stages.append({
+                    "stage": stage,
+                    "stream": stream,
+                    "count": histogram.count,
+                    "mean_ms": histogram.sum / histogram.count * 1000 if histogram.count else 0.0,
+                    "p50_ms": p50 * 1000,
+                    "p99_ms": p99 * 1000
+                })
+            return {"stages": stages, "counters": dict(self._counters), "gauges": dict(self._gauges)}
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP fire_stage_seconds Per-stage processing time.",
+            "# TYPE fire_stage_seconds histogram"
+        ]
+        with self._lock:
+            for (stage, stream), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",stream="{stream}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'fire_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"fire_stage_seconds_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"fire_stage_seconds_count{{{labels}}} {histogram.count}")
+
+            lines.append("# HELP fire_stage_recent_seconds Rolling quantiles over recent samples.")
+            lines.append("# TYPE fire_stage_recent_seconds gauge")
+            for (stage, stream), histogram in sorted(self._histograms.items()):
+                for q, value in zip((0.5, 0.99), histogram.quantiles()):
+                    lines.append(f'fire_stage_recent_seconds{{stage="{stage}",stream="{stream}",'
+                                 f'quantile="{q}"}} {value}')
+
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE fire_{name}_total counter")
+                for (counter, stream), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f'fire_{name}_total{{stream="{stream}"}} {value}')
+
+            for name in sorted({name for name, _ in self._gauges}):
+                lines.append(f"# TYPE fire_{name} gauge")
+                for (gauge, stream), value in sorted(self._gauges.items()):
+                    if gauge == name:
+                        lines.append(f'fire_{name}{{stream="{stream}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# 全局统计实例
+METRICS = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """在本机提供 /metrics 接口（Prometheus 文本格式）"""
+
+    def __init__(self, port=9108, host="127.0.0.1", metrics=METRICS):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.metrics = metrics
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server",
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """基于缩小灰度图帧差的分块运动检测
+
+    画面按 block×block 像素分块；块内变化像素比例超过 min_changed 的块视为动态块。
+    第一帧（没有前一帧）所有块都视为动态。
+    """
+
+    def __init__(self, block=32, threshold=15, min_changed=0.02, scale=0.25):
+        self.block = block
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.scale = scale
+        self.prev_frame = None
+        self._shape = None
+
+    def _ensure_buffers(self, shape):
+        if self._shape == shape:
+            return
+        height, width = shape
+        self.grid = (-(-height // self.block), -(-width // self.block))
+        # 缩小后的尺寸取块的整数倍，便于按块求和
+        cell = max(1, int(round(self.block * self.scale)))
+        self._cell = cell
+        small_size = (self.grid[1] * cell, self.grid[0] * cell)
+        self._small_size = small_size
+        self._gray = np.empty((height, width), np.uint8)
+        self._small = np.empty((small_size[1], small_size[0]), np.uint8)
+        self._diff = np.empty_like(self._small)
+        self.block_map = np.empty(self.grid, np.uint8)
+        self._motion_mask = np.empty((self.grid[0] * self.block, self.grid[1] * self.block), np.uint8)
+        self.prev_frame = None
+        self._shape = shape
+
+    def update(self, frame):
+        """输入新帧，返回动态块图（gh×gw，动态块为255）"""
+        self._ensure_buffers(frame.shape[:2])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        # 缩放到块的整数倍时会有轻微拉伸，对帧差无影响
+        cv2.resize(self._gray, self._small_size, dst=self._small, interpolation=cv2.INTER_AREA)
+
+        if self.prev_frame is None:
+            self.prev_frame = self._small.copy()
+            self.block_map.fill(255)
+            return self.block_map
+
+        cv2.absdiff(self._small, self.prev_frame, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 1, cv2.THRESH_BINARY, dst=self._diff)
+        self._small, self.prev_frame = self.prev_frame, self._small
+
+        cell = self._cell
+        changed = self._diff.reshape(self.grid[0], cell, self.grid[1], cell).sum(axis=(1, 3))
+        np.greater(changed, self.min_changed * cell * cell, out=self.block_map)
+        self.block_map *= 255
+        return self.block_map
+
+    def motion_mask(self, shape):
+        """把动态块图放大为全分辨率掩膜（返回内部缓冲区的视图）"""
+        cv2.resize(self.block_map, (self._motion_mask.shape[1], self._motion_mask.shape[0]),
+                   dst=self._motion_mask, interpolation=cv2.INTER_NEAREST)
+        return self._motion_mask[:shape[0], :shape[1]]
+
+    def rois(self, shape, margin=0):
+        """动态块连通区域的外接矩形 (x0, y0, x1, y1)，全分辨率坐标"""
+        height, width = shape
+        if not self.block_map.any():
+            return []
+        count, _, stats, _ = cv2.connectedComponentsWithStats(self.block_map, connectivity=8)
+        rois = []
+        for x, y, w, h, _ in stats[1:count]:
+            rois.append((max(0, x * self.block - margin), max(0, y * self.block - margin),
+                         min(width, (x + w) * self.block + margin),
+                         min(height, (y + h) * self.block + margin)))
+        return rois
@@ -0,0 +1,170 @@
+"""网络摄像头视频源（RTSP / HTTP-MJPEG）
+
+cv2.VideoCapture 打开网络地址时会在内部缓存若干帧，处理稍慢画面延迟就会越积越大；
+网络中断时 read() 返回 False，上层会误以为视频结束。
+
+NetworkSource 用独立的采集线程不停读取，只保留最新一帧（旧帧直接丢弃）；连接断开后
+按指数退避自动重连。对外提供与 cv2.VideoCapture 相同的 read/isOpened/get/release 接口。
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .metrics import METRICS
+
+NETWORK_SCHEMES = ("rtsp://", "rtsps://", "http://", "https://", "rtmp://", "udp://", "tcp://")
+
+NETWORK_CONFIG = {
+    "open_timeout": 5.0,  # 单次连接超时（秒）
+    "read_timeout": 5.0,  # 连接后超过该时间收不到画面视为断线（秒）
+    "backoff_initial": 0.5,  # 首次重连等待（秒），之后每次翻倍
+    "backoff_max": 10.0
+}
+
+
+def is_network_source(source):
+    return isinstance(source, str) and source.lower().startswith(NETWORK_SCHEMES)
+
+
+def _open(url, open_timeout, read_timeout):
+    params = []
+    # 较新的 OpenCV 支持为 FFmpeg 后端设置超时，避免断网时长时间卡住
+    if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout * 1000),
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout * 1000)]
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params) if params else cv2.VideoCapture(url)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class NetworkSource:
+    """只保留最新一帧、断线自动重连的网络视频源"""
+
+    def __init__(self, url, stream_id="default", **config):
+        unknown = set(config) - set(NETWORK_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的网络视频源参数: {', '.join(sorted(unknown))}")
+        self.config = dict(NETWORK_CONFIG, **config)
+        self.url = url
+        self.stream_id = stream_id
+
+        # connecting / connected / reconnecting / closed
+        self.state = "connecting"
+        self.reconnects = 0
+        self.frames_received = 0
+        self.frames_skipped = 0
+        # 最近一次 read() 返回的画面从接收到被取走经过的时间（秒）
+        self.latency = 0.0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_pos_ms = 0.0
+        self._pos_ms = 0.0
+        self._frame_seq = 0
+        self._read_seq = 0
+        self._props = {}
+        self._connected_once = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._grab_loop, name="network-grab", daemon=True)
+        self._thread.start()
+        # 等待第一次连接结果，使 isOpened() 与 cv2.VideoCapture 的行为一致；首次连接失败不再重试
+        if not self._connected_once.wait(self.config["open_timeout"] + 1.0):
+            self.release()
+
+    def _grab_loop(self):
+        backoff = self.config["backoff_initial"]
+        while not self._stop_event.is_set():
+            cap = _open(self.url, self.config["open_timeout"], self.config["read_timeout"])
+            if cap is None:
+                self._set_state("reconnecting")
+                if self._stop_event.wait(backoff):
+                    break
+                backoff = min(backoff * 2, self.config["backoff_max"])
+                continue
+
+            self._props = {prop: cap.get(prop) for prop in
+                           (cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)}
+            self._set_state("connected")
+            self._connected_once.set()
+            backoff = self.config["backoff_initial"]
+
+            while not self._stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                with self._cond:
+                    if self._frame_seq > self._read_seq:
+                        # 上一帧还没被取走就被新帧替换
+                        self.frames_skipped += 1
+                    self._frame = frame
+                    self._frame_time = time.monotonic()
+                    self._frame_pos_ms = pos_ms
+                    self._frame_seq += 1
+                    self.frames_received += 1
+                    self._cond.notify_all()
+
+            cap.release()
+            if not self._stop_event.is_set():
+                self.reconnects += 1
+                METRICS.inc("reconnects", self.stream_id)
+                print(f"网络视频源断开，正在重连: {self.url}")
+                self._set_state("reconnecting")
+
+        self._set_state("closed")
+
+    def _set_state(self, state):
+        with self._cond:
+            if self.state == "closed":
+                return
+            self.state = state
+            self._cond.notify_all()
+
+    def read(self, image=None, timeout=None):
+        """等待并返回比上次更新的一帧；断线期间一直等待，release() 后或超时返回 (False, None)
+
+        指定 image 时把画面复制到其中（用于解码到共享内存槽位）。
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_seq > self._read_seq or self.state == "closed",
+                                timeout)
+            if self.state == "closed" or self._frame_seq <= self._read_seq:
+                return False, None
+            self._read_seq = self._frame_seq
+            frame = self._frame
+            self._pos_ms = self._frame_pos_ms
+            self.latency = time.monotonic() - self._frame_time
+        METRICS.set_gauge("capture_latency_seconds", self.latency, self.stream_id)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            frame = image
+        return True, frame
+
+    def grab(self):
+        """取走（丢弃）最新一帧"""
+        return self.read()[0]
+
+    def isOpened(self):
+        return self._connected_once.is_set() and self.state != "closed"
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self._pos_ms
+        return self._props.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._stop_event.set()
+        with self._cond:
+            self.state = "closed"
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(self.config["read_timeout"])
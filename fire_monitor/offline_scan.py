@@ -0,0 +1,220 @@
+"""录像文件快速离线扫描，输出火情事件时间线
+
+不按原帧率播放：按自适应步长抽帧检测，检测结果发生变化时回到两次抽样之间逐帧重扫，
+得到准确的事件起止帧；文件按帧号切成若干段，由多个进程并行扫描后合并。
+
+步长越大越快，但持续时间短于 max_stride 帧、且恰好落在两次抽样之间的火情可能漏检。
+抽样的帧不连续，运动/闪烁过滤等依赖连续帧的检测阶段在扫描时关闭，其余检测参数与实时分析相同。
+
+用法:
+    python -m fire_monitor.offline_scan record.mp4
+    python -m fire_monitor.offline_scan record.mp4 --workers 8 --max-stride 16 --output events.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from .config import DETECTION_CONFIG
+
+SCAN_CONFIG = {
+    "min_stride": 1,
+    "max_stride": 16,  # 画面状态不变时步长逐次翻倍，直到该值
+    "merge_gap": 0,  # 间隔不超过该帧数的两次事件合并为一次
+    "align": 250,  # 分段起点对齐到该帧数的整数倍（常见的关键帧间隔）
+    "min_chunk": 1000  # 每段至少这么多帧，避免短文件切得过碎
+}
+
+
+class _ChunkReader:
+    """按帧号读取视频：向前跳帧只 grab 不解码像素，向后才 seek"""
+
+    def __init__(self, path, start):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件: {path}")
+        self.pos = start
+        if start:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    def read(self, index):
+        """读取第 index 帧，返回 (帧, 时间戳ms)；读取失败返回 (None, None)"""
+        if index < self.pos:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.pos = index
+        while self.pos < index:
+            if not self.cap.grab():
+                return None, None
+            self.pos += 1
+        ret, frame = self.cap.read()
+        if not ret:
+            return None, None
+        self.pos += 1
+        return frame, self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def release(self):
+        self.cap.release()
+
+
+def scan_chunk(path, start, end, detector_config=None, options=None):
+    """扫描 [start, end) 帧，返回检测过的帧 [(帧号, 时间戳ms, 火灾比例, 是否火灾)]，按帧号排序"""
+    from .detector import FireDetector, stateless_config
+
+    options = dict(SCAN_CONFIG, **(options or {}))
+    # 自适应步长下相邻两次检测的帧不连续，运动/闪烁过滤会失效
+    detector = FireDetector(**stateless_config(detector_config or {}))
+    reader = _ChunkReader(path, start)
+    samples = []
+
+    def evaluate(index):
+        frame, pos_ms = reader.read(index)
+        if frame is None:
+            return None
+        fire_detected, _ = detector.detect(frame)
+        sample = (index, pos_ms, detector.fire_ratio, bool(fire_detected))
+        samples.append(sample)
+        return sample
+
+    try:
+        stride = options["min_stride"]
+        prev = evaluate(start)
+        index = start
+        while prev is not None and index < end - 1:
+            # 保证最后一帧一定被检测，便于与下一段拼接
+            index = min(index + stride, end - 1)
+            current = evaluate(index)
+            if current is None:
+                break
+            if current[3] != prev[3]:
+                # 状态变化：逐帧重扫两次抽样之间的帧，找到准确的边界
+                for between in range(prev[0] + 1, index):
+                    if evaluate(between) is None:
+                        break
+                stride = options["min_stride"]
+            else:
+                stride = min(stride * 2, options["max_stride"])
+            prev = current
+    finally:
+        reader.release()
+
+    samples.sort()
+    return samples
+
+
+def build_events(samples, merge_gap=0):
+    """把检测过的帧合并为事件；相邻两次抽样都是火灾时，中间未检测的帧视为火灾"""
+    events = []
+    current = None
+    for index, pos_ms, ratio, fire in samples:
+        if not fire:
+            if current is not None:
+                events.append(current)
+                current = None
+            continue
+        if current is None:
+            if events and index - events[-1]["end_frame"] - 1 <= merge_gap:
+                current = events.pop()
+            else:
+                current = {"start_frame": index, "start_ms": pos_ms,
+                           "peak_ratio": 0.0, "peak_ms": pos_ms}
+        current["end_frame"] = index
+        current["end_ms"] = pos_ms
+        if ratio > current["peak_ratio"]:
+            current["peak_ratio"] = ratio
+            current["peak_ms"] = pos_ms
+    if current is not None:
+        events.append(current)
+    return events
+
+
+def split_chunks(frame_count, workers, align, min_chunk):
+    """按帧号切分，分段起点对齐到 align 的整数倍"""
+    count = max(1, min(workers, frame_count // max(1, min_chunk)))
+    size = -(-frame_count // count)
+    size = -(-size // align) * align
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+
+def _init_worker():
+    # 并行时每个进程只用一个线程，避免 OpenCV 线程互相争抢
+    cv2.setNumThreads(1)
+
+
+def scan_file(path, workers=None, detector_config=None, options=None):
+    """并行扫描整个文件，返回 {"events": [...], "frames": 总帧数, "evaluated": 检测帧数, "elapsed": 秒}
+
+    detector_config 默认使用 DETECTION_CONFIG，与实时分析一致。
+    """
+    if detector_config is None:
+        detector_config = DETECTION_CONFIG
+    options = dict(SCAN_CONFIG, **(options or {}))
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开视频文件: {path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if frame_count <= 0:
+        raise RuntimeError(f"无法获取视频帧数: {path}")
+
+    workers = workers or os.cpu_count() or 1
+    chunks = split_chunks(frame_count, workers, options["align"], options["min_chunk"])
+
+    start = time.perf_counter()
+    samples = []
+    if len(chunks) == 1:
+        samples = scan_chunk(path, 0, frame_count, detector_config, options)
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=mp.get_context("spawn"),
+                                 initializer=_init_worker) as pool:
+            futures = [pool.submit(scan_chunk, path, chunk_start, chunk_end, detector_config, options)
+                       for chunk_start, chunk_end in chunks]
+            # 各段按顺序首尾相接，直接拼接即可保持帧号有序
+            for future in futures:
+                samples.extend(future.result())
+
+    return {
+        "events": build_events(samples, options["merge_gap"]),
+        "frames": frame_count,
+        "evaluated": len(samples),
+        "elapsed": time.perf_counter() - start
+    }
+
+
+def format_ms(ms):
+    seconds, ms = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="录像文件快速离线扫描")
+    parser.add_argument("path", help="视频文件路径")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认等于CPU核数")
+    parser.add_argument("--max-stride", type=int, default=SCAN_CONFIG["max_stride"],
+                        help="最大抽帧步长")
+    parser.add_argument("--merge-gap", type=int, default=SCAN_CONFIG["merge_gap"],
+                        help="间隔不超过该帧数的事件合并")
+    parser.add_argument("--output", default=None, help="把结果保存为 JSON 文件")
+    args = parser.parse_args(argv)
+
+    result = scan_file(args.path, args.workers,
+                       options={"max_stride": args.max_stride, "merge_gap": args.merge_gap})
+    for event in result["events"]:
+        print(f"{format_ms(event['start_ms'])} - {format_ms(event['end_ms'])}  "
+              f"帧 {event['start_frame']}-{event['end_frame']}  峰值比例 {event['peak_ratio']:.4f}")
+    print(f"共 {len(result['events'])} 次事件，检测 {result['evaluated']}/{result['frames']} 帧，"
+          f"耗时 {result['elapsed']:.1f} 秒", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+
+from .metrics import METRICS
+
+# 流结束标记
+_END = object()
+
+
+class FrameQueue:
+    """有界帧队列
+
+    drop_oldest=True 时队列满则丢弃最旧的一帧（实时源，始终分析最新帧）；
+    否则写入方阻塞等待（文件源，背压）。
+    """
+
+    def __init__(self, maxsize, drop_oldest=False):
+        self._queue = queue.Queue(maxsize)
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+
+    def put(self, item, stop_event):
+        if self.drop_oldest:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+        while not stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class VideoPipeline:
+    """采集 / 分析 / 显示 三级流水线，各级之间用有界队列连接
+
+    analyze(frame) 在分析线程中执行并返回要显示的结果；display(result) 在显示线程中执行。
+    显示队列总是只保留最新结果，显示慢不会拖慢分析。
+
+    指定 detector_pool（shm_ring.DetectorPool）时，采集线程把画面直接解码到共享内存，
+    检测在独立进程中进行，分析线程按帧序调用 analyze(frame, detection)；analyze 返回后
+    共享内存槽位即被复用，不能保留 frame/detection 的引用。
+
+    指定 shedder（load_shedding.LoadShedder）时，按其当前步长在采集时跳帧，并把每帧从采集到
+    分析完成的延迟反馈给它。
+
+    analyze 抛出异常时整条流水线停止，异常保存在 error 中，on_end 照常调用。
+    """
+
+    def __init__(self, cap, analyze, display, live=False, fps=None,
+                 queue_size=2, on_end=None, stream_id="default", detector_pool=None, shedder=None):
+        self.cap = cap
+        self.analyze = analyze
+        self.display = display
+        self.live = live
+        # 文件源按原始帧率回放；实时源由设备本身控制节奏
+        self.frame_interval = 1.0 / fps if fps and not live else 0
+        self.on_end = on_end
+        self.stream_id = stream_id
+        self.detector_pool = detector_pool
+        self.shedder = shedder
+
+        self.capture_queue = FrameQueue(queue_size, drop_oldest=live)
+        self.display_queue = FrameQueue(queue_size, drop_oldest=True)
+        self.frames_captured = 0
+        self.frames_analyzed = 0
+        # 分析出错时的异常，正常结束或被停止时为 None
+        self.error = None
+
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for name, target in (("capture", self._capture_loop),
+                             ("analysis", self._analysis_loop),
+                             ("display", self._display_loop)):
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=1.0):
+        """通知各级线程退出并等待最多 timeout 秒；返回是否全部退出"""
+        self._stop_event.set()
+        return self.join(timeout)
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not self.is_running()
+
+    def is_running(self):
+        return any(thread.is_alive() and thread is not threading.current_thread()
+                   for thread in self._threads)
+
+    def queue_depths(self):
+        """各级队列当前深度及累计丢帧数"""
+        if self.detector_pool is not None:
+            return {
+                "capture": self.detector_pool.pending(),
+                "display": self.display_queue.qsize(),
+                "capture_dropped": self.detector_pool.dropped,
+                "display_dropped": self.display_queue.dropped
+            }
+        return {
+            "capture": self.capture_queue.qsize(),
+            "display": self.display_queue.qsize(),
+            "capture_dropped": self.capture_queue.dropped,
+            "display_dropped": self.display_queue.dropped
+        }
+
+    def _capture_loop(self):
+        pool = self.detector_pool
+        try:
+            self._capture_frames()
+        except Exception as e:
+            print(f"视频采集出错: {e}")
+        finally:
+            # 无论正常结束还是出错，都要通知分析线程输入已结束，否则分析线程会一直等待
+            if pool is not None:
+                pool.end_input()
+            else:
+                self.capture_queue.put(_END, self._stop_event)
+
+    def _capture_frames(self):
+        pool = self.detector_pool
+        next_due = time.monotonic()
+        while not self._stop_event.is_set():
+            if self.shedder is not None and self.shedder.skip_frame():
+                # 降级跳过的帧只读走，不解码到队列
+                if not self.cap.grab():
+                    break
+            elif pool is not None:
+                dropped = pool.dropped
+                # 降级缩小检测分辨率由检测进程执行
+                scale = self.shedder.settings["scale"] if self.shedder is not None else 1.0
+                with METRICS.timer("decode", self.stream_id):
+                    ret, _ = pool.capture(self.cap, block=not self.live, stop_event=self._stop_event,
+                                          scale=scale)
+                if not ret:
+                    break
+                self.frames_captured += 1
+                if pool.dropped != dropped:
+                    METRICS.inc("dropped_frames", self.stream_id, pool.dropped - dropped)
+            else:
+                with METRICS.timer("decode", self.stream_id):
+                    ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.frames_captured += 1
+                dropped = self.capture_queue.dropped
+                # 入队时间用于统计排队延迟
+                if not self.capture_queue.put((time.monotonic(), frame), self._stop_event):
+                    return
+                if self.capture_queue.dropped != dropped:
+                    METRICS.inc("dropped_frames", self.stream_id,
+                                self.capture_queue.dropped - dropped)
+
+            if self.frame_interval:
+                next_due += self.frame_interval
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_due = time.monotonic()
+
+    def _analysis_loop(self):
+        try:
+            if self.detector_pool is not None:
+                self._pooled_analysis_frames()
+            else:
+                self._analysis_frames()
+        except Exception as e:
+            print(f"视频分析出错: {e}")
+            self.error = e
+            # 让采集线程不再阻塞在满队列上
+            self._stop_event.set()
+        finally:
+            # 无论正常结束还是出错，都要通知显示线程结束
+            self.display_queue.put(_END, self._stop_event)
+
+    def _analysis_frames(self):
+        while True:
+            item = self.capture_queue.get(self._stop_event)
+            if item is _END:
+                break
+            queued_at, frame = item
+            if METRICS.enabled:
+                METRICS.set_gauge("queue_lag_seconds", time.monotonic() - queued_at, self.stream_id)
+                METRICS.set_gauge("capture_queue_depth", self.capture_queue.qsize(), self.stream_id)
+            result = self.analyze(frame)
+            if self.shedder is not None:
+                self.shedder.observe(time.monotonic() - queued_at)
+            self._emit(result)
+
+    def _pooled_analysis_frames(self):
+        pool = self.detector_pool
+        while not self._stop_event.is_set():
+            detection = pool.next_result(timeout=0.1)
+            if detection is None:
+                continue
+            if detection is False:
+                break
+            if METRICS.enabled:
+                METRICS.set_gauge("capture_queue_depth", pool.pending(), self.stream_id)
+            try:
+                result = self.analyze(detection.frame, detection)
+            finally:
+                pool.release(detection)
+            if self.shedder is not None:
+                self.shedder.observe(time.monotonic() - detection.captured_at)
+            self._emit(result)
+
+    def _emit(self, result):
+        self.frames_analyzed += 1
+        dropped = self.display_queue.dropped
+        self.display_queue.put(result, self._stop_event)
+        if self.display_queue.dropped != dropped:
+            METRICS.inc("display_dropped_frames", self.stream_id,
+                        self.display_queue.dropped - dropped)
+
+    def _display_loop(self):
+        while True:
+            result = self.display_queue.get(self._stop_event)
+            if result is _END:
+                break
+            self.display(result)
+
+        # 所有级都处理完毕才算自然结束；分析出错时也要通知，否则界面一直停在分析中
+        if (not self._stop_event.is_set() or self.error is not None) and self.on_end is not None:
+            self.on_end()
@@ -0,0 +1,90 @@
+import threading
+
+import cv2
+from PIL import Image, ImageTk
+
+from .metrics import METRICS
+
+
+class PreviewRenderer:
+    """Tk 视频预览
+
+    任意线程通过 submit() 提交最新帧，只保留最新的一帧；Tk 线程按 max_fps 的上限取出并绘制，
+    画面缩放到显示区域的实际大小，尺寸不变时复用同一个 PhotoImage（paste）。
+    """
+
+    def __init__(self, root, panel, max_fps=15, on_tick=None):
+        self.root = root
+        self.panel = panel
+        self.interval = max(1, int(1000 / max_fps))
+        # 每次绘制后在 Tk 线程中调用，用于合并刷新其他界面状态
+        self.on_tick = on_tick
+
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+        # 暂停时丢弃提交的画面，界面保留最后一帧（过载降级时使用）
+        self.paused = False
+
+        self._lock = threading.Lock()
+        self._latest = None
+        self._photo = None
+        self._photo_size = None
+        self._after_id = None
+
+    def submit(self, frame):
+        with self._lock:
+            if self._latest is not None:
+                self.frames_skipped += 1
+            self._latest = frame
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._latest = None
+
+    def _tick(self):
+        with self._lock:
+            frame, self._latest = self._latest, None
+        if frame is not None:
+            if self.paused:
+                self.frames_skipped += 1
+            else:
+                self._draw(frame)
+        if self.on_tick is not None:
+            self.on_tick()
+        self._after_id = self.root.after(self.interval, self._tick)
+
+    def _target_size(self, width, height):
+        # 按显示区域等比缩放；区域尚未布局时保持原尺寸
+        # 减去边框，避免图像把控件撑大后反复放大
+        border = 2 * (int(self.panel.cget("borderwidth")) + int(self.panel.cget("highlightthickness")))
+        panel_w = self.panel.winfo_width() - border
+        panel_h = self.panel.winfo_height() - border
+        if panel_w <= 1 or panel_h <= 1:
+            return width, height
+        scale = min(panel_w / width, panel_h / height)
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _draw(self, frame):
+        with METRICS.timer("display"):
+            height, width = frame.shape[:2]
+            size = self._target_size(width, height)
+            if size != (width, height):
+                interpolation = cv2.INTER_AREA if size[0] < width else cv2.INTER_LINEAR
+                frame = cv2.resize(frame, size, interpolation=interpolation)
+            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+            if self._photo is not None and self._photo_size == size:
+                self._photo.paste(img)
+            else:
+                self._photo = ImageTk.PhotoImage(image=img)
+                self._photo_size = size
+                self.panel.configure(image=self._photo)
+                self.panel.image = self._photo
+        self.frames_drawn += 1
@@ -0,0 +1,188 @@
+"""火灾区域提取与跨帧跟踪
+
+extract_regions 用一次 connectedComponentsWithStats 得到所有区域的面积、外接框和质心数组，
+不再逐个轮廓调用 contourArea/boundingRect。RegionTracker 按外接框重叠度（或质心距离）
+把相邻帧的区域关联起来，给每个区域一个固定编号，并统计面积增长率和质心漂移速度：
+持续扩大的区域比单帧面积更能说明是火焰。
+"""
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# 跟踪参数默认值
+TRACK_CONFIG = {
+    "min_iou": 0.1,  # 外接框重叠度不低于该值视为同一区域
+    "max_distance": 0.05,  # 不重叠时，质心距离小于 画面对角线×该值 也视为同一区域
+    "max_missed": 5,  # 连续多少帧未匹配后删除
+    "history": 2.0  # 计算增长率和漂移使用的时间窗口（秒）
+}
+
+
+class Regions:
+    """一帧中的火灾区域：areas[N] 像素面积，boxes[N, 4] (x, y, w, h)，centroids[N, 2] (x, y)"""
+
+    __slots__ = ("areas", "boxes", "centroids", "shape")
+
+    def __init__(self, areas, boxes, centroids, shape):
+        self.areas = areas
+        self.boxes = boxes
+        self.centroids = centroids
+        self.shape = shape
+
+    def __len__(self):
+        return len(self.areas)
+
+    @classmethod
+    def empty(cls, shape=None):
+        return cls(np.empty(0, np.int32), np.empty((0, 4), np.int32), np.empty((0, 2)), shape)
+
+
+def extract_regions(fire_mask, min_area=100):
+    """单次遍历掩膜，返回面积大于 min_area 的区域（8 连通）"""
+    # 统计量的开销与图像面积成正比，先裁剪到非零像素的外接框
+    x, y, w, h = cv2.boundingRect(fire_mask)
+    if w == 0 or h == 0:
+        return Regions.empty(fire_mask.shape[:2])
+    _, _, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+        fire_mask[y:y + h, x:x + w], 8, cv2.CV_32S, cv2.CCL_BBDT)
+
+    # 第 0 个是背景
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    keep = areas > min_area
+    boxes = stats[1:, :4][keep]
+    boxes[:, 0] += x
+    boxes[:, 1] += y
+    return Regions(areas[keep], boxes, centroids[1:][keep] + (x, y), fire_mask.shape[:2])
+
+
+def _box_iou(a, b):
+    """两组外接框 (x, y, w, h) 的两两重叠度，形状 [len(a), len(b)]"""
+    ax0, ay0 = a[:, None, 0], a[:, None, 1]
+    ax1, ay1 = ax0 + a[:, None, 2], ay0 + a[:, None, 3]
+    bx0, by0 = b[None, :, 0], b[None, :, 1]
+    bx1, by1 = bx0 + b[None, :, 2], by0 + b[None, :, 3]
+    w = np.clip(np.minimum(ax1, bx1) - np.maximum(ax0, bx0), 0, None)
+    h = np.clip(np.minimum(ay1, by1) - np.maximum(ay0, by0), 0, None)
+    inter = w * h
+    union = (a[:, None, 2] * a[:, None, 3] + b[None, :, 2] * b[None, :, 3]) - inter
+    return inter / np.maximum(union, 1)
+
+
+class Track:
+    """被跟踪的区域"""
+
+    __slots__ = ("id", "box", "area", "centroid", "first_seen", "last_seen", "hits", "missed",
+                 "_history")
+
+    def __init__(self, track_id, box, area, centroid, t):
+        self.id = track_id
+        self.first_seen = t
+        self.hits = 0
+        self.missed = 0
+        self._history = deque()
+        self.box = self.area = self.centroid = self.last_seen = None
+        self._update(box, area, centroid, t)
+
+    def _update(self, box, area, centroid, t):
+        self.box = box
+        self.area = int(area)
+        self.centroid = (float(centroid[0]), float(centroid[1]))
+        self.last_seen = t
+        self.hits += 1
+        self.missed = 0
+        self._history.append((t, self.area, self.centroid))
+
+    def _trim(self, window):
+        while len(self._history) > 2 and self._history[-1][0] - self._history[0][0] > window:
+            self._history.popleft()
+
+    @property
+    def growth_rate(self):
+        """面积的相对增长率（每秒），按 log(面积) 对时间的最小二乘斜率计算，对闪烁不敏感"""
+        if len(self._history) < 2:
+            return 0.0
+        t = np.array([h[0] for h in self._history])
+        log_area = np.log(np.array([h[1] for h in self._history], np.float64))
+        t = t - t.mean()
+        denom = float(np.dot(t, t))
+        if denom <= 0:
+            return 0.0
+        return float(np.expm1(np.dot(t, log_area - log_area.mean()) / denom))
+
+    @property
+    def drift(self):
+        """质心漂移速度（像素/秒），(vx, vy)"""
+        t0, _, (x0, y0) = self._history[0]
+        t1, _, (x1, y1) = self._history[-1]
+        if t1 <= t0:
+            return 0.0, 0.0
+        return (x1 - x0) / (t1 - t0), (y1 - y0) / (t1 - t0)
+
+    @property
+    def age(self):
+        return self.last_seen - self.first_seen
+
+
+class RegionTracker:
+    """给区域分配跨帧不变的编号；每帧调用一次 update（没有火时传空区域，让旧区域过期）"""
+
+    def __init__(self, **config):
+        unknown = set(config) - set(TRACK_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的跟踪参数: {', '.join(sorted(unknown))}")
+        self.config = dict(TRACK_CONFIG, **config)
+        self.tracks = []
+        self._next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def update(self, regions, t=None):
+        """关联本帧区域，返回本帧匹配到或新建的 Track 列表（与 regions 顺序一致）"""
+        t = time.monotonic() if t is None else t
+        matched = [None] * len(regions)
+
+        if self.tracks and len(regions):
+            boxes = np.array([track.box for track in self.tracks])
+            centers = np.array([track.centroid for track in self.tracks])
+            iou = _box_iou(boxes, regions.boxes)
+            dist = np.linalg.norm(centers[:, None] - regions.centroids[None], axis=2)
+            height, width = regions.shape if regions.shape is not None else (0, 0)
+            max_dist = self.config["max_distance"] * float(np.hypot(height, width))
+
+            # 重叠度优先，其次质心距离，贪心匹配
+            valid = (iou >= self.config["min_iou"]) | (dist <= max_dist)
+            score = np.where(iou >= self.config["min_iou"], iou, -dist)
+            rows, cols = np.nonzero(valid)
+            used_tracks = set()
+            for k in np.argsort(-score[rows, cols], kind="stable"):
+                i, j = int(rows[k]), int(cols[k])
+                if i in used_tracks or matched[j] is not None:
+                    continue
+                used_tracks.add(i)
+                matched[j] = self.tracks[i]
+
+        for j, track in enumerate(matched):
+            box = tuple(int(v) for v in regions.boxes[j])
+            if track is None:
+                track = Track(self._next_id, box, regions.areas[j], regions.centroids[j], t)
+                self._next_id += 1
+                self.tracks.append(track)
+                matched[j] = track
+            else:
+                track._update(box, regions.areas[j], regions.centroids[j], t)
+            track._trim(self.config["history"])
+
+        # 未匹配的区域累计丢失帧数，超过上限后删除
+        current = set(map(id, matched))
+        alive = []
+        for track in self.tracks:
+            if id(track) not in current:
+                track.missed += 1
+                if track.missed > self.config["max_missed"]:
+                    continue
+            alive.append(track)
+        self.tracks = alive
+        return matched
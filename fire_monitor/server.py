@@ -0,0 +1,521 @@
+"""无界面服务模式：用 asyncio 提供远程查看标注画面、报警事件和运行状态的 HTTP 接口
+
+    GET /                      各路视频的预览页
+    GET /stream/<编号>.mjpg    标注后的 MJPEG 预览
+    GET /snapshot/<编号>.jpg   最新一帧
+    GET /events                Server-Sent Events：detection / alarm / end 事件
+    GET /status                JSON 状态（对应界面上的 FPS、火情、报警次数）
+
+每路视频在自己的线程中采集、检测、标注，每帧只编码一次 JPEG，所有观看者共享同一份字节。
+观看者上一帧还没发送完（drain 未返回）时中间的帧直接跳过，服务端不为慢客户端排队，
+增加观看者不增加编码开销。
+
+用法:
+    python -m fire_monitor.server video.mp4 0 rtsp://192.168.1.10/stream --port 8090
+    python -m fire_monitor.server video.mp4 --loop --no-dispatch
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+import cv2
+
+from .config import ALARM_CONFIG, DETECTION_CONFIG, SERVER_CONFIG
+from .detector import FireDetector, annotate_fire
+from .network_source import NetworkSource, is_network_source
+from .regions import RegionTracker, Regions, extract_regions
+from .stream_manager import AlarmState
+
+BOUNDARY = "frame"
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def parse_source(source):
+    # 纯数字视为摄像头编号
+    return int(source) if source.isdigit() else source
+
+
+def describe_location(source):
+    """报警位置描述，与界面一致"""
+    if isinstance(source, int):
+        return f"摄像头{source}画面"
+    if is_network_source(source):
+        return f"网络摄像头: {source}"
+    return f"视频文件: {source}"
+
+
+class FrameChannel:
+    """单路视频的最新预览帧；只在事件循环线程中访问"""
+
+    def __init__(self):
+        self.seq = 0
+        self.jpeg = None
+        # 预先拼好 multipart 分段，每个观看者只需一次 write
+        self.chunk = None
+        self.viewers = 0
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def publish(self, jpeg):
+        self.seq += 1
+        self.jpeg = jpeg
+        self.chunk = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                      f"Content-Length: {len(jpeg)}\r\n\r\n").encode("ascii") + jpeg + b"\r\n"
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        # 换一个新的 Event 再唤醒旧的，等待者醒来后总是取到最新一帧
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def next(self, after):
+        """等待序号大于 after 的帧，返回 (序号, 分段)；视频结束时分段为 None"""
+        while self.seq <= after:
+            if self.closed:
+                return self.seq, None
+            await self._event.wait()
+        return self.seq, self.chunk
+
+
+class EventHub:
+    """SSE 事件广播；每条事件只序列化一次，保留最近的事件供断线重连补发"""
+
+    def __init__(self, backlog=256, client_queue=64):
+        self.client_queue = client_queue
+        self.last_id = 0
+        self.dropped = 0
+        self._backlog = deque(maxlen=backlog)
+        self._subscribers = set()
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        self.last_id += 1
+        message = (f"id: {self.last_id}\nevent: {event}\n"
+                   f"data: {json.dumps(data, ensure_ascii=False)}\n\n").encode("utf-8")
+        self._backlog.append((self.last_id, message))
+        for q in self._subscribers:
+            if q.full():
+                # 慢客户端丢弃最旧的事件，不让积压无限增长
+                q.get_nowait()
+                self.dropped += 1
+            q.put_nowait(message)
+
+    def subscribe(self, last_event_id=None):
+        q = asyncio.Queue(self.client_queue)
+        if last_event_id is not None:
+            for event_id, message in self._backlog:
+                if event_id > last_event_id and not q.full():
+                    q.put_nowait(message)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        self._subscribers.discard(q)
+
+    def close(self):
+        """通知所有订阅者结束"""
+        for q in self._subscribers:
+            if q.full():
+                q.get_nowait()
+            q.put_nowait(None)
+
+
+class StreamWorker:
+    """单路视频的采集、检测、标注和预览编码线程"""
+
+    def __init__(self, server, stream_id, source, loop_file=False):
+        self.server = server
+        self.stream_id = stream_id
+        self.source = source
+        self.loop_file = loop_file
+        self.config = server.config
+        self.channel = FrameChannel()
+        self.status = {"stream_id": stream_id, "source": str(source), "state": "starting",
+                       "fps": 0.0, "fps_text": "FPS: 0.0", "fire": False,
+                       "fire_status": "火情: 未检测到", "fire_ratio": 0.0, "alarm_triggered": False,
+                       "alarm_count": 0, "frames": 0, "regions": 0}
+        self._thread = threading.Thread(target=self._run, name=f"server-{stream_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _open(self):
+        if is_network_source(self.source):
+            return NetworkSource(self.source, self.stream_id)
+        return cv2.VideoCapture(self.source)
+
+    def _set_status(self, **values):
+        # 整体替换字典，读取方（事件循环线程）总是看到一致的状态
+        self.status = dict(self.status, **values)
+
+    def _run(self):
+        try:
+            self._analyze()
+        except Exception as e:
+            print(f"视频流 {self.stream_id} 分析出错: {e}")
+            self._set_status(state="error", error=str(e))
+        self.server.call_soon(self.channel.close)
+        self.server.emit("end", {"stream_id": self.stream_id, "state": self.status["state"]})
+
+    def _analyze(self):
+        cap = self._open()
+        if not cap.isOpened():
+            self._set_status(state="error", error=f"无法打开视频源: {self.source}")
+            return
+
+        # 录像文件按原始帧率播放，实时源有一帧处理一帧
+        live = not isinstance(self.source, str) or is_network_source(self.source)
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if not 0 < source_fps < 240:
+            source_fps = 25.0
+        detector = FireDetector(**dict(DETECTION_CONFIG, flicker_fps=source_fps))
+        tracker = RegionTracker()
+        alarm = AlarmState()
+        stop = self.server.stop_event
+        interval = 1.0 / source_fps
+        preview_interval = 1.0 / self.config["preview_fps"]
+        next_due = time.monotonic()
+        last_preview = last_detection = 0.0
+        rate_start, rate_frames, fps = time.monotonic(), 0, 0.0
+        frames = played = 0
+        self._set_status(state="running")
+
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    # 循环播放时从头再来；一帧都读不出时不再重试
+                    if live or not self.loop_file or played == 0:
+                        break
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    played = 0
+                    continue
+                played += 1
+
+                fire_detected, fire_mask = detector.detect(frame)
+                regions = extract_regions(fire_mask) if fire_detected else Regions.empty()
+                tracks = tracker.update(regions)
+                alarm_event = alarm.update(fire_detected)
+                frames += 1
+
+                # 帧率按最近一秒统计
+                rate_frames += 1
+                now = time.monotonic()
+                if now - rate_start >= 1.0:
+                    fps = rate_frames / (now - rate_start)
+                    rate_start, rate_frames = now, 0
+                self._set_status(fps=round(fps, 2), fps_text=f"FPS: {fps:.1f}",
+                                 fire=bool(fire_detected),
+                                 fire_status="火情: 检测到!" if alarm.alarm_triggered else "火情: 未检测到",
+                                 fire_ratio=round(detector.fire_ratio, 6),
+                                 alarm_triggered=alarm.alarm_triggered, alarm_count=alarm.alarm_count,
+                                 frames=frames, regions=len(regions))
+
+                if alarm_event is not None:
+                    self.server.alarm(self, alarm_event, detector.fire_ratio)
+                if fire_detected and now - last_detection >= self.config["detection_interval"]:
+                    last_detection = now
+                    self.server.emit("detection", {
+                        "stream_id": self.stream_id,
+                        "ts": time.time(),
+                        "fire_ratio": round(detector.fire_ratio, 6),
+                        "regions": [{"id": track.id, "area": track.area, "bbox": list(track.box),
+                                     "growth_rate": round(track.growth_rate, 4)} for track in tracks]
+                    })
+
+                # 有观看者时按预览帧率编码，没有时每秒编码一帧供快照使用
+                wanted = preview_interval if self.channel.viewers else 1.0
+                if now - last_preview >= wanted:
+                    last_preview = now
+                    if fire_detected:
+                        annotate_fire(frame, fire_mask, stream_id=self.stream_id, regions=regions,
+                                      tracks=tracks)
+                    cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                    jpeg = self._encode(frame)
+                    if jpeg is not None:
+                        self.server.call_soon(self.channel.publish, jpeg)
+
+                if not live:
+                    next_due += interval
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        stop.wait(delay)
+                    elif delay < -interval:
+                        # 落后超过一帧时不追赶，从当前时间重新计时
+                        next_due = time.monotonic()
+        finally:
+            cap.release()
+        self._set_status(state="stopped" if stop.is_set() else "ended")
+
+    def _encode(self, frame):
+        """编码预览帧，失败时返回 None（跳过这一帧，观看者继续看到上一帧）"""
+        width = self.config["preview_width"]
+        if frame.shape[1] > width:
+            height = int(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.config["jpeg_quality"]])
+        if not ok:
+            return None
+        return buf.tobytes()
+
+
+class FireServer:
+    """多路视频的无界面服务；run() 阻塞运行，start()/stop() 在后台线程中运行（便于测试）"""
+
+    def __init__(self, sources, host=None, port=None, dispatcher=None, loop_file=False, **config):
+        unknown = set(config) - set(SERVER_CONFIG)
+        if unknown:
+            raise ValueError(f"未知的服务参数: {', '.join(sorted(unknown))}")
+        self.config = dict(SERVER_CONFIG, **config)
+        self.host = self.config["host"] if host is None else host
+        self.port = self.config["port"] if port is None else port
+        # 报警分发器（与界面共用 alarm_dispatcher），为 None 时只通过事件流推送
+        self.dispatcher = dispatcher
+        self.started_at = time.time()
+        self.stop_event = threading.Event()
+        self.workers = {}
+        for i, source in enumerate(sources):
+            stream_id = f"stream-{i}"
+            self.workers[stream_id] = StreamWorker(self, stream_id, source, loop_file)
+        self.events = None
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    # ---- 供分析线程调用 ----
+
+    def call_soon(self, callback, *args):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def emit(self, event, data):
+        self.call_soon(self.events.publish, event, data)
+
+    def alarm(self, worker, alarm_event, fire_ratio):
+        location = describe_location(worker.source)
+        self.emit("alarm", {"stream_id": worker.stream_id, "state": alarm_event, "ts": time.time(),
+                            "location": location, "fire_ratio": round(fire_ratio, 6),
+                            "alarm_count": worker.status["alarm_count"]})
+        if alarm_event == "raised" and self.dispatcher is not None:
+            self.dispatcher.submit("自动检测", location, "系统自动检测到可能的火灾", True, None)
+
+    # ---- 运行 ----
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self.events = EventHub(self.config["event_backlog"], self.config["client_queue"])
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        for worker in self.workers.values():
+            worker.start()
+        self._ready.set()
+        print(f"服务已启动: http://{self.host}:{self.port}/")
+        try:
+            while not self.stop_event.is_set():
+                await asyncio.sleep(0.2)
+        finally:
+            self._server.close()
+            # 结束所有长连接，否则 wait_closed 会一直等待
+            for worker in self.workers.values():
+                worker.channel.close()
+            self.events.close()
+            await self._server.wait_closed()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop_event.set()
+            for worker in self.workers.values():
+                worker.join(2.0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="fire-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(10.0)
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ---- HTTP ----
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            parts = lines[0].split(" ")
+            if len(parts) != 3:
+                await self._respond(writer, 400, b"bad request", "text/plain")
+                return
+            method, target, _ = parts
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            if method != "GET":
+                await self._respond(writer, 405, b"method not allowed", "text/plain")
+                return
+            await self._route(unquote(urlsplit(target).path), headers, writer)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    async def _route(self, path, headers, writer):
+        if path == "/":
+            await self._respond(writer, 200, self._index().encode("utf-8"), "text/html; charset=utf-8")
+        elif path == "/status":
+            body = json.dumps(self.snapshot_status(), ensure_ascii=False).encode("utf-8")
+            await self._respond(writer, 200, body, "application/json; charset=utf-8")
+        elif path == "/events":
+            last_id = headers.get("last-event-id")
+            await self._events(writer, int(last_id) if last_id and last_id.isdigit() else None)
+        elif path.startswith("/stream/") and path.endswith(".mjpg"):
+            worker = self.workers.get(path[len("/stream/"):-len(".mjpg")])
+            if worker is None:
+                await self._respond(writer, 404, b"not found", "text/plain")
+            else:
+                await self._mjpeg(writer, worker.channel)
+        elif path.startswith("/snapshot/") and path.endswith(".jpg"):
+            worker = self.workers.get(path[len("/snapshot/"):-len(".jpg")])
+            if worker is None or worker.channel.jpeg is None:
+                await self._respond(writer, 404, b"not found", "text/plain")
+            else:
+                await self._respond(writer, 200, worker.channel.jpeg, "image/jpeg")
+        else:
+            await self._respond(writer, 404, b"not found", "text/plain")
+
+    async def _respond(self, writer, status, body, content_type):
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nCache-Control: no-cache\r\n"
+                     f"Connection: close\r\n\r\n".encode("ascii") + body)
+        await writer.drain()
+
+    async def _mjpeg(self, writer, channel):
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary={BOUNDARY}\r\n"
+                     f"Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode("ascii"))
+        channel.viewers += 1
+        try:
+            seq = 0
+            while True:
+                seq, chunk = await channel.next(seq)
+                if chunk is None:
+                    break
+                writer.write(chunk)
+                # 发送期间到达的帧被跳过，下一轮直接取最新一帧
+                await writer.drain()
+        finally:
+            channel.viewers -= 1
+
+    async def _events(self, writer, last_event_id):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\nretry: 3000\n\n")
+        q = self.events.subscribe(last_event_id)
+        try:
+            await writer.drain()
+            while not self.stop_event.is_set():
+                try:
+                    message = await asyncio.wait_for(q.get(), 15.0)
+                except asyncio.TimeoutError:
+                    # 心跳注释，防止代理断开空闲连接
+                    message = b": keepalive\n\n"
+                if message is None:
+                    break
+                writer.write(message)
+                await writer.drain()
+        finally:
+            self.events.unsubscribe(q)
+
+    def snapshot_status(self):
+        streams = []
+        for worker in self.workers.values():
+            status = dict(worker.status, viewers=worker.channel.viewers)
+            streams.append(status)
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "event_subscribers": self.events.subscribers,
+            "events_dropped": self.events.dropped,
+            "streams": streams
+        }
+
+    def _index(self):
+        items = "\n".join(f'<figure><img src="/stream/{stream_id}.mjpg" width="640">'
+                          f'<figcaption>{stream_id}: {worker.source}</figcaption></figure>'
+                          for stream_id, worker in self.workers.items())
+        return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>火灾监控</title></head>"
+                f"<body><h1>火灾监控</h1>{items}<pre id=\"events\"></pre><script>"
+                "const log = document.getElementById('events');"
+                "const source = new EventSource('/events');"
+                "for (const name of ['alarm', 'detection', 'end']) {"
+                "  source.addEventListener(name, e => {"
+                "    log.textContent = name + ' ' + e.data + '\\n' + log.textContent.slice(0, 5000);"
+                "  });"
+                "}</script></body></html>")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面火灾监控服务")
+    parser.add_argument("sources", nargs="+", help="视频文件路径、摄像头编号或网络地址")
+    parser.add_argument("--host", default=SERVER_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG["port"])
+    parser.add_argument("--loop", action="store_true", help="视频文件播放结束后从头循环")
+    parser.add_argument("--db", default="users.db", help="报警日志数据库")
+    parser.add_argument("--no-dispatch", action="store_true",
+                        help="不记录、不分发报警（声音/邮件/Webhook），只通过事件流推送")
+    args = parser.parse_args(argv)
+
+    store = dispatcher = None
+    if not args.no_dispatch:
+        from .alarm_dispatcher import create_dispatcher
+        from .alarm_store import AlarmLogStore
+        store = AlarmLogStore(args.db)
+        dispatcher = create_dispatcher(ALARM_CONFIG, store)
+
+    server = FireServer([parse_source(source) for source in args.sources], args.host, args.port,
+                        dispatcher, loop_file=args.loop)
+    try:
+        server.run()
+    finally:
+        if dispatcher is not None:
+            dispatcher.stop()
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""共享内存帧环形缓冲区 - 采集与检测进程之间零拷贝传递画面
+
+通过 multiprocessing.Queue 传递 1080p 画面每帧需要序列化并复制约 6MB；这里画面直接解码到
+共享内存中的槽位，检测进程以 NumPy 视图读取，进程之间只同步槽位状态。
+
+槽位状态流转（状态和序号都保存在共享内存中，修改时持有同一把进程锁）:
+
+    FREE -> WRITING -> READY -> CLAIMED -> DONE -> HELD -> FREE
+           写入方写入   已发布   检测进程处理  检测完成  所有者读取结果
+
+回收规则:
+    - 槽位只有在所有者 release() 之后才会回到 FREE，正在被读取的槽位不会被覆盖；
+    - 没有空闲槽位时，阻塞模式（文件源）等待回收；非阻塞模式（实时源）覆盖最旧的一个
+      尚未被检测进程取走的 READY 槽位，该帧计为丢帧；
+    - 所有槽位都在处理中时，新帧直接丢弃并计入丢帧。
+    检测慢的结果是丢掉积压的旧帧，而不会读到被覆盖了一半的画面。
+"""
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+FREE, WRITING, READY, CLAIMED, DONE, HELD = range(6)
+
+# 头部: [下一个序号, 丢帧数, 输入结束标记, 保留] + 每槽位状态 + 每槽位序号 + 每槽位发布时间（ns）
+_HEADER_FIELDS = 4
+_ALIGN = 64
+
+
+def _attach(name):
+    # 只有创建方负责删除共享内存；Python 3.13 起可以直接关闭 resource_tracker 的跟踪
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """固定数量槽位的共享内存帧缓冲区
+
+    在父进程中创建，作为 Process 参数传给子进程后自动连接到同一块共享内存。
+    """
+
+    def __init__(self, shape, slots=4, dtype=np.uint8, ctx=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        ctx = ctx or mp.get_context("spawn")
+        self._cond = ctx.Condition()
+        self._owner = True
+        size = self._header_bytes() + slots * self._frame_bytes()
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._map()
+        self._header[:] = 0
+        self._seq[:] = -1
+
+    def _frame_bytes(self):
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        return -(-nbytes // _ALIGN) * _ALIGN
+
+    def _header_bytes(self):
+        nbytes = (_HEADER_FIELDS + 3 * self.slots) * 8
+        return -(-nbytes // _ALIGN) * _ALIGN
+
+    def _map(self):
+        buf = self._shm.buf
+        self._header = np.ndarray(_HEADER_FIELDS + 3 * self.slots, np.int64, buf)
+        fields = self._header[_HEADER_FIELDS:].reshape(3, self.slots)
+        self._state, self._seq, self._published = fields
+        self._frames = [np.ndarray(self.shape, self.dtype, buf,
+                                   offset=self._header_bytes() + i * self._frame_bytes())
+                        for i in range(self.slots)]
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "shape": self.shape, "slots": self.slots,
+                "dtype": self.dtype.str, "cond": self._cond}
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.slots = state["slots"]
+        self.dtype = np.dtype(state["dtype"])
+        self._cond = state["cond"]
+        self._owner = False
+        self._shm = _attach(state["name"])
+        self._map()
+
+    @property
+    def dropped(self):
+        if self._header is None:
+            return self._dropped
+        return int(self._header[1])
+
+    def frame(self, slot):
+        """槽位中画面的 NumPy 视图"""
+        return self._frames[slot]
+
+    def published_at(self, slot):
+        """槽位中画面的发布时间（time.monotonic() 时间基准，秒）"""
+        return int(self._published[slot]) / 1e9
+
+    # ---- 写入方 ----
+
+    def claim(self, block=True, timeout=None):
+        """取得一个可写槽位；没有可用槽位时返回 None（非阻塞模式下该帧计为丢帧）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                free = np.flatnonzero(self._state == FREE)
+                if len(free):
+                    slot = int(free[0])
+                    break
+                if not block:
+                    # 覆盖最旧的、尚未被取走的帧
+                    ready = np.flatnonzero(self._state == READY)
+                    self._header[1] += 1
+                    if not len(ready):
+                        return None
+                    slot = int(ready[np.argmin(self._seq[ready])])
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            self._state[slot] = WRITING
+            self._seq[slot] = -1
+            return slot
+
+    def publish(self, slot):
+        """写入完成，分配序号并通知读取方；返回序号"""
+        with self._cond:
+            seq = int(self._header[0])
+            self._header[0] += 1
+            self._seq[slot] = seq
+            # CLOCK_MONOTONIC 在各进程之间一致，可用于统计跨进程的排队延迟
+            self._published[slot] = time.monotonic_ns()
+            self._state[slot] = READY
+            self._cond.notify_all()
+            return seq
+
+    def abort(self, slot):
+        """放弃已取得的槽位（例如解码失败）"""
+        with self._cond:
+            self._state[slot] = FREE
+            self._cond.notify_all()
+
+    def end_input(self):
+        """标记不会再有新帧"""
+        with self._cond:
+            self._header[2] = 1
+            self._cond.notify_all()
+
+    # ---- 检测进程 ----
+
+    def acquire(self, timeout=None):
+        """取走序号最小的 READY 槽位，返回 (槽位, 序号)；超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: (self._state == READY).any(), timeout):
+                return None
+            ready = np.flatnonzero(self._state == READY)
+            slot = int(ready[np.argmin(self._seq[ready])])
+            self._state[slot] = CLAIMED
+            return slot, int(self._seq[slot])
+
+    def pending(self):
+        """已发布但所有者尚未取走的帧数"""
+        return int(np.isin(self._state, (READY, CLAIMED, DONE)).sum())
+
+    def finish(self, slot):
+        with self._cond:
+            self._state[slot] = DONE
+            self._cond.notify_all()
+
+    # ---- 所有者 ----
+
+    def next_done(self, timeout=None):
+        """按序号顺序取出处理完成的槽位，返回 (槽位, 序号)
+
+        序号更小的帧仍在处理中时等待；输入结束且没有待处理帧时返回 (None, None)，超时返回 None。
+        """
+        def ready():
+            pending = np.isin(self._state, (READY, CLAIMED, DONE))
+            return pending.any() or self._header[2]
+
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not self._cond.wait_for(ready, remaining):
+                    return None
+                pending = np.flatnonzero(np.isin(self._state, (READY, CLAIMED, DONE)))
+                if not len(pending):
+                    return None, None
+                slot = int(pending[np.argmin(self._seq[pending])])
+                if self._state[slot] == DONE:
+                    self._state[slot] = HELD
+                    return slot, int(self._seq[slot])
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                self._cond.wait(remaining)
+
+    def release(self, slot):
+        """所有者用完槽位，允许写入方复用"""
+        with self._cond:
+            self._state[slot] = FREE
+            self._cond.notify_all()
+
+    def close(self):
+        # 关闭后仍可查询丢帧数
+        self._dropped = self.dropped
+        self._frames = []
+        self._header = self._state = self._seq = self._published = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class Detection:
+    """一帧的检测结果；frame 和 mask 都是共享内存视图，用完后调用 DetectorPool.release()"""
+
+    __slots__ = ("slot", "seq", "captured_at", "frame", "fire_detected", "fire_ratio", "mask")
+
+    def __init__(self, slot, seq, captured_at, frame, fire_detected, fire_ratio, mask):
+        self.slot = slot
+        self.seq = seq
+        self.captured_at = captured_at
+        self.frame = frame
+        self.fire_detected = fire_detected
+        self.fire_ratio = fire_ratio
+        self.mask = mask
+
+
+def _detect_worker(ring, results_name, detector_config, stop_event):
+    from .detector import FireDetector, stateless_config
+
+    # 并行由多个进程提供，每个进程内只用一个线程
+    cv2.setNumThreads(1)
+    # 每个进程只分到交错的部分帧，只做与前后帧无关的颜色检测
+    detector = FireDetector(**stateless_config(detector_config))
+    shm = _attach(results_name)
+    ratios, scales, masks = _map_results(shm, ring.slots, ring.shape[:2])
+    try:
+        while not stop_event.is_set():
+            item = ring.acquire(timeout=0.1)
+            if item is None:
+                continue
+            slot, _ = item
+            frame = ring.frame(slot)
+            scale = float(scales[slot])
+            if scale < 1:
+                # 过载降级：在缩小的画面上检测，掩膜放大回原尺寸
+                small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                _, mask = detector.detect(small)
+                cv2.resize(mask, (frame.shape[1], frame.shape[0]), dst=masks[slot],
+                           interpolation=cv2.INTER_NEAREST)
+            else:
+                _, mask = detector.detect(frame)
+                np.copyto(masks[slot], mask)
+            ratios[slot] = detector.fire_ratio
+            ring.finish(slot)
+    finally:
+        del ratios, scales, masks
+        shm.close()
+
+
+def _results_offset(slots):
+    return -(-2 * slots * 8 // _ALIGN) * _ALIGN
+
+
+def _map_results(shm, slots, mask_shape):
+    # 每槽位一个火灾比例和一个检测缩放比例（float64），之后是每槽位一张掩膜
+    ratios, scales = np.ndarray((2, slots), np.float64, shm.buf)
+    masks = np.ndarray((slots,) + tuple(mask_shape), np.uint8, shm.buf,
+                       offset=_results_offset(slots))
+    return ratios, scales, masks
+
+
+class DetectorPool:
+    """多进程火灾检测：画面经 FrameRing 传给检测进程，结果（比例和掩膜）也放在共享内存中
+
+    capture(cap) 直接把画面解码到共享内存槽位；submit(frame) 用于已经解码好的画面（复制一次）。
+    next_result() 按帧序返回 Detection。
+
+    检测进程只做颜色检测；运动门控、闪烁分析依赖连续帧，由 next_result() 在所有者进程中
+    按帧序执行（self.gates）。
+    """
+
+    def __init__(self, shape=None, workers=2, slots=None, detector_config=None, ratio_threshold=None):
+        from .detector import DETECTOR_CONFIG, FireDetector
+
+        self.detector_config = dict(detector_config or {})
+        gates = FireDetector(**dict(self.detector_config, tile_cache=False))
+        self.gates = gates if gates.stateful else None
+        self.ratio_threshold = (ratio_threshold if ratio_threshold is not None else
+                                self.detector_config.get("ratio_threshold",
+                                                         DETECTOR_CONFIG["ratio_threshold"]))
+        self.workers = workers
+        self.slots = slots or workers + 2
+        self._ctx = mp.get_context("spawn")
+        self._stop_event = self._ctx.Event()
+        self._started = False
+        self._ended = False
+        self.ring = None
+        self._results = None
+        self._processes = []
+        # 不指定分辨率时按第一帧的实际尺寸分配（网络源的 CAP_PROP_FRAME_WIDTH 等可能为 0 或不准确）
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape):
+        self.ring = FrameRing(shape, self.slots, ctx=self._ctx)
+        mask_shape = tuple(shape[:2])
+        size = _results_offset(self.ring.slots) + self.ring.slots * int(np.prod(mask_shape))
+        self._results = shared_memory.SharedMemory(create=True, size=size)
+        self._ratios, self._scales, self._masks = _map_results(self._results, self.ring.slots,
+                                                               mask_shape)
+        self._processes = [
+            self._ctx.Process(target=_detect_worker, name=f"detect-worker-{i}", daemon=True,
+                              args=(self.ring, self._results.name, self.detector_config,
+                                    self._stop_event))
+            for i in range(self.workers)
+        ]
+        if self._started:
+            self._start_processes()
+
+    def _start_processes(self):
+        for process in self._processes:
+            process.start()
+
+    def start(self):
+        self._started = True
+        self._start_processes()
+        return self
+
+    @property
+    def dropped(self):
+        return self.ring.dropped if self.ring is not None else 0
+
+    def _claim(self, block, stop_event):
+        # 阻塞等待时定期检查 stop_event
+        while True:
+            slot = self.ring.claim(block, timeout=0.1 if stop_event is not None else None)
+            if slot is not None or not block or stop_event.is_set():
+                return slot
+
+    def capture(self, cap, block=True, stop_event=None, scale=1.0):
+        """从 cap 读取一帧直接解码到槽位；返回 (是否读到画面, 序号)，丢帧时序号为 None
+
+        scale 小于 1 时检测进程在缩小的画面上检测（过载降级），掩膜仍为原尺寸。
+        """
+        if self.ring is None:
+            # 第一帧：按实际尺寸分配共享内存，之后的帧直接解码到槽位
+            ret, image = cap.read()
+            if not ret:
+                return False, None
+            self._allocate(image.shape)
+            return True, self.submit(image, block, stop_event, scale)
+
+        slot = self._claim(block, stop_event)
+        if slot is None:
+            if block:
+                return False, None
+            # 没有可用槽位：仍然要读走这一帧，实时源才不会积压
+            return cap.grab(), None
+        frame = self.ring.frame(slot)
+        ret, image = cap.read(image=frame)
+        if not ret:
+            self.ring.abort(slot)
+            return False, None
+        if image is not frame:
+            # 分辨率中途变化（例如网络源重连）时 OpenCV 会另行分配，缩放到缓冲区尺寸
+            if image.ndim != frame.ndim:
+                self.ring.abort(slot)
+                raise ValueError(f"画面格式 {image.shape} 与共享缓冲区 {frame.shape} 不一致")
+            cv2.resize(image, (frame.shape[1], frame.shape[0]), dst=frame, interpolation=cv2.INTER_AREA)
+        self._scales[slot] = scale
+        return True, self.ring.publish(slot)
+
+    def submit(self, frame, block=True, stop_event=None, scale=1.0):
+        """复制一帧到槽位；返回序号，丢帧时返回 None"""
+        if self.ring is None:
+            self._allocate(frame.shape)
+        slot = self._claim(block, stop_event)
+        if slot is None:
+            return None
+        np.copyto(self.ring.frame(slot), frame)
+        self._scales[slot] = scale
+        return self.ring.publish(slot)
+
+    def end_input(self):
+        self._ended = True
+        if self.ring is not None:
+            self.ring.end_input()
+
+    def pending(self):
+        return self.ring.pending() if self.ring is not None else 0
+
+    def next_result(self, timeout=None):
+        """按帧序返回下一个 Detection；输入结束且全部处理完返回 False，超时返回 None"""
+        if self.ring is None:
+            # 还没有读到第一帧
+            if self._ended:
+                return False
+            time.sleep(min(timeout, 0.01) if timeout is not None else 0.01)
+            return None
+        item = self.ring.next_done(timeout)
+        if item is None:
+            return None
+        slot, seq = item
+        if slot is None:
+            return False
+        frame, mask = self.ring.frame(slot), self._masks[slot]
+        ratio = float(self._ratios[slot])
+        if self.gates is not None:
+            self.gates.apply_gates(frame, mask)
+            ratio = self.gates.fire_ratio
+        return Detection(slot, seq, self.ring.published_at(slot), frame,
+                         ratio > self.ratio_threshold, ratio, mask)
+
+    def release(self, detection):
+        self.ring.release(detection.slot)
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self.ring is None:
+            return
+        self._ratios = self._scales = self._masks = None
+        self._results.close()
+        self._results.unlink()
+        self.ring.close()
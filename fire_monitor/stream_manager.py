@@ -0,0 +1,270 @@
+"""多路视频流调度 - 在进程池中并发分析多个摄像头/视频文件
+
+用法:
+    python -m fire_monitor.stream_manager rtsp://cam1 rtsp://cam2 video.mp4 --workers 4 --fps 10
+"""
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+
+
+class AlarmState:
+    """单路视频流的报警状态"""
+
+    def __init__(self):
+        self.alarm_triggered = False
+        self.alarm_count = 0
+
+    def update(self, fire_detected):
+        """更新状态，返回 "raised" / "cleared" / None"""
+        if fire_detected and not self.alarm_triggered:
+            self.alarm_triggered = True
+            self.alarm_count += 1
+            return "raised"
+        if not fire_detected and self.alarm_triggered:
+            self.alarm_triggered = False
+            return "cleared"
+        return None
+
+
+def _open_capture(source, stream_id="default"):
+    import cv2
+    from .network_source import NetworkSource, is_network_source
+
+    # 网络视频源只保留最新一帧：按目标帧率读取时不会取到缓冲区里积压的旧帧
+    if is_network_source(source):
+        cap = NetworkSource(source, stream_id)
+    else:
+        cap = cv2.VideoCapture(source)
+    return cap if cap.isOpened() else None
+
+
+def _read_current(stream, now):
+    """读取当前应分析的一帧
+
+    录像文件按经过的时间定位：目标帧率低于文件帧率时 grab() 跳过中间的帧（只读不解码），
+    而不是慢放；摄像头和网络源直接读取最新一帧。
+    """
+    cap = stream["cap"]
+    file_fps = stream["file_fps"]
+    if file_fps:
+        target = int((now - stream["started"]) * file_fps)
+        while stream["position"] < target:
+            if not cap.grab():
+                return False, None
+            stream["position"] += 1
+    ret, frame = cap.read()
+    if ret:
+        stream["position"] += 1
+    return ret, frame
+
+
+def _worker_main(specs, detector_config, result_queue, stop_event, cascade_config=None):
+    # 每个工作进程独立持有自己负责的视频流和检测器
+    import cv2
+    from .detector import FireDetector
+    from .network_source import is_network_source
+    from .regions import RegionTracker, Regions, extract_regions
+
+    # 级联确认：同一进程内各路视频流共用一个分类线程，候选区域跨流凑批
+    classifier = None
+    if cascade_config is not None:
+        from .cascade import BatchClassifier, CascadeStage
+        classifier = BatchClassifier.from_config(**cascade_config).start()
+
+    streams = []
+    now = time.monotonic()
+    for spec in specs:
+        file_source = isinstance(spec["source"], str) and not is_network_source(spec["source"])
+        cap = _open_capture(spec["source"], spec["stream_id"])
+        if cap is None:
+            result_queue.put({"stream_id": spec["stream_id"], "event": "error",
+                              "message": f"无法打开视频源: {spec['source']}"})
+            continue
+        streams.append({
+            "spec": spec,
+            "cap": cap,
+            "detector": FireDetector(**detector_config),
+            "alarm": AlarmState(),
+            "tracker": RegionTracker() if classifier is not None else None,
+            "cascade": (CascadeStage(classifier, spec["stream_id"], **cascade_config)
+                        if classifier is not None else None),
+            "interval": 1.0 / spec["fps"],
+            "frame_index": 0,
+            # 录像文件的原始帧率及当前读取位置，实时源为 0
+            "file_fps": (cap.get(cv2.CAP_PROP_FPS) or 25.0) if file_source else 0,
+            "position": 0,
+            "started": now
+        })
+
+    # 按下一帧的到期时间调度（最早到期优先），同帧率的流获得相同份额
+    heap = [(now, i) for i in range(len(streams))]
+    heapq.heapify(heap)
+
+    while heap and not stop_event.is_set():
+        due, i = heapq.heappop(heap)
+        delay = due - time.monotonic()
+        if delay > 0:
+            stop_event.wait(delay)
+            if stop_event.is_set():
+                break
+
+        stream = streams[i]
+        stream_id = stream["spec"]["stream_id"]
+        ret, frame = _read_current(stream, time.monotonic())
+        if not ret:
+            stream["cap"].release()
+            result_queue.put({"stream_id": stream_id, "event": "end"})
+            continue
+
+        fire_detected, fire_mask = stream["detector"].detect(frame)
+        if stream["cascade"] is not None:
+            regions = extract_regions(fire_mask) if fire_detected else Regions.empty()
+            tracks = stream["tracker"].update(regions)
+            fire_detected = stream["cascade"].confirm(frame, tracks) and fire_detected
+        result = {
+            "stream_id": stream_id,
+            "frame": stream["frame_index"],
+            "ts": time.time(),
+            "fire": bool(fire_detected),
+            "fire_ratio": stream["detector"].fire_ratio,
+            "event": stream["alarm"].update(fire_detected)
+        }
+        stream["frame_index"] += 1
+        result_queue.put(result)
+
+        # 落后超过一个周期时不追帧，从当前时间重新计时
+        next_due = due + stream["interval"]
+        now = time.monotonic()
+        if next_due < now - stream["interval"]:
+            next_due = now
+        heapq.heappush(heap, (next_due, i))
+
+    for stream in streams:
+        stream["cap"].release()
+    if classifier is not None:
+        classifier.stop()
+
+
+class StreamManager:
+    """多路视频流管理器
+
+    视频流按目标帧率之和均衡分配到 workers 个工作进程，所有检测结果汇总到同一个结果队列，
+    由单一消费者读取。
+    """
+
+    def __init__(self, workers=None, detector_config=None, result_queue_size=1024,
+                 cascade_config=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.detector_config = detector_config or {}
+        # 不为 None 时启用级联确认（参数见 cascade.CASCADE_CONFIG）
+        self.cascade_config = cascade_config
+        self.streams = []
+        self.alarm_states = {}
+        self.active_streams = set()
+
+        self._ctx = mp.get_context("spawn")
+        self._result_queue = self._ctx.Queue(result_queue_size)
+        self._stop_event = self._ctx.Event()
+        self._processes = []
+        self._consumer_thread = None
+
+    def add_stream(self, stream_id, source, fps=10):
+        if self._processes:
+            raise RuntimeError("请在 start() 之前添加视频流")
+        if fps <= 0:
+            raise ValueError("目标帧率必须大于0")
+        self.streams.append({"stream_id": stream_id, "source": source, "fps": fps})
+        self.alarm_states[stream_id] = AlarmState()
+
+    def _assign(self):
+        # 贪心分配：每次把帧率最高的流分给当前负载最小的工作进程
+        count = min(self.workers, len(self.streams))
+        buckets = [[] for _ in range(count)]
+        loads = [(0, i) for i in range(count)]
+        for spec in sorted(self.streams, key=lambda s: s["fps"], reverse=True):
+            load, i = heapq.heappop(loads)
+            buckets[i].append(spec)
+            heapq.heappush(loads, (load + spec["fps"], i))
+        return buckets
+
+    def start(self):
+        if not self.streams:
+            raise RuntimeError("没有可分析的视频流")
+        for specs in self._assign():
+            process = self._ctx.Process(target=_worker_main,
+                                        args=(specs, self.detector_config,
+                                              self._result_queue, self._stop_event,
+                                              self.cascade_config),
+                                        daemon=True)
+            process.start()
+            self._processes.append(process)
+        self.active_streams = {spec["stream_id"] for spec in self.streams}
+
+    def results(self, timeout=0.5):
+        """依次产出各路检测结果，所有视频流结束后停止"""
+        while self.active_streams and not self._stop_event.is_set():
+            try:
+                result = self._result_queue.get(timeout=timeout)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self._processes):
+                    break
+                continue
+
+            if result["event"] in ("end", "error"):
+                self.active_streams.discard(result["stream_id"])
+            elif result["event"] is not None:
+                self.alarm_states[result["stream_id"]].update(result["fire"])
+            yield result
+
+    def run(self, consumer):
+        """在后台线程中把结果逐条交给 consumer"""
+        def consume():
+            for result in self.results():
+                consumer(result)
+
+        self._consumer_thread = threading.Thread(target=consume, daemon=True)
+        self._consumer_thread.start()
+        return self._consumer_thread
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多路视频流火灾检测")
+    parser.add_argument("sources", nargs="+", help="视频文件路径、摄像头编号或网络地址")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--fps", type=float, default=10, help="每路视频流的目标分析帧率")
+    parser.add_argument("--cascade", default=None, metavar="MODEL",
+                        help="用该 ONNX 分类模型确认颜色检测出的区域（需要 onnxruntime）")
+    args = parser.parse_args(argv)
+
+    manager = StreamManager(workers=args.workers,
+                            cascade_config={"model": args.cascade} if args.cascade else None)
+    for i, source in enumerate(args.sources):
+        manager.add_stream(f"stream-{i}", int(source) if source.isdigit() else source, args.fps)
+
+    manager.start()
+    try:
+        for result in manager.results():
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    main()
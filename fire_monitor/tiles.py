@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+
+class TileCache:
+    """分块增量检测缓存
+
+    画面按 tile×tile 像素分块，缓存每块的火灾掩膜和火焰像素数。每帧按固定步长抽样得到缩略图
+    （每块 thumb×thumb 个采样点），与该块上次重新计算时的缩略图比较，只有平均差异超过 threshold
+    的块才重新计算；全帧火焰像素总数由各块计数增量维护。
+
+    重新计算时按变化块所在行列范围取区域，四周各留 2×margin 像素上下文，只写回向外扩 margin
+    像素的部分，保证形态学操作的结果与整帧计算一致。
+    """
+
+    def __init__(self, tile=64, threshold=4.0, margin=10, thumb=8):
+        if tile % thumb:
+            raise ValueError("tile 必须是 thumb 的整数倍")
+        self.tile = tile
+        self.threshold = threshold
+        self.margin = margin
+        self.thumb = thumb
+        self.fire_area = 0
+        self.tiles_recomputed = 0
+        self._shape = None
+
+    def _reset(self, shape):
+        height, width = shape
+        tile = self.tile
+        self.grid = (-(-height // tile), -(-width // tile))
+        gh, gw = self.grid
+        self._step = max(1, tile // self.thumb)
+        self._thumb = np.zeros((gh * self.thumb, gw * self.thumb, 3), np.uint8)
+        self._ref = None
+        self._diff = np.empty_like(self._thumb)
+        # 掩膜按整块分配，便于按块求和；对外只返回画面大小的视图
+        self._mask = np.zeros((gh * tile, gw * tile), np.uint8)
+        self.tile_counts = np.zeros(self.grid, np.int64)
+        self.fire_area = 0
+        self._shape = shape
+
+    def invalidate(self):
+        """丢弃全部缓存结果，下一帧整帧重新计算"""
+        self._shape = None
+
+    def changed_tiles(self, frame):
+        # 抽样比 INTER_AREA 缩放快一个数量级，足以发现块内容的变化
+        sampled = frame[::self._step, ::self._step]
+        self._thumb[:sampled.shape[0], :sampled.shape[1]] = sampled
+        if self._ref is None:
+            self._ref = self._thumb.copy()
+            return np.ones(self.grid, bool)
+        cv2.absdiff(self._thumb, self._ref, dst=self._diff)
+        gh, gw = self.grid
+        t = self.thumb
+        score = self._diff.reshape(gh, t, gw, t, 3).mean(axis=(1, 3, 4))
+        return score > self.threshold
+
+    def update(self, frame, compute):
+        """compute(frame, x0, y0, x1, y1) 返回该区域的火灾掩膜；返回全帧掩膜视图"""
+        height, width = frame.shape[:2]
+        if self._shape != (height, width):
+            self._reset((height, width))
+
+        changed = self.changed_tiles(frame)
+        if not changed.any():
+            return self._mask[:height, :width]
+
+        tile = self.tile
+        t = self.thumb
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed.astype(np.uint8), connectivity=8)
+        for c0, r0, cw, rh, _ in stats[1:count]:
+            c1, r1 = c0 + cw, r0 + rh
+            # 写回区域：变化块外扩 margin；计算区域：再外扩 margin 作为上下文
+            wx0 = max(0, c0 * tile - self.margin)
+            wy0 = max(0, r0 * tile - self.margin)
+            wx1 = min(width, c1 * tile + self.margin)
+            wy1 = min(height, r1 * tile + self.margin)
+            x0 = max(0, wx0 - self.margin)
+            y0 = max(0, wy0 - self.margin)
+            x1 = min(width, wx1 + self.margin)
+            y1 = min(height, wy1 + self.margin)
+
+            roi_mask = compute(frame, x0, y0, x1, y1)
+            self._mask[wy0:wy1, wx0:wx1] = roi_mask[wy0 - y0:wy1 - y0, wx0 - x0:wx1 - x0]
+
+            # 重新统计写回区域覆盖到的各块
+            tr0, tc0 = wy0 // tile, wx0 // tile
+            tr1, tc1 = -(-wy1 // tile), -(-wx1 // tile)
+            block = self._mask[tr0 * tile:tr1 * tile, tc0 * tile:tc1 * tile]
+            counts = np.count_nonzero(block.reshape(tr1 - tr0, tile, tc1 - tc0, tile), axis=(1, 3))
+            region = self.tile_counts[tr0:tr1, tc0:tc1]
+            self.fire_area += int(counts.sum() - region.sum())
+            region[:] = counts
+
+            self._ref[r0 * t:r1 * t, c0 * t:c1 * t] = self._thumb[r0 * t:r1 * t, c0 * t:c1 * t]
+            self.tiles_recomputed += cw * rh
+
+        return self._mask[:height, :width]
@@ -0,0 +1,778 @@
+import os
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, simpledialog
+from datetime import datetime
+import cv2
+import threading
+import time
+
+from .alarm_dispatcher import create_dispatcher
+from .alarm_store import AlarmLogStore
+from .camera_probe import PROBE_CONFIG, probe_async, wait_idle
+from .clip_recorder import ClipRecorder
+from .config import (ALARM_CONFIG, CLASSIFIER_CONFIG, CLIP_CONFIG, DETECTION_CACHE_CONFIG,
+                     DETECTION_CONFIG, LOAD_SHED_CONFIG, METRICS_CONFIG, PREVIEW_CONFIG, THEME,
+                     WORKER_CONFIG)
+from .detector import FireDetector, annotate_fire
+from .load_shedding import LoadShedder
+from .metrics import METRICS, MetricsServer
+from .network_source import NetworkSource, is_network_source
+from .pipeline import VideoPipeline
+from .preview import PreviewRenderer
+from .regions import RegionTracker, Regions, extract_regions
+from .stream_manager import AlarmState
+
+
+# 报警处理类 - 报警在后台线程中分发，不阻塞视频分析
+class AlarmHandler:
+    def __init__(self):
+        self.store = AlarmLogStore('users.db')
+        self.dispatcher = create_dispatcher(ALARM_CONFIG, self.store)
+
+    def trigger_alarm(self, alarm_type, location=None, description=None, coalesce=True,
+                      clip_path=None):
+        self.dispatcher.submit(alarm_type, location, description, coalesce, clip_path)
+
+    def close(self):
+        self.dispatcher.stop()
+        self.store.close()
+
+
+# 视频分析系统界面
+class VideoAnalysisSystem:
+    def __init__(self, username):
+        self.username = username
+        self.video_source = None
+        self.cap = None
+        self.analyze = False
+        self.fire_detected = False
+        self.pipeline = None
+        self.clip_recorder = None
+        self.detector = None
+        self.detector_pool = None
+        self.shedder = None
+        self.classifier = None
+        self.cascade = None
+        self.replay = None
+        self.cache_recorder = None
+        self.fps = 0
+        self.frame_count = 0
+        self.start_time = time.time()
+        self.alarm_state = AlarmState()
+        self.region_tracker = RegionTracker()
+        self.alarm_handler = AlarmHandler()
+        self.metrics_server = None
+        self.stats_window = None
+        self.history_window = None
+        self.fps_text = "FPS: 0.0"
+        self.queue_text = "队列: 采集 0 / 显示 0"
+        if METRICS_CONFIG["enabled"]:
+            self.enable_metrics()
+
+        # 创建主窗口
+        self.main_window = tk.Tk()
+        self.main_window.title(f"智能火灾预警监控系统 - 用户: {username}")
+        self.main_window.geometry("1200x800")
+        self.main_window.configure(bg=THEME["background"])
+
+        # 窗口居中
+        self.center_window(self.main_window, 1200, 800)
+
+        # 设置窗口关闭事件
+        self.main_window.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # 创建界面
+        self.create_ui()
+        self.preview = PreviewRenderer(self.main_window, self.video_panel,
+                                       PREVIEW_CONFIG["max_fps"], on_tick=self.refresh_info)
+
+        # 提前在后台探测摄像头，点击"使用摄像头"时直接用缓存结果
+        probe_async()
+
+        # 启动主循环
+        self.main_window.mainloop()
+
+    def center_window(self, window, width, height):
+        screen_width = window.winfo_screenwidth()
+        screen_height = window.winfo_screenheight()
+        x = (screen_width // 2) - (width // 2)
+        y = (screen_height // 2) - (height // 2)
+        window.geometry(f"{width}x{height}+{x}+{y}")
+
+    def create_ui(self):
+        # 主容器
+        main_container = tk.Frame(self.main_window, bg=THEME["background"])
+        main_container.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 标题栏
+        title_frame = tk.Frame(main_container, bg=THEME["primary"])
+        title_frame.pack(fill="x", pady=(0, 10))
+
+        tk.Label(title_frame, text="智能火灾预警监控系统",
+                 font=("微软雅黑", 20, "bold"),
+                 bg=THEME["primary"], fg=THEME["text"]).pack(pady=10)
+
+        # 用户信息栏
+        user_frame = tk.Frame(title_frame, bg=THEME["primary"])
+        user_frame.pack(fill="x", pady=(0, 10))
+
+        tk.Label(user_frame,
+                 text=f"用户: {self.username} | 登录时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                 font=("微软雅黑", 10),
+                 bg=THEME["primary"], fg=THEME["text"]).pack(side="left", padx=10)
+
+        # 报警状态指示灯
+        self.alarm_indicator = tk.Label(user_frame, text="■", font=("Arial", 16),
+                                        fg="green", bg=THEME["primary"])
+        self.alarm_indicator.pack(side="right", padx=10)
+
+        # 主内容区域
+        content_frame = tk.Frame(main_container, bg=THEME["background"])
+        content_frame.pack(fill="both", expand=True)
+
+        # 左侧控制面板
+        control_panel = tk.Frame(content_frame, bg=THEME["secondary"], width=250,
+                                 relief=tk.RAISED, borderwidth=2)
+        control_panel.pack(side="left", fill="y", padx=(0, 10))
+        control_panel.pack_propagate(False)
+
+        # 视频源选择区域
+        source_frame = tk.LabelFrame(control_panel, text="视频源设置",
+                                     font=("微软雅黑", 12), bg=THEME["secondary"],
+                                     fg=THEME["text"], padx=10, pady=10)
+        source_frame.pack(fill="x", padx=5, pady=5)
+
+        tk.Button(source_frame, text="选择视频文件", command=self.select_video_file,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        tk.Button(source_frame, text="使用摄像头", command=self.use_camera,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        tk.Button(source_frame, text="网络摄像头", command=self.use_network_camera,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        self.source_label = tk.Label(source_frame, text="当前视频源: 未选择",
+                                     font=("微软雅黑", 10), bg=THEME["secondary"], fg=THEME["text"])
+        self.source_label.pack(fill="x", pady=5)
+
+        # 分析控制区域
+        analysis_frame = tk.LabelFrame(control_panel, text="分析控制",
+                                       font=("微软雅黑", 12), bg=THEME["secondary"],
+                                       fg=THEME["text"], padx=10, pady=10)
+        analysis_frame.pack(fill="x", padx=5, pady=5)
+
+        self.start_btn = tk.Button(analysis_frame, text="开始分析",
+                                   command=self.start_analysis,
+                                   state="disabled", font=("微软雅黑", 12),
+                                   bg=THEME["success"], fg=THEME["text"],
+                                   activebackground="#2ecc71", activeforeground=THEME["text"])
+        self.start_btn.pack(fill="x", pady=5)
+
+        self.stop_btn = tk.Button(analysis_frame, text="停止分析",
+                                  command=self.stop_analysis,
+                                  state="disabled", font=("微软雅黑", 12),
+                                  bg=THEME["danger"], fg=THEME["text"],
+                                  activebackground="#c0392b", activeforeground=THEME["text"])
+        self.stop_btn.pack(fill="x", pady=5)
+
+        tk.Button(analysis_frame, text="手动报警", command=self.manual_alert,
+                  font=("微软雅黑", 12), bg=THEME["danger"], fg=THEME["text"],
+                  activebackground="#c0392b", activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        self.scan_btn = tk.Button(analysis_frame, text="快速扫描录像", command=self.offline_scan,
+                                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                                  activebackground=THEME["accent"], activeforeground=THEME["text"])
+        self.scan_btn.pack(fill="x", pady=5)
+
+        # 报警设置区域
+        settings_frame = tk.LabelFrame(control_panel, text="报警设置",
+                                       font=("微软雅黑", 12), bg=THEME["secondary"],
+                                       fg=THEME["text"], padx=10, pady=10)
+        settings_frame.pack(fill="x", padx=5, pady=5)
+
+        self.sound_var = tk.BooleanVar(value=ALARM_CONFIG["sound_alarm"])
+        sound_cb = tk.Checkbutton(settings_frame, text="声音报警",
+                                  variable=self.sound_var, font=("微软雅黑", 10),
+                                  bg=THEME["secondary"], fg=THEME["text"],
+                                  selectcolor=THEME["secondary"])
+        sound_cb.pack(anchor="w", pady=2)
+
+        self.email_var = tk.BooleanVar(value=ALARM_CONFIG["email_alarm"])
+        email_cb = tk.Checkbutton(settings_frame, text="邮件报警",
+                                  variable=self.email_var, font=("微软雅黑", 10),
+                                  bg=THEME["secondary"], fg=THEME["text"],
+                                  selectcolor=THEME["secondary"])
+        email_cb.pack(anchor="w", pady=2)
+
+        # 系统信息区域
+        info_frame = tk.LabelFrame(control_panel, text="系统信息",
+                                   font=("微软雅黑", 12), bg=THEME["secondary"],
+                                   fg=THEME["text"], padx=10, pady=10)
+        info_frame.pack(fill="x", padx=5, pady=5)
+
+        self.fps_label = tk.Label(info_frame, text="FPS: 0.0",
+                                  font=("微软雅黑", 10), bg=THEME["secondary"], fg=THEME["text"])
+        self.fps_label.pack(anchor="w", pady=2)
+
+        self.status_label = tk.Label(info_frame, text="状态: 待机",
+                                     font=("微软雅黑", 10), bg=THEME["secondary"], fg=THEME["text"])
+        self.status_label.pack(anchor="w", pady=2)
+
+        self.fire_status = tk.Label(info_frame, text="火情: 未检测到",
+                                    font=("微软雅黑", 10), bg=THEME["secondary"], fg=THEME["success"])
+        self.fire_status.pack(anchor="w", pady=2)
+
+        self.queue_label = tk.Label(info_frame, text="队列: 采集 0 / 显示 0",
+                                    font=("微软雅黑", 10), bg=THEME["secondary"], fg=THEME["text"])
+        self.queue_label.pack(anchor="w", pady=2)
+
+        tk.Button(info_frame, text="性能统计", command=self.show_stats_panel,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        tk.Button(info_frame, text="报警历史", command=self.show_history_window,
+                  font=("微软雅黑", 10), bg=THEME["primary"], fg=THEME["text"],
+                  activebackground=THEME["accent"], activeforeground=THEME["text"]).pack(fill="x", pady=5)
+
+        # 右侧显示区域
+        display_panel = tk.Frame(content_frame, bg="black", relief=tk.SUNKEN, borderwidth=2)
+        display_panel.pack(side="right", fill="both", expand=True)
+
+        # 视频显示区域
+        self.video_panel = tk.Label(display_panel, bg="black")
+        self.video_panel.pack(fill="both", expand=True, padx=5, pady=5)
+
+        # 分析结果显示区域
+        result_frame = tk.LabelFrame(display_panel, text="分析结果",
+                                     font=("微软雅黑", 12), bg=THEME["secondary"],
+                                     fg=THEME["text"], padx=10, pady=10)
+        result_frame.pack(fill="x", padx=5, pady=(0, 5))
+
+        self.result_text = tk.Text(result_frame, height=8, font=("Consolas", 10),
+                                   bg="#2c3e50", fg="white", insertbackground="white")
+        self.result_text.pack(fill="both", expand=True)
+
+        scrollbar = ttk.Scrollbar(result_frame, orient="vertical", command=self.result_text.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.result_text.configure(yscrollcommand=scrollbar.set)
+
+        # 状态栏
+        status_bar = tk.Frame(self.main_window, bg=THEME["primary"], height=25)
+        status_bar.pack(fill="x", side="bottom")
+
+        self.status_message = tk.Label(status_bar, text="系统就绪",
+                                       font=("微软雅黑", 9), bg=THEME["primary"], fg=THEME["text"])
+        self.status_message.pack(side="left", padx=10)
+
+        tk.Label(status_bar, text="© 2023 智能火灾预警系统",
+                 font=("微软雅黑", 9), bg=THEME["primary"], fg=THEME["text"]).pack(side="right", padx=10)
+
+    def select_video_file(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+        file_path = filedialog.askopenfilename(
+            title="选择视频文件",
+            filetypes=[("视频文件", "*.mp4 *.avi *.mov"), ("所有文件", "*.*")]
+        )
+
+        if file_path:
+            self.video_source = file_path
+            self.source_label.config(text=f"当前视频源: 文件\n{file_path[-30:]}" if len(
+                file_path) > 30 else f"当前视频源: 文件\n{file_path}")
+            self.start_btn.config(state="normal")
+            self.update_status(f"已选择视频文件: {file_path}")
+
+    def use_camera(self):
+        # 探测在后台并行进行，结果回到界面线程处理
+        self.update_status("正在查找摄像头...")
+        probe_async(lambda cameras: self.main_window.after(0, self.select_camera, cameras))
+
+    def select_camera(self, cameras):
+        if not cameras:
+            messagebox.showerror("错误", "未发现可用的摄像头")
+            self.update_status("未发现可用的摄像头")
+            return
+
+        indexes = [camera["index"] for camera in cameras]
+        index = indexes[0]
+        if len(indexes) > 1:
+            choices = ", ".join(f"{camera['index']} ({camera['width']}x{camera['height']})"
+                                for camera in cameras)
+            index = simpledialog.askinteger("选择摄像头", f"可用摄像头: {choices}\n请输入编号:",
+                                            initialvalue=index, parent=self.main_window)
+            if index is None:
+                return
+            if index not in indexes:
+                messagebox.showerror("错误", f"摄像头{index}不可用")
+                return
+
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+        self.video_source = index
+        self.source_label.config(text=f"当前视频源: 摄像头({index})")
+        self.start_btn.config(state="normal")
+        self.update_status(f"已选择摄像头{index}作为视频源")
+
+    def use_network_camera(self):
+        url = simpledialog.askstring("网络摄像头", "请输入视频流地址 (rtsp:// 或 http://):",
+                                     parent=self.main_window)
+        if not url:
+            return
+        url = url.strip()
+        if not is_network_source(url):
+            messagebox.showerror("错误", "不支持的视频流地址")
+            return
+
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+        self.video_source = url
+        self.source_label.config(text=f"当前视频源: 网络摄像头\n{url[-30:]}")
+        self.start_btn.config(state="normal")
+        self.update_status(f"已选择网络摄像头: {url}")
+
+    def start_analysis(self):
+        if self.video_source is None:
+            messagebox.showerror("错误", "请先选择视频源")
+            return
+
+        try:
+            # 网络摄像头只保留最新一帧，断线后自动重连
+            network = is_network_source(self.video_source)
+            if network:
+                self.cap = NetworkSource(self.video_source)
+            else:
+                # 探测超时的线程可能还占用着该摄像头
+                if isinstance(self.video_source, int) and not wait_idle(self.video_source,
+                                                                        PROBE_CONFIG["timeout"]):
+                    raise Exception("摄像头正被探测占用，请稍后再试")
+                self.cap = cv2.VideoCapture(self.video_source)
+            if not self.cap.isOpened():
+                raise Exception("无法打开视频源")
+
+            # 获取视频的原始帧率
+            self.original_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            if self.original_fps <= 0:
+                self.original_fps = 30  # 默认值
+
+            self.analyze = True
+            self.start_btn.config(state="disabled")
+            self.stop_btn.config(state="normal")
+            self.frame_count = 0
+            self.start_time = time.time()
+            self.alarm_state = AlarmState()
+            self.region_tracker.reset()
+            self.alarm_indicator.config(fg="green")
+
+            # 更新报警配置
+            ALARM_CONFIG["sound_alarm"] = self.sound_var.get()
+            ALARM_CONFIG["email_alarm"] = self.email_var.get()
+
+            # 每次分析使用新的检测器，运动检测从第一帧重新开始
+            detector_config = dict(DETECTION_CONFIG, flicker_fps=self.original_fps)
+            self.detector = FireDetector(**detector_config)
+
+            # 录像文件：命中检测缓存时直接回放结果，只解码画面用于显示；否则边分析边记录
+            self.replay = self.cache_recorder = None
+            if DETECTION_CACHE_CONFIG["enabled"] and not network and isinstance(self.video_source, str):
+                from .detection_cache import DetectionCache
+                cache = DetectionCache(DETECTION_CACHE_CONFIG["cache_dir"],
+                                       DETECTION_CACHE_CONFIG["max_bytes"])
+                frame_count = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                cached = cache.get(self.video_source, self.detector.config, frame_count)
+                if cached is not None:
+                    self.replay = self.detector = cached.detector()
+                else:
+                    self.cache_recorder = cache.recorder(self.video_source, self.detector.config,
+                                                         frame_count)
+
+            # 报警录像缓冲区
+            if CLIP_CONFIG["enabled"]:
+                self.clip_recorder = ClipRecorder(self.original_fps,
+                                                  pre_seconds=CLIP_CONFIG["pre_seconds"],
+                                                  post_seconds=CLIP_CONFIG["post_seconds"],
+                                                  output_dir=CLIP_CONFIG["output_dir"],
+                                                  jpeg_quality=CLIP_CONFIG["jpeg_quality"],
+                                                  max_bytes=CLIP_CONFIG["max_bytes"],
+                                                  max_pending=CLIP_CONFIG["max_pending"])
+
+            # 多进程检测：共享内存按第一帧的实际分辨率分配
+            if WORKER_CONFIG["processes"] > 0 and self.replay is None:
+                from .shm_ring import DetectorPool
+                self.detector_pool = DetectorPool(workers=WORKER_CONFIG["processes"],
+                                                  slots=WORKER_CONFIG["slots"],
+                                                  detector_config=detector_config).start()
+
+            # 级联确认：分类线程在多次分析之间复用，模型只加载一次
+            self.cascade = None
+            if CLASSIFIER_CONFIG["enabled"]:
+                from .cascade import BatchClassifier, CascadeStage
+                if self.classifier is None:
+                    self.classifier = BatchClassifier.from_config(
+                        model=CLASSIFIER_CONFIG["model"], batch_size=CLASSIFIER_CONFIG["batch_size"],
+                        deadline=CLASSIFIER_CONFIG["deadline"]).start()
+                self.cascade = CascadeStage(self.classifier)
+
+            # 过载时自动降级，负载恢复后还原（回放缓存时没有检测开销，不需要降级）
+            self.shedder = None
+            if LOAD_SHED_CONFIG["enabled"] and self.replay is None:
+                self.shedder = LoadShedder(on_change=self.on_shed_change,
+                                           target=LOAD_SHED_CONFIG["target"])
+            self.preview.paused = False
+
+            # 启动 采集/分析/显示 流水线
+            self.pipeline = VideoPipeline(self.cap, self.analyze_frame, self.preview.submit,
+                                          live=network or isinstance(self.video_source, int),
+                                          fps=self.original_fps, on_end=self.on_video_end,
+                                          detector_pool=self.detector_pool, shedder=self.shedder)
+            self.pipeline.start()
+            self.preview.start()
+
+            if self.replay is not None:
+                self.update_status(f"使用检测缓存回放 - 原始FPS: {self.original_fps:.1f}")
+            else:
+                self.update_status(f"视频分析已启动 - 原始FPS: {self.original_fps:.1f}")
+            self.status_label.config(text=f"状态: 分析中 (FPS: {self.original_fps:.1f})")
+        except Exception as e:
+            messagebox.showerror("错误", f"无法启动视频分析: {str(e)}")
+
+    def _stop_pipeline(self):
+        pipeline, pool = self.pipeline, self.detector_pool
+        self.pipeline = self.detector_pool = None
+        if pipeline is not None and not pipeline.stop() and pool is not None:
+            # 仍有流水线线程在访问共享内存（例如阻塞在网络读取中），等它们退出后再释放
+            def release():
+                pipeline.join()
+                pool.stop()
+
+            threading.Thread(target=release, name="detector-pool-release", daemon=True).start()
+        elif pool is not None:
+            pool.stop()
+
+    def stop_analysis(self):
+        self.analyze = False
+        self._stop_pipeline()
+        self.preview.stop()
+        if self.clip_recorder is not None:
+            self.clip_recorder.close(wait=False)
+            self.clip_recorder = None
+        # 中途停止的分析结果不完整，不写入缓存
+        self.cache_recorder = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.update_status("视频分析已停止")
+        self.status_label.config(text="状态: 待机")
+        self.fire_status.config(text="火情: 未检测到", fg=THEME["success"])
+        self.alarm_indicator.config(fg="green")
+
+    def analyze_frame(self, frame, detection=None):
+        # 标注前的原始画面放入录像缓冲区
+        if self.clip_recorder is not None:
+            self.clip_recorder.push(frame)
+
+        # 火灾检测
+        scale = self.shedder.settings["scale"] if self.shedder is not None else 1.0
+        if detection is None and scale < 1:
+            # 过载降级：在缩小的画面上检测，掩膜放大回原尺寸用于标注
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            fire_detected, fire_mask = self.detector.detect(small)
+            if fire_detected:
+                fire_mask = cv2.resize(fire_mask, (frame.shape[1], frame.shape[0]),
+                                       interpolation=cv2.INTER_NEAREST)
+        elif detection is None:
+            fire_detected, fire_mask = self.detector.detect(frame)
+        else:
+            # 检测进程的结果；画面在共享内存中，返回后槽位会被复用，标注和显示用副本
+            fire_detected, fire_mask = detection.fire_detected, detection.mask
+            frame = frame.copy()
+
+        # 计算实际FPS
+        self.frame_count += 1
+        elapsed_time = time.time() - self.start_time
+        current_fps = self.frame_count / elapsed_time
+
+        # FPS及各级队列深度只记录最新值，由预览刷新时统一更新到界面
+        self.fps_text = f"FPS: {current_fps:.1f}"
+        pipeline = self.pipeline
+        if pipeline is not None:
+            depths = pipeline.queue_depths()
+            self.queue_text = (f"队列: 采集 {depths['capture']} / 显示 {depths['display']} "
+                               f"(丢帧 {depths['capture_dropped']})")
+
+        # 火灾区域跨帧跟踪；没有火时也要更新，让消失的区域过期
+        if self.replay is not None:
+            regions = self.replay.regions
+        else:
+            regions = extract_regions(fire_mask) if fire_detected else Regions.empty()
+        if self.cache_recorder is not None:
+            fire_ratio = detection.fire_ratio if detection is not None else self.detector.fire_ratio
+            self.cache_recorder.add(fire_detected, fire_ratio, fire_mask, regions)
+        tracks = self.region_tracker.update(regions)
+
+        # 两级都判断为火焰才报警；分类结果异步返回，在之后的帧生效
+        if self.cascade is not None:
+            fire_detected = self.cascade.confirm(frame, tracks) and fire_detected
+
+        # 如果检测到火灾，在图像上标记
+        alarm_event = self.alarm_state.update(fire_detected)
+        if fire_detected:
+            if alarm_event == "raised":
+                self.main_window.after(0, self.fire_status.config,
+                                       {"text": "火情: 检测到!", "fg": THEME["danger"]})
+                self.main_window.after(0, self.alarm_indicator.config, {"fg": "red"})
+
+                # 触发报警
+                if isinstance(self.video_source, int):
+                    location = f"摄像头{self.video_source}画面"
+                elif is_network_source(self.video_source):
+                    location = f"网络摄像头: {self.video_source}"
+                else:
+                    location = f"视频文件: {self.video_source}"
+                clip_path = self.clip_recorder.trigger() if self.clip_recorder is not None else None
+                self.alarm_handler.trigger_alarm("自动检测", location, "系统自动检测到可能的火灾",
+                                                 clip_path=clip_path)
+
+                # 在主线程中更新警告信息
+                self.main_window.after(0, self.add_warning,
+                                       f"[{datetime.now().strftime('%H:%M:%S')}] "
+                                       f"警告: 检测到可能的火灾! FPS: {current_fps:.1f}")
+
+            # 在图像上标记火灾区域
+            annotate_fire(frame, fire_mask, regions=regions, tracks=tracks)
+        else:
+            if alarm_event == "cleared":
+                self.main_window.after(0, self.fire_status.config,
+                                       {"text": "火情: 未检测到", "fg": THEME["success"]})
+                self.main_window.after(0, self.alarm_indicator.config, {"fg": "green"})
+
+        # 显示FPS信息
+        cv2.putText(frame, f"FPS: {current_fps:.1f}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        return frame
+
+    def on_shed_change(self, old_level, new_level, settings):
+        # 隔帧分析时闪烁分析的采样率随之降低；多进程检测时闪烁分析在检测池的所有者一侧
+        for detector in (self.detector, self.detector_pool and self.detector_pool.gates):
+            if detector and detector.flicker is not None:
+                detector.flicker.set_fps(self.original_fps / settings["stride"])
+
+        # 在分析线程中调用，界面更新交给主线程
+        def apply():
+            self.preview.paused = not settings["preview"]
+            action = "降级" if new_level > old_level else "恢复"
+            self.result_text.insert(tk.END, f"[{datetime.now().strftime('%H:%M:%S')}] "
+                                            f"负载{action}: {settings['name']}\n")
+            self.result_text.see(tk.END)
+            self.update_status(f"处理负载{action}: {settings['name']}")
+
+        self.main_window.after(0, apply)
+
+    def refresh_info(self):
+        self.fps_label.config(text=self.fps_text)
+        self.queue_label.config(text=self.queue_text)
+
+    def on_video_end(self):
+        self.analyze = False
+        pipeline = self.pipeline
+        error = pipeline.error if pipeline is not None else None
+
+        # 完整分析且未降级（降级时跳帧、缩小检测）的结果才写入缓存
+        recorder, self.cache_recorder = self.cache_recorder, None
+        if (recorder is not None and error is None
+                and (self.shedder is None or not self.shedder.history)):
+            threading.Thread(target=recorder.save, name="detection-cache", daemon=True).start()
+        if error is not None:
+            self.main_window.after(0, lambda: messagebox.showerror("错误", f"视频分析出错: {error}"))
+        else:
+            self.main_window.after(0, lambda: messagebox.showinfo(
+                "提示", "视频播放结束"))
+
+        # 分析结束后更新UI状态
+        self.main_window.after(0, lambda: self.stop_btn.config(state="disabled"))
+        self.main_window.after(0, lambda: self.start_btn.config(state="normal"))
+
+    def offline_scan(self):
+        if not isinstance(self.video_source, str) or is_network_source(self.video_source):
+            messagebox.showerror("错误", "请先选择视频文件")
+            return
+
+        path = self.video_source
+        self.scan_btn.config(state="disabled")
+        self.update_status(f"正在快速扫描: {path}")
+
+        def worker():
+            from .offline_scan import scan_file
+            try:
+                result = scan_file(path, detector_config=DETECTION_CONFIG)
+            except Exception as e:
+                print(f"快速扫描失败: {e}")
+                result = None
+            self.main_window.after(0, lambda: self.show_scan_result(path, result))
+
+        # 扫描在后台线程中启动多个进程，不阻塞界面
+        threading.Thread(target=worker, name="offline-scan", daemon=True).start()
+
+    def show_scan_result(self, path, result):
+        from .offline_scan import format_ms
+
+        self.scan_btn.config(state="normal")
+        if result is None:
+            self.update_status("快速扫描失败")
+            return
+
+        self.result_text.insert(tk.END, f"快速扫描 {os.path.basename(path)}: "
+                                        f"{len(result['events'])} 次火情，"
+                                        f"检测 {result['evaluated']}/{result['frames']} 帧，"
+                                        f"耗时 {result['elapsed']:.1f} 秒\n")
+        for event in result["events"]:
+            self.result_text.insert(tk.END, f"  {format_ms(event['start_ms'])} - "
+                                            f"{format_ms(event['end_ms'])} "
+                                            f"峰值比例 {event['peak_ratio']:.2%}\n")
+        self.result_text.see(tk.END)
+        self.update_status("快速扫描完成")
+
+    def add_warning(self, message):
+        self.result_text.insert(tk.END, message + "\n", "warning")
+        self.result_text.see(tk.END)
+        self.result_text.tag_config("warning", foreground="red",
+                                    font=("Consolas", 10, "bold"))
+
+        # 触发警报声音或通知
+        self.main_window.bell()
+
+    def manual_alert(self):
+        alert_window = tk.Toplevel(self.main_window)
+        alert_window.title("手动报警")
+        alert_window.geometry("400x300")
+        alert_window.resizable(False, False)
+        self.center_window(alert_window, 400, 300)
+        alert_window.configure(bg=THEME["background"])
+
+        tk.Label(alert_window, text="手动触发火灾警报",
+                 font=("微软雅黑", 16), bg=THEME["background"]).pack(pady=20)
+
+        tk.Label(alert_window, text="位置描述:",
+                 font=("微软雅黑", 10), bg=THEME["background"]).pack()
+        location_entry = tk.Entry(alert_window, width=40, font=("微软雅黑", 10))
+        location_entry.pack(pady=5)
+
+        tk.Label(alert_window, text="报警原因:",
+                 font=("微软雅黑", 10), bg=THEME["background"]).pack()
+        reason_text = tk.Text(alert_window, height=5, width=40, font=("微软雅黑", 10))
+        reason_text.pack(pady=5)
+
+        def confirm_alert():
+            location = location_entry.get()
+            reason = reason_text.get(1.0, tk.END).strip()
+
+            if not location:
+                messagebox.showerror("错误", "请输入位置描述")
+                return
+
+            # 触发手动报警
+            self.alarm_handler.trigger_alarm("手动报警", location, reason, coalesce=False)
+
+            # 更新界面
+            self.add_warning(
+                f"[{datetime.now().strftime('%H:%M:%S')}] 手动报警: {location} | 原因: {reason if reason else '未说明原因'}"
+            )
+            self.alarm_indicator.config(fg="red")
+            self.fire_status.config(text="火情: 手动报警!", fg=THEME["danger"])
+
+            # 3秒后恢复状态
+            self.main_window.after(3000, lambda: self.fire_status.config(
+                text="火情: 未检测到", fg=THEME["success"]))
+            self.main_window.after(3000, lambda: self.alarm_indicator.config(fg="green"))
+
+            alert_window.destroy()
+
+        tk.Button(alert_window, text="确认报警", command=confirm_alert,
+                  bg=THEME["danger"], fg=THEME["text"], font=("微软雅黑", 12),
+                  activebackground="#c0392b", activeforeground=THEME["text"]).pack(pady=10)
+
+    def update_status(self, message):
+        self.status_message.config(text=message)
+
+    def enable_metrics(self):
+        METRICS.enabled = True
+        if self.metrics_server is None and METRICS_CONFIG["port"] is not None:
+            try:
+                self.metrics_server = MetricsServer(METRICS_CONFIG["port"]).start()
+            except OSError as e:
+                print(f"性能统计接口启动失败: {e}")
+
+    def show_stats_panel(self):
+        self.enable_metrics()
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+
+        self.stats_window = tk.Toplevel(self.main_window)
+        self.stats_window.title("性能统计")
+        self.stats_window.geometry("640x400")
+        self.stats_window.configure(bg=THEME["background"])
+
+        stats_text = tk.Text(self.stats_window, font=("Consolas", 10),
+                             bg="#2c3e50", fg="white")
+        stats_text.pack(fill="both", expand=True, padx=5, pady=5)
+
+        def refresh():
+            if not self.stats_window.winfo_exists():
+                return
+            snapshot = METRICS.snapshot()
+            lines = [f"{'阶段':<16}{'视频流':<10}{'次数':>8}{'平均ms':>10}{'p50ms':>10}{'p99ms':>10}"]
+            for stage in snapshot["stages"]:
+                lines.append(f"{stage['stage']:<16}{stage['stream']:<10}{stage['count']:>8}"
+                             f"{stage['mean_ms']:>10.2f}{stage['p50_ms']:>10.2f}{stage['p99_ms']:>10.2f}")
+            lines.append("")
+            for (name, stream), value in sorted(snapshot["counters"].items()):
+                lines.append(f"{name} [{stream}]: {value}")
+            for (name, stream), value in sorted(snapshot["gauges"].items()):
+                lines.append(f"{name} [{stream}]: {value:.4f}")
+            if self.metrics_server is not None:
+                lines.append(f"\nPrometheus: http://127.0.0.1:{self.metrics_server.port}/metrics")
+
+            stats_text.delete(1.0, tk.END)
+            stats_text.insert(tk.END, "\n".join(lines))
+            self.stats_window.after(1000, refresh)
+
+        refresh()
+
+    def show_history_window(self):
+        if self.history_window is not None and self.history_window.exists():
+            self.history_window.lift()
+            return
+        from .history_window import AlarmHistoryWindow
+        self.history_window = AlarmHistoryWindow(self.main_window, self.alarm_handler.store)
+
+    def on_closing(self):
+        if messagebox.askokcancel("退出", "确定要退出系统吗?"):
+            self.analyze = False
+            self._stop_pipeline()
+            self.preview.stop()
+            if self.clip_recorder is not None:
+                self.clip_recorder.close()
+            if self.cap is not None:
+                self.cap.release()
+            if self.classifier is not None:
+                self.classifier.stop()
+            self.alarm_handler.close()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            self.main_window.destroy()
+
+
+def show_video_analysis_system(username):
+    VideoAnalysisSystem(username)
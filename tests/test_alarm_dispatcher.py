@@ -0,0 +1,242 @@
+import json
+import socket
+import threading
+import time
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fire_monitor.alarm_dispatcher import AlarmDispatcher, EmailSink, LogSink, WebhookSink
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class _Store:
+    """代替 AlarmLogStore，只记录 add() 的参数"""
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, alarm_type, location=None, description=None, ts=None, clip_path=None):
+        self.rows.append((alarm_type, location, description))
+
+
+@pytest.fixture
+def webhook():
+    """本地 HTTP 服务：前 fail_first 次请求返回 500，之后返回 200"""
+    state = {"fail_first": 0, "requests": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            state["requests"].append((time.monotonic(), json.loads(body)))
+            status = 500 if len(state["requests"]) <= state["fail_first"] else 200
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_address[1]}/alarm"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def smtp():
+    """本地 SMTP 服务（aiosmtpd）：前 fail_first 封邮件返回 451，之后收下；只接受密码 secret"""
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    state = {"fail_first": 0, "attempts": 0, "logins": 0, "messages": []}
+
+    def authenticator(server, session, envelope, mechanism, auth_data):
+        state["logins"] += 1
+        # handled=False：失败时由 aiosmtpd 回复 535，否则不回复，客户端一直等待
+        return AuthResult(success=auth_data.password == b"secret", handled=False)
+
+    class Handler:
+        async def handle_DATA(self, server, session, envelope):
+            state["attempts"] += 1
+            if state["attempts"] <= state["fail_first"]:
+                return "451 Requested action aborted"
+            state["messages"].append(message_from_bytes(envelope.content))
+            return "250 OK"
+
+    port = _free_port()
+    controller = Controller(Handler(), hostname="127.0.0.1", port=port, authenticator=authenticator,
+                            auth_require_tls=False)
+    controller.start()
+    state["config"] = {
+        "email_alarm": True,
+        "email_sender": "monitor@example.com",
+        "email_receiver": "duty@example.com",
+        "email_password": "",
+        "smtp_server": "127.0.0.1",
+        "smtp_port": port,
+        "smtp_starttls": False
+    }
+    yield state
+    controller.stop()
+
+
+def _body(message):
+    return message.get_payload(decode=True).decode("utf-8")
+
+
+def test_webhook_retries_with_exponential_backoff(webhook):
+    webhook["fail_first"] = 2
+    dispatcher = AlarmDispatcher([WebhookSink({"webhook_url": webhook["url"]})],
+                                 debounce_seconds=0, max_retries=3, retry_backoff=0.1)
+    dispatcher.start()
+    try:
+        dispatcher.submit("火灾报警", "摄像头0画面", "置信度: 0.50")
+        assert _wait_for(lambda: dispatcher.stats()["webhook"]["sent"] == 1)
+    finally:
+        dispatcher.stop()
+
+    times = [t for t, _ in webhook["requests"]]
+    assert len(times) == 3
+    # 第 n 次重试前等待 retry_backoff * 2 ** n
+    assert times[1] - times[0] >= 0.1
+    assert times[2] - times[1] >= 0.2
+    payload = webhook["requests"][-1][1]
+    assert payload["location"] == "摄像头0画面"
+    assert payload["count"] == 1
+    assert dispatcher.stats()["webhook"]["failed"] == 0
+
+
+def test_webhook_gives_up_after_max_retries(webhook):
+    webhook["fail_first"] = 100
+    dispatcher = AlarmDispatcher([WebhookSink({"webhook_url": webhook["url"]})],
+                                 debounce_seconds=0, max_retries=2, retry_backoff=0.01)
+    dispatcher.start()
+    try:
+        dispatcher.submit("火灾报警", "摄像头0画面")
+        assert _wait_for(lambda: dispatcher.stats()["webhook"]["failed"] == 1)
+    finally:
+        dispatcher.stop()
+
+    assert len(webhook["requests"]) == 3
+    assert dispatcher.stats()["webhook"]["sent"] == 0
+
+
+def test_email_reconnects_and_retries(smtp):
+    smtp["fail_first"] = 1
+    dispatcher = AlarmDispatcher([EmailSink(smtp["config"])], debounce_seconds=0,
+                                 max_retries=2, retry_backoff=0.01)
+    dispatcher.start()
+    try:
+        dispatcher.submit("火灾报警", "摄像头0画面", "置信度: 0.50", clip_path="clips/a.mp4")
+        assert _wait_for(lambda: len(smtp["messages"]) == 1)
+    finally:
+        dispatcher.stop()
+
+    assert smtp["attempts"] == 2
+    message = smtp["messages"][0]
+    assert message["To"] == "duty@example.com"
+    assert "clips/a.mp4" in _body(message)
+    assert dispatcher.stats()["email"] == {"sent": 1, "failed": 0, "pending": 0}
+
+
+def test_email_login_failure_closes_connection(smtp, monkeypatch):
+    import smtplib
+
+    connections = []
+
+    class TrackedSMTP(smtplib.SMTP):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            connections.append(self)
+
+    monkeypatch.setattr(smtplib, "SMTP", TrackedSMTP)
+    config = dict(smtp["config"], email_password="wrong")
+    dispatcher = AlarmDispatcher([EmailSink(config)], debounce_seconds=0, max_retries=2,
+                                 retry_backoff=0.01)
+    dispatcher.start()
+    try:
+        dispatcher.submit("火灾报警", "摄像头0画面")
+        assert _wait_for(lambda: dispatcher.stats()["email"]["failed"] == 1)
+    finally:
+        dispatcher.stop()
+
+    # smtplib 每次连接会依次尝试服务器提供的各种认证方式
+    assert smtp["logins"] >= 3
+    assert not smtp["messages"]
+    # 每次登录失败的连接都已关闭
+    assert len(connections) == 3
+    assert all(connection.sock is None for connection in connections)
+
+
+def test_email_login_succeeds(smtp):
+    config = dict(smtp["config"], email_password="secret")
+    dispatcher = AlarmDispatcher([EmailSink(config)], debounce_seconds=0, max_retries=0)
+    dispatcher.start()
+    try:
+        dispatcher.submit("火灾报警", "摄像头0画面")
+        assert _wait_for(lambda: len(smtp["messages"]) == 1)
+    finally:
+        dispatcher.stop()
+    assert smtp["logins"] == 1
+
+
+def test_debounce_coalesces_per_location(smtp):
+    store = _Store()
+    dispatcher = AlarmDispatcher([LogSink(store), EmailSink(smtp["config"])],
+                                 debounce_seconds=0.5, max_retries=0)
+    dispatcher.start()
+    try:
+        for i in range(3):
+            dispatcher.submit("火灾报警", "摄像头0画面", f"第{i}次")
+        dispatcher.submit("火灾报警", "摄像头1画面", "另一路")
+        # 窗口内：每个位置只立即发出第一条
+        assert _wait_for(lambda: len(smtp["messages"]) == 2)
+        time.sleep(0.2)
+        assert len(smtp["messages"]) == 2
+        # 窗口结束后补发一条带合并次数的汇总，内容为最后一次报警
+        assert _wait_for(lambda: len(smtp["messages"]) == 3)
+    finally:
+        dispatcher.stop()
+
+    first, other, summary = (_body(message) for message in smtp["messages"])
+    assert "第0次" in first and "合并报警次数" not in first
+    assert "另一路" in other
+    assert "第2次" in summary and "合并报警次数: 2" in summary
+    # 日志不参与去抖，每一次都记录
+    assert [row[2] for row in store.rows] == ["第0次", "第1次", "第2次", "另一路"]
+
+
+def test_stop_flushes_pending_summary(smtp):
+    dispatcher = AlarmDispatcher([EmailSink(smtp["config"])], debounce_seconds=60, max_retries=0)
+    dispatcher.start()
+    dispatcher.submit("火灾报警", "摄像头0画面", "第0次")
+    dispatcher.submit("火灾报警", "摄像头0画面", "第1次")
+    dispatcher.submit("手动报警", "摄像头0画面", "手动", coalesce=False)
+    dispatcher.stop()
+
+    bodies = [_body(message) for message in smtp["messages"]]
+    assert len(bodies) == 3
+    assert "第0次" in bodies[0]
+    # 不合并的报警即使在窗口内也立即发送
+    assert "手动" in bodies[1]
+    # 停止时补发窗口内被合并的报警
+    assert "第1次" in bodies[2]
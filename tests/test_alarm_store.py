@@ -0,0 +1,100 @@
+import sqlite3
+
+from fire_monitor.alarm_store import SCHEMA_VERSION, AlarmLogStore, migrate
+
+
+def _old_db(path, rows):
+    """建一个 v2 的旧库，写入原始记录（不含汇总表）"""
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("DROP TABLE alarm_rollups")
+    conn.execute("PRAGMA user_version = 2")
+    conn.executemany("INSERT INTO alarm_logs (alarm_time, alarm_ts, alarm_type, location, description) "
+                     "VALUES ('2024-01-01 00:00:00', ?, '火灾报警', ?, '')", rows)
+    conn.commit()
+    conn.close()
+
+
+def test_null_location_matches_unknown_filter(tmp_path):
+    path = str(tmp_path / "alarm.db")
+    _old_db(path, [(1_700_000_000.0, None), (1_700_000_010.0, "摄像头0画面"), (1_700_000_020.0, None)])
+
+    store = AlarmLogStore(path)
+    try:
+        store.add("火灾报警", None, "", ts=1_700_000_030.0)
+        store.flush()
+        assert store.location_counts()["未知"] == 3
+        assert store.count(None, None, "未知") == 3
+        rows, _ = store.query(location="未知")
+        assert len(rows) == 3
+    finally:
+        store.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM alarm_logs WHERE location IS NULL").fetchone()[0] == 0
+    conn.close()
+
+
+def test_v3_database_is_normalised(tmp_path):
+    path = str(tmp_path / "alarm.db")
+    _old_db(path, [(1_700_000_000.0, None)])
+    conn = sqlite3.connect(path)
+    # 升级到 v3 后停住，模拟已经在用 v3 的库
+    conn.execute("PRAGMA user_version = 2")
+    migrate(conn)
+    conn.execute("UPDATE alarm_logs SET location = NULL")
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    conn.close()
+
+    store = AlarmLogStore(path)
+    try:
+        assert store.count(None, None, "未知") == 1
+        assert store.location_counts() == {"未知": 1}
+        rows, _ = store.query(location="未知")
+        assert len(rows) == 1
+    finally:
+        store.close()
+
+
+def test_writer_retries_transient_failure(tmp_path):
+    store = AlarmLogStore(str(tmp_path / "alarm.db"), retry_backoff=0.01)
+    write_batch = store._write_batch
+    calls = []
+
+    def flaky(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("磁盘暂时不可用")
+        write_batch(batch)
+
+    store._write_batch = flaky
+    try:
+        store.add("火灾报警", "摄像头0画面", "", ts=1_700_000_000.0)
+        store.flush()
+        assert calls == [1, 1]
+        assert store.count(None, None, "摄像头0画面") == 1
+        assert store.failed == 0
+    finally:
+        store.close()
+
+
+def test_writer_survives_bad_record(tmp_path):
+    store = AlarmLogStore(str(tmp_path / "alarm.db"), flush_interval=0.5, max_retries=1,
+                          retry_backoff=0.01)
+    try:
+        store.add("火灾报警", "摄像头0画面", "", ts=1_700_000_000.0)
+        # 不可哈希的位置在汇总时抛出 TypeError（不是 sqlite3.Error）
+        store.add("火灾报警", ["摄像头1画面"], "", ts=1_700_000_001.0)
+        store.add("火灾报警", "摄像头2画面", "", ts=1_700_000_002.0)
+        store.flush()
+        assert store.failed == 1
+        assert store.location_counts() == {"摄像头0画面": 1, "摄像头2画面": 1}
+
+        # 写线程仍在工作
+        store.add("火灾报警", "摄像头0画面", "", ts=1_700_000_003.0)
+        store.flush()
+        assert store.count(None, None, "摄像头0画面") == 2
+    finally:
+        store.close()
@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+import pytest
+
+from fire_monitor import camera_probe
+
+
+class _FakeCapture:
+    """编号 0 正常，编号 1 打开时卡住直到 release_stuck 被设置，其余编号不存在"""
+
+    release_stuck = threading.Event()
+    opened = []
+
+    def __init__(self, index):
+        _FakeCapture.opened.append(index)
+        self.index = index
+        if index == 1:
+            _FakeCapture.release_stuck.wait()
+
+    def isOpened(self):
+        return self.index in (0, 1)
+
+    def read(self):
+        return True, np.zeros((480, 640, 3), np.uint8)
+
+    def get(self, prop):
+        return 30.0
+
+    def release(self):
+        pass
+
+
+@pytest.fixture
+def fake_cv2(monkeypatch):
+    _FakeCapture.release_stuck = threading.Event()
+    _FakeCapture.opened = []
+    monkeypatch.setattr(camera_probe.cv2, "VideoCapture", _FakeCapture)
+    monkeypatch.setattr(camera_probe, "_in_flight", {})
+    monkeypatch.setattr(camera_probe, "_cache", {"result": None, "time": 0.0, "indexes": None})
+    yield _FakeCapture
+    _FakeCapture.release_stuck.set()
+
+
+def test_stuck_probe_is_not_reprobed_or_cached(fake_cv2):
+    cameras = camera_probe.probe_cameras((0, 1, 2), timeout=0.2)
+    assert [camera["index"] for camera in cameras] == [0]
+    assert not camera_probe.wait_idle(1, timeout=0.05)
+
+    # 编号 1 的探测仍占用设备：不重复打开，结果也没有被缓存
+    cameras = camera_probe.probe_cameras((0, 1, 2), timeout=0.2)
+    assert [camera["index"] for camera in cameras] == [0]
+    assert fake_cv2.opened.count(1) == 1
+    assert fake_cv2.opened.count(0) == 2
+
+    # 设备释放后重新探测到
+    fake_cv2.release_stuck.set()
+    assert camera_probe.wait_idle(1, timeout=1.0)
+    cameras = camera_probe.probe_cameras((0, 1, 2), timeout=0.5)
+    assert [camera["index"] for camera in cameras] == [0, 1]
+    assert fake_cv2.opened.count(1) == 2
+
+
+def test_complete_probe_is_cached(fake_cv2):
+    fake_cv2.release_stuck.set()
+    first = camera_probe.probe_cameras((0, 1, 2), timeout=0.5)
+    second = camera_probe.probe_cameras((0, 1, 2), timeout=0.5)
+    assert first == second
+    assert len(fake_cv2.opened) == 3
+    assert camera_probe.wait_idle(0)
@@ -0,0 +1,67 @@
+from concurrent.futures import Future
+
+import numpy as np
+
+from fire_monitor.cascade import CascadeStage
+
+
+class _Classifier:
+    """立即给出结果的分类器；fail 为 True 时每次都失败"""
+
+    input_size = 64
+
+    def __init__(self, prob=0.9):
+        self.prob = prob
+        self.fail = False
+        self.submitted = 0
+
+    def submit(self, crop):
+        self.submitted += 1
+        future = Future()
+        if self.fail:
+            future.set_exception(RuntimeError("模型输入尺寸不匹配"))
+        else:
+            future.set_result(self.prob)
+        return future
+
+
+class _Track:
+    def __init__(self, track_id, area):
+        self.id = track_id
+        self.area = area
+        self.box = (10, 10, 20, 20)
+
+
+FRAME = np.zeros((100, 100, 3), np.uint8)
+
+
+def test_confirms_and_caches_result():
+    classifier = _Classifier()
+    stage = CascadeStage(classifier, cache_ttl=1.0)
+    tracks = [_Track(1, 400)]
+    assert stage.confirm(FRAME, tracks, now=0.0)
+    assert stage.confirm(FRAME, tracks, now=0.5)
+    assert classifier.submitted == 1
+    # 面积变化超过 recheck_area 倍时重新分类
+    assert stage.confirm(FRAME, [_Track(1, 1000)], now=0.6)
+    assert classifier.submitted == 2
+
+
+def test_failures_back_off_and_log_once(capsys):
+    classifier = _Classifier()
+    classifier.fail = True
+    stage = CascadeStage(classifier, cache_ttl=1.0)
+    tracks = [_Track(1, 400), _Track(2, 100)]
+    for i in range(10):
+        assert not stage.confirm(FRAME, tracks, now=i * 0.1)
+    # 失败后等 cache_ttl 再重试，面积变化也不提前重试
+    stage.confirm(FRAME, [_Track(1, 4000), _Track(2, 100)], now=0.95)
+    assert classifier.submitted == 2
+    assert stage.probs == [None, None]
+    assert capsys.readouterr().out.count("级联分类失败") == 1
+
+    # 退避结束后重新提交，恢复后正常确认
+    classifier.fail = False
+    assert stage.confirm(FRAME, tracks, now=1.2)
+    assert classifier.submitted == 4
+    assert stage.probs == [0.9, 0.9]
@@ -0,0 +1,86 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from fire_monitor.clip_recorder import ClipRecorder
+
+
+def _frame(i, shape=(120, 160, 3)):
+    frame = np.zeros(shape, np.uint8)
+    cv2.putText(frame, str(i), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return frame
+
+
+def _frame_count(path):
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    return count
+
+
+def test_clip_contains_pre_and_post_frames(tmp_path):
+    recorder = ClipRecorder(10, pre_seconds=1, post_seconds=1, output_dir=str(tmp_path),
+                            jpeg_quality=80, max_pending=1000)
+    for i in range(30):
+        recorder.push(_frame(i))
+    path = recorder.trigger()
+    for i in range(30, 50):
+        recorder.push(_frame(i))
+    recorder.close()
+
+    assert recorder.dropped == 0
+    assert os.path.exists(path)
+    # 报警前 1 秒（10 帧）+ 报警后 1 秒（10 帧）
+    assert _frame_count(path) == 20
+
+
+def test_push_copies_frame_and_does_not_encode(tmp_path, monkeypatch):
+    recorder = ClipRecorder(25, pre_seconds=1, post_seconds=1, output_dir=str(tmp_path),
+                            jpeg_quality=80, max_pending=2)
+    encode = recorder.buffer.encode
+
+    def slow_encode(frame):
+        time.sleep(0.05)
+        return encode(frame)
+
+    recorder.buffer.encode = slow_encode
+    try:
+        frame = _frame(0, (1080, 1920, 3))
+        start = time.perf_counter()
+        for _ in range(10):
+            recorder.push(frame)
+        # 压缩在后台线程中进行，push 只复制画面；来不及处理的帧被丢弃
+        assert time.perf_counter() - start < 0.2
+        assert recorder.dropped > 0
+        frame[:] = 255
+    finally:
+        recorder.close()
+    item = recorder.buffer.snapshot()[0]
+    assert cv2.imdecode(item, cv2.IMREAD_COLOR).mean() < 100
+
+
+def test_close_writes_unfinished_clip(tmp_path):
+    recorder = ClipRecorder(10, pre_seconds=1, post_seconds=5, output_dir=str(tmp_path),
+                            max_pending=1000)
+    for i in range(5):
+        recorder.push(_frame(i))
+    path = recorder.trigger()
+    for i in range(5, 8):
+        recorder.push(_frame(i))
+    recorder.close()
+    assert _frame_count(path) == 8
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    recorder = ClipRecorder(10, pre_seconds=1, post_seconds=1, output_dir=str(blocker),
+                            max_pending=1000)
+    recorder.push(_frame(0))
+    path = recorder.trigger()
+    recorder.close()
+    assert not os.path.exists(path)
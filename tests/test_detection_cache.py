@@ -0,0 +1,56 @@
+import numpy as np
+
+from fire_monitor.detection_cache import DetectionCache, decode_mask, encode_mask
+from fire_monitor.regions import extract_regions
+
+CONFIG = {"motion_gate": True}
+
+
+def _record(cache, video, frames, frame_count):
+    recorder = cache.recorder(video, CONFIG, frame_count)
+    for i in range(frames):
+        mask = np.zeros((48, 64), np.uint8)
+        mask[10:20, 5 + i:15 + i] = 255
+        recorder.add(True, 0.03, mask, extract_regions(mask))
+    return recorder.save()
+
+
+def _video(tmp_path):
+    video = tmp_path / "record.mp4"
+    video.write_bytes(b"not really a video" * 100)
+    return str(video)
+
+
+def test_mask_round_trip():
+    mask = np.zeros((48, 64), np.uint8)
+    mask[0, 0] = mask[10:20, 30:40] = mask[-1, -1] = 255
+    assert np.array_equal(decode_mask(encode_mask(mask), mask.shape), mask)
+
+
+def test_frame_count_mismatch_is_a_miss(tmp_path):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    video = _video(tmp_path)
+    _record(cache, video, 5, 5.0)
+
+    cached = cache.get(video, CONFIG, 5.0)
+    assert cached is not None and len(cached) == 5
+    # 换了解码后端，报告的帧数不同
+    assert cache.get(video, CONFIG, 6.0) is None
+    assert cache.get(video, CONFIG, 0.0) is None
+
+
+def test_replay_past_end_returns_empty_detection(tmp_path, capsys):
+    cache = DetectionCache(str(tmp_path / "cache"))
+    video = _video(tmp_path)
+    _record(cache, video, 3, None)
+    detector = cache.get(video, CONFIG).detector()
+
+    frame = np.zeros((48, 64, 3), np.uint8)
+    for _ in range(3):
+        fire, mask = detector.detect(frame)
+        assert fire and mask.any()
+    for _ in range(2):
+        fire, mask = detector.detect(frame)
+        assert not fire and not mask.any()
+        assert detector.fire_ratio == 0.0 and len(detector.regions) == 0
+    assert capsys.readouterr().out.count("检测缓存的帧数少于视频帧数") == 1
@@ -0,0 +1,112 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from fire_monitor.network_source import NetworkSource, is_network_source
+from tools.mjpeg_server import MJPEGServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_listening(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"测试服务器未在端口 {port} 上启动")
+
+
+def _circle_index(frame):
+    """测试画面中火焰色块的圆心 x = 帧号 * 4，由色块右边缘反推帧号"""
+    orange = (frame[:, :, 2] > 200) & (frame[:, :, 1] > 40) & (frame[:, :, 1] < 130) & (frame[:, :, 0] < 80)
+    columns = np.flatnonzero(orange.any(axis=0))
+    return (columns.max() - frame.shape[0] // 8) / 4
+
+
+@pytest.fixture
+def server():
+    server = MJPEGServer(port=0).start()
+    yield server
+    server.stop()
+
+
+def test_is_network_source():
+    assert is_network_source("rtsp://camera/1")
+    assert is_network_source("HTTP://127.0.0.1:8081/stream.mjpg")
+    assert not is_network_source("record.mp4")
+    assert not is_network_source(0)
+
+
+def test_read_returns_latest_frame(server):
+    source = NetworkSource(server.url, open_timeout=3, read_timeout=3)
+    try:
+        assert source.isOpened()
+        ok, frame = source.read(timeout=3)
+        assert ok and frame.shape == (480, 640, 3)
+
+        # 处理变慢：期间收到的旧帧被丢弃，read() 直接拿到最新一帧
+        time.sleep(1.0)
+        ok, frame = source.read(timeout=3)
+        latest = server.httpd.source.frame_index - 1
+        assert ok
+        assert abs(_circle_index(frame) - latest) <= 3
+        assert source.frames_skipped >= 10
+        assert source.latency < 0.5
+
+        # 没有新帧时等待，而不是重复返回同一帧
+        seq = source.frames_received
+        ok, _ = source.read(timeout=3)
+        assert ok and source.frames_received > seq
+    finally:
+        source.release()
+    assert not source.isOpened()
+    assert source.read(timeout=0.1) == (False, None)
+
+
+def test_reconnects_after_drop():
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "tools", "mjpeg_server.py"),
+                                "--port", str(port), "--drop-every", "1"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    source = None
+    try:
+        _wait_listening(port)
+        source = NetworkSource(f"http://127.0.0.1:{port}/stream.mjpg", backoff_initial=0.1,
+                               open_timeout=3, read_timeout=3)
+        assert source.isOpened()
+        # 服务器每秒断开一次连接，期间读取不中断
+        deadline = time.monotonic() + 3.5
+        reads = 0
+        while time.monotonic() < deadline:
+            ok, frame = source.read(timeout=3)
+            assert ok and frame is not None
+            reads += 1
+        assert source.reconnects >= 2
+        assert source.state == "connected"
+        assert reads > 25
+    finally:
+        if source is not None:
+            source.release()
+        process.terminate()
+        process.wait(5)
+
+
+def test_unreachable_url_is_not_opened():
+    source = NetworkSource(f"http://127.0.0.1:{_free_port()}/stream.mjpg", open_timeout=0.5,
+                           read_timeout=0.5)
+    assert not source.isOpened()
+    assert source.read(timeout=0.1) == (False, None)
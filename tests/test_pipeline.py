@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+
+from fire_monitor.pipeline import VideoPipeline
+
+
+class _FakeCap:
+    """返回 frames 帧后结束；fail_at 指定时读到该帧抛出异常"""
+
+    def __init__(self, frames=20, fail_at=None):
+        self.frames = frames
+        self.fail_at = fail_at
+        self.read_count = 0
+
+    def read(self):
+        if self.read_count == self.fail_at:
+            raise RuntimeError("解码失败")
+        if self.read_count >= self.frames:
+            return False, None
+        self.read_count += 1
+        return True, np.full((4, 4, 3), self.read_count, np.uint8)
+
+    def grab(self):
+        return self.read()[0]
+
+
+def _run(cap, analyze, timeout=2.0):
+    ended = threading.Event()
+    displayed = []
+    pipeline = VideoPipeline(cap, analyze, displayed.append, on_end=ended.set)
+    pipeline.start()
+    assert ended.wait(timeout)
+    assert pipeline.join(timeout)
+    return pipeline, displayed
+
+
+def test_runs_to_end():
+    pipeline, displayed = _run(_FakeCap(20), lambda frame: int(frame[0, 0, 0]))
+    assert pipeline.error is None
+    assert pipeline.frames_captured == 20
+    assert pipeline.frames_analyzed == 20
+    # 显示队列只保留最新结果，最后一帧一定被显示
+    assert displayed[-1] == 20
+
+
+def test_analysis_error_stops_pipeline():
+    def analyze(frame):
+        if frame[0, 0, 0] == 5:
+            raise ValueError("分析失败")
+        return frame
+
+    # 足够多的帧让采集线程阻塞在满队列上
+    pipeline, _ = _run(_FakeCap(10000), analyze)
+    assert isinstance(pipeline.error, ValueError)
+    assert not pipeline.is_running()
+    assert pipeline.frames_analyzed == 4
+
+
+def test_capture_error_ends_pipeline():
+    pipeline, displayed = _run(_FakeCap(20, fail_at=7), lambda frame: int(frame[0, 0, 0]))
+    assert pipeline.error is None
+    assert pipeline.frames_captured == 7
+    assert displayed[-1] == 7
@@ -0,0 +1,169 @@
+import http.client
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from fire_monitor import server as server_module
+from fire_monitor.server import BOUNDARY, FireServer, StreamWorker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIP = os.path.join(ROOT, "bench_clips", "fire_480p_40.avi")
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def _get(server, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    conn.request("GET", path, headers=headers or {})
+    return conn, conn.getresponse()
+
+
+def _status(server):
+    conn, response = _get(server, "/status")
+    try:
+        assert response.status == 200
+        assert response.getheader("Content-Type").startswith("application/json")
+        return json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def _read_event(response):
+    """读取一条 SSE 事件，返回 {字段: 值}；跳过 retry 和注释行"""
+    fields = {}
+    while True:
+        line = response.readline().decode("utf-8").rstrip("\n")
+        if not line:
+            if "id" in fields:
+                return fields
+            fields = {}
+            continue
+        if line.startswith(":"):
+            continue
+        name, _, value = line.partition(": ")
+        fields[name] = value
+
+
+@pytest.fixture
+def video_server():
+    if not os.path.exists(CLIP):
+        pytest.skip("缺少测试视频 bench_clips/fire_480p_40.avi")
+    server = FireServer([CLIP], host="127.0.0.1", port=0, loop_file=True).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def event_server():
+    server = FireServer([], host="127.0.0.1", port=0).start()
+    yield server
+    server.stop()
+
+
+def test_status_reports_streams(video_server):
+    assert _wait_for(lambda: video_server.workers["stream-0"].status["frames"] > 5)
+    status = _status(video_server)
+    assert status["event_subscribers"] == 0
+    assert len(status["streams"]) == 1
+    stream = status["streams"][0]
+    assert stream["stream_id"] == "stream-0"
+    assert stream["source"] == CLIP
+    assert stream["state"] == "running"
+    assert stream["frames"] > 5
+    assert stream["viewers"] == 0
+    assert 0.0 <= stream["fire_ratio"] <= 1.0
+
+
+def test_unknown_paths_return_404(video_server):
+    for path in ("/missing", "/stream/stream-9.mjpg", "/snapshot/stream-9.jpg"):
+        conn, response = _get(video_server, path)
+        assert response.status == 404
+        conn.close()
+
+
+def test_mjpeg_boundary_framing(video_server):
+    conn, response = _get(video_server, "/stream/stream-0.mjpg")
+    try:
+        assert response.status == 200
+        assert response.getheader("Content-Type") == f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+        for _ in range(3):
+            assert response.readline() == f"--{BOUNDARY}\r\n".encode("ascii")
+            headers = {}
+            while True:
+                line = response.readline()
+                if line == b"\r\n":
+                    break
+                name, _, value = line.decode("ascii").partition(":")
+                headers[name.lower()] = value.strip()
+            assert headers["content-type"] == "image/jpeg"
+            jpeg = response.read(int(headers["content-length"]))
+            # 每个分段以 CRLF 结束，紧接着是下一个边界
+            assert response.read(2) == b"\r\n"
+            assert jpeg[:2] == b"\xff\xd8" and jpeg[-2:] == b"\xff\xd9"
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            assert frame.shape == (480, 854, 3)
+        assert _status(video_server)["streams"][0]["viewers"] == 1
+    finally:
+        response.close()
+        conn.close()
+    # 观看者断开后不再计数
+    assert _wait_for(lambda: video_server.workers["stream-0"].channel.viewers == 0)
+
+
+def test_sse_replays_backlog_after_last_event_id(event_server):
+    for i in range(3):
+        event_server.emit("alarm", {"n": i})
+    assert _wait_for(lambda: event_server.events.last_id == 3)
+
+    conn, response = _get(event_server, "/events", {"Last-Event-ID": "1"})
+    try:
+        assert response.status == 200
+        assert response.getheader("Content-Type").startswith("text/event-stream")
+        replayed = [_read_event(response) for _ in range(2)]
+        assert [event["id"] for event in replayed] == ["2", "3"]
+        assert [json.loads(event["data"])["n"] for event in replayed] == [1, 2]
+        assert replayed[0]["event"] == "alarm"
+
+        # 补发之后继续接收新事件
+        event_server.emit("detection", {"n": 3})
+        live = _read_event(response)
+        assert (live["id"], live["event"]) == ("4", "detection")
+    finally:
+        response.close()
+        conn.close()
+
+
+def test_sse_without_last_event_id_skips_backlog(event_server):
+    event_server.emit("alarm", {"n": 0})
+    assert _wait_for(lambda: event_server.events.last_id == 1)
+
+    conn, response = _get(event_server, "/events")
+    try:
+        assert _wait_for(lambda: event_server.events.subscribers == 1)
+        event_server.emit("alarm", {"n": 1})
+        event = _read_event(response)
+        assert event["id"] == "2"
+        assert json.loads(event["data"]) == {"n": 1}
+    finally:
+        response.close()
+        conn.close()
+
+
+def test_encode_failure_skips_frame(event_server, monkeypatch):
+    worker = StreamWorker(event_server, "stream-x", CLIP)
+    frame = np.zeros((480, 854, 3), np.uint8)
+    assert worker._encode(frame)[:2] == b"\xff\xd8"
+
+    monkeypatch.setattr(server_module.cv2, "imencode", lambda *args: (False, None))
+    assert worker._encode(frame) is None
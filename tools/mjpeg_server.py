@@ -0,0 +1,158 @@
+"""本机 MJPEG-over-HTTP 测试服务器，模拟网络摄像头
+
+用法:
+    python tools/mjpeg_server.py --port 8081 --fps 25
+    python tools/mjpeg_server.py --source video.mp4 --drop-every 10
+
+然后在程序中使用网络摄像头地址 http://127.0.0.1:8081/stream.mjpg。
+--drop-every 每隔若干秒主动断开所有连接，用于测试断线重连。
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+BOUNDARY = "frame"
+
+
+class FrameSource:
+    """循环播放视频文件，或生成带移动火焰色块的测试画面；每帧只编码一次，供所有连接共享"""
+
+    def __init__(self, source=None, width=640, height=480, fps=25, jpeg_quality=80):
+        self.cap = cv2.VideoCapture(source) if source else None
+        if self.cap is not None and not self.cap.isOpened():
+            raise RuntimeError(f"无法打开视频文件: {source}")
+        self.size = (width, height)
+        self.interval = 1.0 / fps
+        self.jpeg_quality = jpeg_quality
+        self.cond = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.frame_index = 0
+
+    def _next_frame(self):
+        if self.cap is not None:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+            return frame
+        width, height = self.size
+        frame = np.full((height, width, 3), (90, 80, 70), np.uint8)
+        x = int((self.frame_index * 4) % width)
+        cv2.circle(frame, (x, height // 2), height // 8, (0, 80, 255), -1)
+        cv2.putText(frame, str(self.frame_index), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1,
+                    (255, 255, 255), 2)
+        return frame
+
+    def run(self, stop_event):
+        next_due = time.monotonic()
+        while not stop_event.is_set():
+            frame = self._next_frame()
+            ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            with self.cond:
+                self.jpeg = data.tobytes()
+                self.seq += 1
+                self.cond.notify_all()
+            self.frame_index += 1
+            next_due += self.interval
+            delay = next_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_due = time.monotonic()
+
+    def wait_next(self, seq, timeout=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq, timeout)
+            return self.seq, self.jpeg
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/stream.mjpg":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        server = self.server
+        seq = 0
+        generation = server.generation
+        try:
+            while not server.stop_event.is_set() and server.generation == generation:
+                seq, jpeg = server.source.wait_next(seq)
+                if jpeg is None:
+                    continue
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode("ascii"))
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MJPEGServer:
+    def __init__(self, port=8081, host="127.0.0.1", source=None, fps=25, drop_every=None):
+        self.httpd = ThreadingHTTPServer((host, port), _StreamHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.source = FrameSource(source, fps=fps)
+        self.httpd.stop_event = threading.Event()
+        # 递增后所有现有连接退出，模拟网络中断
+        self.httpd.generation = 0
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}/stream.mjpg"
+        self.drop_every = drop_every
+        self._threads = []
+
+    def drop_connections(self):
+        self.httpd.generation += 1
+
+    def _drop_loop(self):
+        while not self.httpd.stop_event.wait(self.drop_every):
+            self.drop_connections()
+
+    def start(self):
+        targets = [lambda: self.httpd.source.run(self.httpd.stop_event), self.httpd.serve_forever]
+        if self.drop_every:
+            targets.append(self._drop_loop)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self.httpd.stop_event.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MJPEG-over-HTTP 测试服务器")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--source", default=None, help="循环播放的视频文件，默认生成测试画面")
+    parser.add_argument("--fps", type=float, default=25)
+    parser.add_argument("--drop-every", type=float, default=None, help="每隔若干秒断开所有连接")
+    args = parser.parse_args(argv)
+
+    server = MJPEGServer(args.port, args.host, args.source, args.fps, args.drop_every).start()
+    print(f"MJPEG 测试流: {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()